@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for vina_docking_params.py, no Vina install needed.
+
+A fake `vina` executable writes Vina 1.1.2 style multi-model PDBQT and log
+output after a configurable delay, so the driver can be timed end to end.
+The post-processing steps (extract_pose_scores, split_poses_to_individual_files,
+convert_single_pdbqt_to_pdb) are also timed on their own.
+
+Results go to a JSON file; pass a previous one with --compare to flag
+regressions:
+    python benchmark_docking.py --sizes 10 1000 --output bench_new.json --compare bench_old.json
+    python benchmark_docking.py --large --skip-end-to-end   # steps at 100000 ligands too
+
+Fake Vina knobs (environment variables, also set by --delay/--poses/--atoms):
+    FAKE_VINA_DELAY  seconds to sleep per ligand
+    FAKE_VINA_POSES  poses written (default: --num_modes)
+    FAKE_VINA_ATOMS  atoms per pose (default: the ligand's own atoms)
+    FAKE_VINA_VERSION  reported by --version; 1.2 or later also accepts --batch
+    FAKE_VINA_FAIL   comma-separated ligand file names a --batch run skips
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+
+BENCH_SIZES = (10, 1000)
+# Opt-in with --large: a full end-to-end driver run at this size takes hours
+LARGE_SIZE = 100000
+# Distinct ligand outputs generated for the step benchmarks; larger runs cycle through them
+INPUT_POOL = 64
+# Step benchmark outputs are cleared every this many ligands to bound disk use
+CHUNK = 1000
+
+# AutoDock types and elements for synthetic ligands
+LIGAND_TYPES = (("C", "C"), ("A", "C"), ("N", "N"), ("OA", "O"), ("NA", "N"), ("C", "C"), ("SA", "S"), ("HD", "H"))
+
+LOG_BANNER = """#################################################################
+# If you used AutoDock Vina in your work, please cite:          #
+#                                                               #
+# O. Trott, A. J. Olson,                                        #
+# AutoDock Vina: improving the speed and accuracy of docking    #
+# with a new scoring function, efficient optimization and       #
+# multithreading, Journal of Computational Chemistry 31 (2010)  #
+# 455-461                                                       #
+#################################################################
+
+Detected {cpus} CPUs
+Reading input ... done.
+Setting up the scoring function ... done.
+Analyzing the binding site ... done.
+Using random seed: {seed}
+Performing search ... done.
+Refining results ... done.
+
+mode |   affinity | dist from best mode
+     | (kcal/mol) | rmsd l.b.| rmsd u.b.
+-----+------------+----------+----------
+"""
+
+# Runs the driver in a child process on an arbitrary ligand list
+DRIVER_BOOTSTRAP = """
+import sys
+sys.path.insert(0, {driver_dir!r})
+import vina_docking_params as driver
+with open({ligand_list!r}) as f:
+    driver.target_molecules = f.read().split()
+driver.main({argv!r})
+"""
+
+
+def synthetic_ligand_lines(n_atoms, torsions=None, seed=0):
+    """PDBQT lines of a made-up ligand: a rigid root plus one atom per branch"""
+    rng = random.Random(seed)
+    root = min(n_atoms, 6)
+    if torsions is None:
+        torsions = n_atoms - root
+    lines = [f"REMARK  {torsions} active torsions:", "ROOT"]
+
+    def atom(i):
+        name, element = LIGAND_TYPES[i % len(LIGAND_TYPES)]
+        x, y, z = (rng.uniform(-5, 5) for _ in range(3))
+        return (f"ATOM  {i + 1:5d}  {element + str(i + 1):<3.3s} UNL     1    "
+                f"{x:8.3f}{y:8.3f}{z:8.3f}  0.00  0.00    +0.000 {name:<2s}")
+
+    lines += [atom(i) for i in range(root)]
+    lines.append("ENDROOT")
+    for i in range(root, n_atoms):
+        lines.append(f"BRANCH {root:3d} {i + 1:3d}")
+        lines.append(atom(i))
+        lines.append(f"ENDBRANCH {root:3d} {i + 1:3d}")
+    lines.append(f"TORSDOF {torsions}")
+    return lines
+
+
+def fake_scores(ligand, n_poses, exhaustiveness=8):
+    """Deterministic, ligand-dependent (affinity, rmsd l.b., rmsd u.b.) per pose"""
+    rng = random.Random(zlib.crc32(os.path.basename(ligand).encode()) + exhaustiveness)
+    best = -(5.0 + rng.random() * 5.0)
+    rows = [(round(best, 1), 0.0, 0.0)]
+    for _ in range(1, n_poses):
+        lb = rng.uniform(0.5, 4.0)
+        rows.append((round(rows[-1][0] + rng.uniform(0.0, 0.6), 1), lb, lb + rng.uniform(0.5, 3.0)))
+    return rows
+
+
+def write_fake_vina_output(ligand_lines, out_path, log_path, rows, cpus=1, seed=0):
+    """Vina 1.1.2 style `--out` and `--log` files for the given score rows"""
+    rng = random.Random(seed)
+    with open(out_path, 'w') as out:
+        for model, (affinity, lb, ub) in enumerate(rows, 1):
+            dx, dy, dz = (rng.uniform(-1, 1) for _ in range(3))
+            out.write(f"MODEL {model}\n")
+            out.write(f"REMARK VINA RESULT: {affinity:9.1f}{lb:11.3f}{ub:11.3f}\n")
+            for line in ligand_lines:
+                if line.startswith(('ATOM', 'HETATM')):
+                    x = float(line[30:38]) + dx
+                    y = float(line[38:46]) + dy
+                    z = float(line[46:54]) + dz
+                    line = f"{line[:30]}{x:8.3f}{y:8.3f}{z:8.3f}{line[54:]}"
+                out.write(line + '\n')
+            out.write("ENDMDL\n")
+    with open(log_path, 'w') as log:
+        log.write(LOG_BANNER.format(cpus=cpus, seed=seed))
+        for model, (affinity, lb, ub) in enumerate(rows, 1):
+            log.write(f"{model:4d}     {affinity:8.1f}   {lb:8.3f}   {ub:8.3f}\n")
+        log.write("Writing output ... done.\n")
+
+
+def fake_dock(ligand, out_path, log_path, opts):
+    """One fake docking run of `ligand` with the parsed command-line options"""
+    time.sleep(float(os.environ.get("FAKE_VINA_DELAY", "0")))
+
+    with open(ligand) as f:
+        ligand_lines = [line.rstrip('\n') for line in f if not line.startswith('REMARK')]
+    n_atoms = os.environ.get("FAKE_VINA_ATOMS")
+    if n_atoms:
+        ligand_lines = synthetic_ligand_lines(int(n_atoms), seed=zlib.crc32(ligand.encode()))
+    n_poses = int(os.environ.get("FAKE_VINA_POSES") or opts.get('--num_modes', 9))
+    rows = fake_scores(ligand, n_poses, int(opts.get('--exhaustiveness', 8)))
+    write_fake_vina_output(ligand_lines, out_path, log_path, rows,
+                           cpus=opts.get('--cpu', os.cpu_count()), seed=len(ligand_lines))
+
+
+def fake_vina_main(argv):
+    """Entry point of the fake `vina` executable"""
+    version = os.environ.get("FAKE_VINA_VERSION", "1.1.2 (May 11, 2011)")
+    if "--version" in argv:
+        print(f"AutoDock Vina {version}")
+        return 0
+    opts = {argv[i]: argv[i + 1] for i in range(0, len(argv) - 1) if argv[i].startswith('--')}
+
+    if "--batch" in argv:
+        if tuple(map(int, version.split()[0].split('.')[:2])) < (1, 2):
+            print("Unknown option --batch", file=sys.stderr)
+            return 1
+        # Vina 1.2 style: --batch lig1 lig2 ... --dir out, writing {stem}_out.pdbqt
+        ligands = argv[argv.index("--batch") + 1:]
+        ligands = ligands[:next((i for i, arg in enumerate(ligands) if arg.startswith('--')), len(ligands))]
+        skipped = os.environ.get("FAKE_VINA_FAIL", "").split(',')
+        for ligand in ligands:
+            if os.path.basename(ligand) in skipped:
+                continue
+            stem = os.path.splitext(os.path.basename(ligand))[0]
+            out_path = os.path.join(opts['--dir'], f"{stem}_out.pdbqt")
+            fake_dock(ligand, out_path, os.devnull, opts)
+        return 0
+
+    fake_dock(opts['--ligand'], opts['--out'], opts['--log'], opts)
+    return 0
+
+
+def install_fake_vina(directory):
+    """Write an executable `vina` into `directory` that runs fake_vina_main()"""
+    path = os.path.join(directory, "vina")
+    with open(path, 'w') as f:
+        f.write(f"#!{sys.executable}\n"
+                "import sys\n"
+                f"sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})\n"
+                "from benchmark_docking import fake_vina_main\n"
+                "sys.exit(fake_vina_main(sys.argv[1:]))\n")
+    os.chmod(path, 0o755)
+    return path
+
+
+def write_ligands(directory, n, n_atoms):
+    """n synthetic ligand files named like the driver's inputs"""
+    names = []
+    for i in range(1, n + 1):
+        name = f"adme_molecule{i}.pdbqt"
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write('\n'.join(synthetic_ligand_lines(n_atoms, seed=i)) + '\n')
+        names.append(name)
+    return names
+
+
+def write_receptor(directory):
+    """Small stand-in receptor (the fake Vina never reads it)"""
+    path = os.path.join(directory, "target.pdbqt")
+    with open(path, 'w') as f:
+        f.write('\n'.join(synthetic_ligand_lines(50, torsions=0, seed=-1)[2:]) + '\n')
+    return path
+
+
+def load_driver():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import vina_docking_params
+    return vina_docking_params
+
+
+def rusage_children_cpu():
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench_end_to_end(n, args, workdir):
+    """Time one full driver run over n ligands with the fake Vina"""
+    fake_vina = install_fake_vina(workdir)
+    ligands = write_ligands(workdir, n, args.atoms)
+    write_receptor(workdir)
+    ligand_list = os.path.join(workdir, "ligands.txt")
+    with open(ligand_list, 'w') as f:
+        f.write('\n'.join(ligands) + '\n')
+
+    driver_argv = ["--no-cache", "--no-resume"] + args.driver_args.split()
+    code = DRIVER_BOOTSTRAP.format(driver_dir=os.path.dirname(os.path.abspath(__file__)),
+                                   ligand_list=ligand_list, argv=driver_argv)
+    env = dict(os.environ, VINA_EXECUTABLE=fake_vina, FAKE_VINA_DELAY=str(args.delay))
+    if args.poses:
+        env['FAKE_VINA_POSES'] = str(args.poses)
+
+    cpu_before = rusage_children_cpu()
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    cpu = rusage_children_cpu() - cpu_before
+    if result.returncode != 0:
+        raise RuntimeError(f"driver failed on {n} ligands: {result.stderr.strip()[-500:]}")
+
+    output_dir = os.path.join(workdir, "Top10_compounds_docking")
+    pose_files = sum(1 for name in os.listdir(output_dir) if name.endswith('kcal.pdb'))
+    return {
+        'benchmark': 'end_to_end', 'ligands': n, 'wall_s': wall, 'cpu_s': cpu,
+        'ligands_per_s': n / wall, 'per_ligand_ms': 1000 * wall / n,
+        'poses_written': pose_files, 'driver_args': ' '.join(driver_argv),
+    }
+
+
+def bench_steps(n, args, workdir):
+    """Time the post-processing steps over n ligand outputs"""
+    driver = load_driver()
+    inputs = os.path.join(workdir, "inputs")
+    outputs = os.path.join(workdir, "outputs")
+    os.makedirs(inputs)
+    n_poses = args.poses or 9
+
+    pool = []
+    for i in range(min(n, INPUT_POOL)):
+        ligand = f"adme_molecule{i + 1}.pdbqt"
+        poses = os.path.join(inputs, f"{i}_all_poses.pdbqt")
+        log = os.path.join(inputs, f"{i}_docking.log")
+        write_fake_vina_output(synthetic_ligand_lines(args.atoms, seed=i), poses, log,
+                               fake_scores(ligand, n_poses), seed=i)
+        pool.append((poses, log))
+
+    timings = {'extract_pose_scores': 0.0, 'split_poses_to_individual_files': 0.0,
+               'convert_single_pdbqt_to_pdb': 0.0}
+    poses_done = 0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for start in range(0, n, CHUNK):
+            os.makedirs(outputs)
+            for i in range(start, min(start + CHUNK, n)):
+                poses, log = pool[i % len(pool)]
+                name = f"adme_molecule{i + 1}"
+
+                t = time.perf_counter()
+                scores = driver.extract_pose_scores(log)
+                timings['extract_pose_scores'] += time.perf_counter() - t
+
+                t = time.perf_counter()
+                files = driver.split_poses_to_individual_files(poses, name, outputs, scores)
+                timings['split_poses_to_individual_files'] += time.perf_counter() - t
+
+                t = time.perf_counter()
+                for pose_num, (pose_pdbqt, pose_pdb) in enumerate(files, 1):
+                    driver.convert_single_pdbqt_to_pdb(pose_pdbqt, pose_pdb, pose_num,
+                                                       scores.get(pose_num, "unknown"))
+                timings['convert_single_pdbqt_to_pdb'] += time.perf_counter() - t
+                poses_done += len(files)
+            shutil.rmtree(outputs)
+
+    return [{'benchmark': step, 'ligands': n, 'poses': poses_done, 'wall_s': seconds,
+             'ligands_per_s': n / seconds if seconds > 0 else None,
+             'per_ligand_ms': 1000 * seconds / n}
+            for step, seconds in timings.items()]
+
+
+def compare(results, baseline_path, threshold):
+    """Print per-benchmark change against a previous results file; returns the regressions"""
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['ligands']): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\n📊 Compared with {baseline_path}:")
+    for r in results:
+        old = baseline.get((r['benchmark'], r['ligands']))
+        if old is None or not old.get('per_ligand_ms'):
+            continue
+        change = r['per_ligand_ms'] / old['per_ligand_ms'] - 1
+        flag = "  ⚠️ regression" if change > threshold else ""
+        print(f"   {r['benchmark']} @ {r['ligands']}: {old['per_ligand_ms']:.3f} -> "
+              f"{r['per_ligand_ms']:.3f} ms/ligand ({change:+.1%}){flag}")
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the docking driver with a fake Vina")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(BENCH_SIZES),
+                        help=f"Ligand counts to benchmark (default: {' '.join(map(str, BENCH_SIZES))})")
+    parser.add_argument("--large", action="store_true", help=f"Also benchmark {LARGE_SIZE} ligands")
+    parser.add_argument("--delay", type=float, default=0.0, help="Fake Vina delay per ligand in seconds")
+    parser.add_argument("--poses", type=int, default=None, help="Poses per ligand (default: driver num_modes)")
+    parser.add_argument("--atoms", type=int, default=30, help="Atoms per ligand")
+    parser.add_argument("--driver-args", default="",
+                        help="Extra driver options for the end-to-end runs, e.g. \"--parallel --cpus 8\"")
+    parser.add_argument("--skip-end-to-end", action="store_true", help="Only time the post-processing steps")
+    parser.add_argument("--skip-steps", action="store_true", help="Only time the full driver")
+    parser.add_argument("--output", default=None,
+                        help="Results file (default: docking_benchmark_<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Slowdown per ligand counted as a regression (default: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+    if args.large and LARGE_SIZE not in args.sizes:
+        args.sizes.append(LARGE_SIZE)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = args.output or f"docking_benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json"
+
+    print("⏱️  Docking driver benchmark (fake Vina)")
+    print("=" * 60)
+    results = []
+    for n in args.sizes:
+        if not args.skip_end_to_end:
+            with tempfile.TemporaryDirectory(prefix="bench_e2e_") as workdir:
+                r = bench_end_to_end(n, args, workdir)
+            results.append(r)
+            print(f"   end_to_end @ {n}: {r['wall_s']:.2f} s ({r['ligands_per_s']:.1f} ligands/s)")
+        if not args.skip_steps:
+            with tempfile.TemporaryDirectory(prefix="bench_steps_") as workdir:
+                step_results = bench_steps(n, args, workdir)
+            results += step_results
+            for r in step_results:
+                print(f"   {r['benchmark']} @ {n}: {r['wall_s']:.3f} s ({r['per_ligand_ms']:.3f} ms/ligand)")
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': {'sizes': args.sizes, 'delay': args.delay, 'poses': args.poses,
+                       'atoms': args.atoms, 'driver_args': args.driver_args},
+        },
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved: {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Pluggable docking backends for the Vina driver.
+
+- SubprocessBackend: one Vina process per ligand (the original behaviour,
+  works with the Vina 1.1.2 binary shipped in the AutoGrow container).
+- BatchBackend: one Vina >= 1.2 process for many ligands via `--batch`, so
+  the receptor is read and the grid maps are built once per batch.
+- BindingsBackend: the `vina` Python package (Vina >= 1.2); maps are computed
+  once and every ligand is docked in-process against them.
+
+Every backend writes `{ligand}_all_poses.pdbqt` plus a Vina 1.1.2 style
+`{ligand}_docking.log`, so the rest of the pipeline doesn't care which one ran.
+Backends only take an executable path, so a stub `vina` script works in place
+of the real binary.
+
+`timeout` is a per-ligand limit in seconds, either one number or a
+{ligand: seconds} dict. Every backend enforces it (the batch process gets the
+sum of its ligands' limits) and reports a ligand that ran out of time with the
+error TIMED_OUT, which dock_with_fallback() leaves to the caller's timeout
+policy instead of re-docking it.
+"""
+import os
+import re
+import time
+import queue
+import shutil
+import signal
+import subprocess
+import tempfile
+import multiprocessing
+
+from pose_set import PoseSet
+from docking_telemetry import record_child_usage
+
+LOG_TABLE_HEADER = ("mode |   affinity | dist from best mode\n"
+                    "     | (kcal/mol) | rmsd l.b.| rmsd u.b.\n"
+                    "-----+------------+----------+----------\n")
+# Error reported for a ligand whose Vina run hit its time limit
+TIMED_OUT = "timed out"
+
+
+def write_vina_log(all_poses_pdbqt, log_file, note=""):
+    """Write a Vina 1.1.2 style log from the REMARK VINA RESULT lines of an output"""
+    poses = PoseSet.from_vina_output(all_poses_pdbqt)
+    with open(log_file, 'w') as f:
+        if note:
+            f.write(note.rstrip('\n') + '\n\n')
+        f.write(LOG_TABLE_HEADER)
+        for num, aff, lb, ub in zip(poses.model_numbers, poses.affinity, poses.rmsd_lb, poses.rmsd_ub):
+            f.write(f"{num:4d}     {aff:8.1f}   {lb:8.3f}   {ub:8.3f}\n")
+    return len(poses)
+
+
+def wait_with_rusage(proc, timeout=None):
+    """
+    Reap `proc` with os.wait4, which gives this child's own rusage
+    (RUSAGE_CHILDREN only has lifetime totals). Raises
+    subprocess.TimeoutExpired after `timeout` seconds.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        pid, status, usage = os.wait4(proc.pid, 0 if deadline is None else os.WNOHANG)
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return usage
+        if time.monotonic() >= deadline:
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        time.sleep(delay)
+        delay = min(2 * delay, 0.05)
+
+
+def run_in_process_group(cmd, timeout=None):
+    """
+    subprocess.run() in a new session, killing the whole process group on
+    timeout (so wrapper scripts can't leave an orphaned Vina running).
+    Raises subprocess.TimeoutExpired after the group is gone. The child's
+    rusage goes to record_child_usage() for the running JobTimers.
+    """
+    # Output goes to temporary files, so waiting doesn't have to drain pipes
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdout=out, stderr=err, start_new_session=True)
+        try:
+            usage = wait_with_rusage(proc, timeout)
+        except BaseException:
+            # Timeout, Ctrl-C or anything else: Vina's own session doesn't get the
+            # terminal's SIGINT, so the group has to go before we do
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            if proc.returncode is None:
+                record_child_usage(wait_with_rusage(proc))
+            raise
+        record_child_usage(usage)
+        out.seek(0)
+        err.seek(0)
+        stdout = out.read().decode(errors="replace")
+        stderr = err.read().decode(errors="replace")
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+def ligand_timeout(timeout, ligand):
+    """One ligand's limit from a number or a {ligand: seconds} dict (None = no limit)"""
+    return timeout.get(ligand) if isinstance(timeout, dict) else timeout
+
+
+def vina_version(executable):
+    """(major, minor) reported by `vina --version`, or None"""
+    try:
+        result = subprocess.run([executable, "--version"], capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(r'(\d+)\.(\d+)', result.stdout + result.stderr)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def box_arguments(params):
+    """--center_* / --size_* arguments of the search box"""
+    args = []
+    for axis, value in zip("xyz", params['center']):
+        args += [f"--center_{axis}", str(value)]
+    for axis, value in zip("xyz", params['size']):
+        args += [f"--size_{axis}", str(value)]
+    return args
+
+
+def search_arguments(params):
+    """Search settings shared by every Vina command"""
+    return ["--exhaustiveness", str(params['exhaustiveness']),
+            "--num_modes", str(params['num_modes']),
+            "--energy_range", str(params['energy_range'])]
+
+
+class SubprocessBackend:
+    """One Vina process per ligand"""
+    name = "subprocess"
+
+    def __init__(self, executable):
+        self.executable = executable
+
+    def available(self):
+        return os.path.exists(self.executable)
+
+    def command(self, receptor, ligand, all_poses_pdbqt, log_file, params, cpu=None):
+        cmd = [self.executable, "--receptor", receptor, "--ligand", ligand]
+        cmd += box_arguments(params)
+        cmd += ["--out", all_poses_pdbqt, "--log", log_file]
+        cmd += search_arguments(params)
+        if cpu is not None:
+            cmd += ["--cpu", str(cpu)]
+        return cmd
+
+    def dock_one(self, receptor, ligand, all_poses_pdbqt, log_file, params, cpu=None, timeout=2400):
+        """Run Vina for one ligand; returns the CompletedProcess"""
+        cmd = self.command(receptor, ligand, all_poses_pdbqt, log_file, params, cpu)
+        return run_in_process_group(cmd, ligand_timeout(timeout, ligand))
+
+    def dock_many(self, receptor, jobs, params, cpu=None, timeout=2400):
+        """
+        Dock [(ligand, all_poses_pdbqt, log_file), ...].
+        Returns {ligand: error message or None}.
+        """
+        errors = {}
+        for ligand, all_poses_pdbqt, log_file in jobs:
+            try:
+                result = self.dock_one(receptor, ligand, all_poses_pdbqt, log_file, params, cpu, timeout)
+                errors[ligand] = None if result.returncode == 0 else (result.stderr.strip() or "Vina failed")
+            except subprocess.TimeoutExpired:
+                errors[ligand] = TIMED_OUT
+            except Exception as e:
+                errors[ligand] = str(e)
+        return errors
+
+
+class BatchBackend(SubprocessBackend):
+    """Many ligands per Vina >= 1.2 process using --batch"""
+    name = "batch"
+
+    def available(self):
+        version = vina_version(self.executable) if super().available() else None
+        return version is not None and version >= (1, 2)
+
+    def dock_many(self, receptor, jobs, params, cpu=None, timeout=2400):
+        errors = {}
+        if not jobs:
+            return errors
+        out_parent = os.path.dirname(jobs[0][1]) or "."
+        batch_dir = tempfile.mkdtemp(prefix=".batch_", dir=out_parent)
+        try:
+            cmd = [self.executable, "--receptor", receptor, "--batch"]
+            cmd += [ligand for ligand, _, _ in jobs]
+            cmd += ["--dir", batch_dir] + box_arguments(params) + search_arguments(params)
+            if cpu is not None:
+                cmd += ["--cpu", str(cpu)]
+            limits = [ligand_timeout(timeout, ligand) for ligand, _, _ in jobs]
+            try:
+                # `timeout` is per ligand; the batch gets the sum
+                result = run_in_process_group(cmd, None if None in limits else sum(limits))
+                batch_error = None if result.returncode == 0 else (result.stderr.strip() or "Vina batch failed")
+            except subprocess.TimeoutExpired:
+                # Ligands the batch didn't get to count as timed out
+                batch_error = TIMED_OUT
+            except Exception as e:
+                batch_error = str(e)
+
+            # Vina 1.2 names batch outputs {ligand basename}_out.pdbqt
+            for ligand, all_poses_pdbqt, log_file in jobs:
+                stem = os.path.splitext(os.path.basename(ligand))[0]
+                batch_out = os.path.join(batch_dir, f"{stem}_out.pdbqt")
+                if os.path.isfile(batch_out) and os.path.getsize(batch_out) > 0:
+                    shutil.move(batch_out, all_poses_pdbqt)
+                    write_vina_log(all_poses_pdbqt, log_file, note=f"Docked by vina --batch ({ligand})")
+                    errors[ligand] = None
+                else:
+                    errors[ligand] = batch_error or "no output written by vina --batch"
+        finally:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+        return errors
+
+
+def _bindings_worker(receptor, jobs, params, cpu, results):
+    """Dock `jobs` with the Vina bindings against maps computed once; puts (ligand, error) per ligand"""
+    from vina import Vina
+
+    v = Vina(sf_name='vina', cpu=cpu or 0, verbosity=0)
+    v.set_receptor(receptor)
+    # The grid maps are the per-receptor setup we only want to pay once
+    v.compute_vina_maps(center=list(params['center']), box_size=list(params['size']))
+    for ligand, all_poses_pdbqt, log_file in jobs:
+        try:
+            v.set_ligand_from_file(ligand)
+            v.dock(exhaustiveness=params['exhaustiveness'], n_poses=params['num_modes'])
+            v.write_poses(all_poses_pdbqt, n_poses=params['num_modes'],
+                          energy_range=params['energy_range'], overwrite=True)
+            write_vina_log(all_poses_pdbqt, log_file, note=f"Docked with Vina Python bindings ({ligand})")
+            results.put((ligand, None))
+        except Exception as e:
+            results.put((ligand, str(e)))
+
+
+class BindingsBackend:
+    """
+    Docking with the Vina >= 1.2 Python bindings. Vina can't be interrupted
+    inside dock(), so the ligands are docked in one worker process that is
+    killed when a ligand overruns its limit; the rest continue in a new one.
+    """
+    name = "bindings"
+
+    def __init__(self, executable=None):
+        self.executable = executable
+
+    def available(self):
+        try:
+            import vina  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def dock_many(self, receptor, jobs, params, cpu=None, timeout=2400):
+        errors = {}
+        pending = list(jobs)
+        while pending:
+            results = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=_bindings_worker, daemon=True,
+                                             args=(receptor, pending, params, cpu, results))
+            worker.start()
+            try:
+                for done, (ligand, _, _) in enumerate(pending, 1):
+                    errors[ligand] = self._wait(worker, results, ligand, ligand_timeout(timeout, ligand))
+                    # A killed or crashed worker hands the rest to a new one
+                    if errors[ligand] == TIMED_OUT or not worker.is_alive():
+                        break
+                pending = pending[done:]
+            finally:
+                if worker.is_alive():
+                    worker.kill()
+                worker.join()
+        return errors
+
+    @staticmethod
+    def _wait(worker, results, ligand, limit):
+        """The worker's error for `ligand` (None on success), TIMED_OUT past `limit`"""
+        deadline = None if limit is None else time.monotonic() + limit
+        while True:
+            try:
+                done, error = results.get(timeout=1.0)
+                return error if done == ligand else f"unexpected result for {done}"
+            except queue.Empty:
+                if not worker.is_alive() and results.empty():
+                    return f"Vina bindings worker exited ({worker.exitcode})"
+                if deadline is not None and time.monotonic() >= deadline:
+                    return TIMED_OUT
+
+
+BACKENDS = {backend.name: backend for backend in (SubprocessBackend, BatchBackend, BindingsBackend)}
+
+
+def select_backend(choice, executable):
+    """
+    Backend instance for `choice` ('auto', 'subprocess', 'batch', 'bindings').
+    'auto' prefers bindings, then --batch, then one process per ligand.
+    """
+    if choice != "auto":
+        return BACKENDS[choice](executable)
+    for name in ("bindings", "batch", "subprocess"):
+        backend = BACKENDS[name](executable)
+        if backend.available():
+            return backend
+    return SubprocessBackend(executable)
+
+
+def dock_with_fallback(backend, receptor, jobs, params, cpu=None, timeout=2400):
+    """
+    Dock with `backend`, re-running any ligand it failed on through the
+    per-ligand subprocess backend. Returns {ligand: error message or None}.
+    """
+    try:
+        errors = backend.dock_many(receptor, jobs, params, cpu, timeout)
+    except Exception as e:
+        errors = {ligand: str(e) for ligand, _, _ in jobs}
+
+    # Timeouts are left to the caller's timeout policy
+    failed = [job for job in jobs if errors.get(job[0]) not in (None, TIMED_OUT)]
+    fallback = SubprocessBackend(backend.executable)
+    if failed and backend.name != fallback.name and fallback.available():
+        print(f"    ↩️  {backend.name} backend failed for {len(failed)} ligand(s) - "
+              f"falling back to one Vina process per ligand")
+        errors.update(fallback.dock_many(receptor, failed, params, cpu, timeout))
+    return errors
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache for AutoDock Vina results.
+
+Entries are keyed on a SHA-256 of the receptor file, the ligand file and every
+docking parameter, so a re-run with unchanged inputs reuses the stored
+`_all_poses.pdbqt` and log instead of starting Vina again.
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+POSES_FILE = "all_poses.pdbqt"
+LOG_FILE = "docking.log"
+
+
+def hash_file(path, h=None):
+    """Feed a file into a hashlib object in 1 MB blocks"""
+    h = h or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h
+
+
+class DockingCache:
+    """Persistent Vina result store with size-based (least recently used) eviction"""
+
+    def __init__(self, cache_dir=".vina_cache", max_mb=2048):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    def key(self, receptor, ligand, params):
+        """Hash of receptor bytes, ligand bytes and the sorted parameter dict"""
+        h = hashlib.sha256()
+        for path in (receptor, ligand):
+            hash_file(path, h)
+            h.update(b'\0')
+        h.update(json.dumps(params, sort_keys=True).encode())
+        return h.hexdigest()
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key, all_poses_pdbqt, log_file):
+        """Copy a cached result to the requested paths; False on a miss"""
+        entry = self.entry_dir(key)
+        cached_poses = os.path.join(entry, POSES_FILE)
+        cached_log = os.path.join(entry, LOG_FILE)
+        if not (os.path.isfile(cached_poses) and os.path.isfile(cached_log)):
+            return False
+        shutil.copyfile(cached_poses, all_poses_pdbqt)
+        shutil.copyfile(cached_log, log_file)
+        # Touch the entry so eviction treats it as recently used
+        os.utime(entry, None)
+        return True
+
+    def put(self, key, all_poses_pdbqt, log_file):
+        """Store a finished Vina result, then evict down to the size limit"""
+        entry = self.entry_dir(key)
+        if os.path.isdir(entry):
+            return
+        parent = os.path.dirname(entry)
+        os.makedirs(parent, exist_ok=True)
+        # Build the entry beside its final location and rename it into place,
+        # so parallel workers never see a half-written entry
+        staging = tempfile.mkdtemp(prefix=".tmp_", dir=parent)
+        shutil.copyfile(all_poses_pdbqt, os.path.join(staging, POSES_FILE))
+        shutil.copyfile(log_file, os.path.join(staging, LOG_FILE))
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            # Another worker stored the same key first
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """(mtime, size, path) for every complete cache entry"""
+        found = []
+        if not os.path.isdir(self.cache_dir):
+            return found
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                entry = os.path.join(prefix_dir, name)
+                if name.startswith(".tmp_") or not os.path.isdir(entry):
+                    continue
+                size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+                found.append((os.path.getmtime(entry), size, entry))
+        return found
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
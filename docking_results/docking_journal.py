@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Append-only journal for resumable docking campaigns.
+
+Each line of the journal is one JSON record of a ligand moving through
+queued -> docking -> docked -> split -> converted. Records for docked, split
+and converted carry SHA-256 checksums of the files written at that step, so a
+restarted run can tell finished ligands from ones whose outputs are missing
+or were left half-written.
+
+Every record also carries a hash of the receptor and docking parameters
+(like DockingCache keys), so a run with a different box or exhaustiveness
+doesn't resume from another parameter set's outputs.
+"""
+import os
+import json
+import time
+import hashlib
+
+from docking_cache import hash_file
+
+JOURNAL_NAME = "docking_journal.jsonl"
+STATES = ("queued", "docking", "docked", "split", "converted")
+
+
+def parameter_key(params=None, receptor=None):
+    """Short hash of the receptor bytes and the sorted docking parameter dict"""
+    h = hashlib.sha256()
+    if receptor and os.path.isfile(receptor):
+        hash_file(receptor, h)
+    h.update(b'\0')
+    h.update(json.dumps(params or {}, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+
+class DockingJournal:
+    """Replayable per-ligand state log kept in the docking output directory"""
+
+    def __init__(self, output_dir, params=None, receptor=None):
+        self.path = os.path.join(output_dir, JOURNAL_NAME)
+        self.params_key = parameter_key(params, receptor)
+
+    def record(self, ligand, state, files=None, **extra):
+        """Append one state transition, with checksums of `files`"""
+        if state not in STATES:
+            raise ValueError(f"Unknown journal state: {state}")
+        entry = {'ligand': ligand, 'params': self.params_key, 'state': state, 'time': time.time()}
+        if files:
+            entry['files'] = {path: hash_file(path).hexdigest() for path in files}
+        entry.update(extra)
+        line = (json.dumps(entry) + '\n').encode()
+        # One write() on an O_APPEND descriptor keeps lines from parallel
+        # workers whole; fsync so the record survives a container restart
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def replay(self):
+        """(ligand, parameter key) -> {state: latest record}, skipping a torn final line"""
+        history = {}
+        if not os.path.exists(self.path):
+            return history
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                ligand_history = history.setdefault((entry['ligand'], entry.get('params')), {})
+                if entry['state'] == "docking":
+                    # A new Vina run invalidates everything recorded before it
+                    ligand_history.clear()
+                ligand_history[entry['state']] = entry
+        return history
+
+    def ligand_history(self, ligand, history=None):
+        """{state: latest record} for `ligand` under this journal's parameters"""
+        if history is None:
+            history = self.replay()
+        return history.get((ligand, self.params_key), {})
+
+    @staticmethod
+    def files_intact(entry):
+        """True if every file recorded in `entry` exists with the same checksum"""
+        for path, digest in entry.get('files', {}).items():
+            if not os.path.isfile(path) or hash_file(path).hexdigest() != digest:
+                return False
+        return True
+
+    def resume_point(self, ligand, history=None):
+        """
+        Where a restarted run should pick this ligand up:
+        'converted' (nothing to do), 'docked' (re-split only) or None (redo).
+        """
+        ligand_history = self.ligand_history(ligand, history)
+        for state in ("converted", "docked"):
+            entry = ligand_history.get(state)
+            if entry is None:
+                continue
+            checks = [entry]
+            if state == "converted":
+                checks += [ligand_history[s] for s in ("docked", "split") if s in ligand_history]
+            if all(self.files_intact(e) for e in checks):
+                return state
+        return None
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Per-ligand docking telemetry.
+
+The docking driver appends one JSON Lines record per docking job to
+`docking_telemetry.jsonl` in its output directory: ligand size (heavy atoms,
+TORSDOF), exhaustiveness, Vina wall time, child CPU time from
+resource.getrusage, the peak RSS of the Vina processes the job reaped (from
+os.wait4), exit code, pose count and split/convert time. Records carry the
+run id of the driver invocation that wrote them; two-stage screening jobs are
+marked stage "screen".
+
+Summarise a run (throughput and slowest ligands):
+    python docking_telemetry.py Top10_compounds_docking/docking_telemetry.jsonl
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+
+TELEMETRY_NAME = "docking_telemetry.jsonl"
+
+# JobTimers open in this process; record_child_usage() reports to them
+_active_timers = []
+
+
+def maxrss_mb(usage):
+    """ru_maxrss of a resource usage struct in MB"""
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+
+
+def rusage_children():
+    """CPU seconds of the waited-for children of this process"""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def record_child_usage(usage):
+    """Report one reaped child's rusage (from os.wait4) to the open JobTimers"""
+    for timer in _active_timers:
+        timer.peak_rss_mb = max(timer.peak_rss_mb or 0, maxrss_mb(usage))
+
+
+class JobTimer:
+    """
+    Wall clock and child CPU time spent inside a `with` block, plus the peak
+    RSS of the children reaped in it (None if none reported their usage).
+    RUSAGE_CHILDREN's ru_maxrss is a lifetime maximum, so the peak comes from
+    record_child_usage() instead.
+    """
+
+    def __enter__(self):
+        self.start = time.time()
+        self._wall = time.perf_counter()
+        self._cpu = rusage_children()
+        self.peak_rss_mb = None
+        _active_timers.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _active_timers.remove(self)
+        self.wall_s = time.perf_counter() - self._wall
+        self.cpu_s = rusage_children() - self._cpu
+        return False
+
+
+class TelemetryWriter:
+    """Appends telemetry records to a JSON Lines file (safe across pool workers)"""
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, TELEMETRY_NAME)
+        # Pool workers get a pickled copy, so one driver run shares one id
+        self.run_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+    def write(self, record):
+        line = (json.dumps(dict(record, run_id=self.run_id)) + '\n').encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+def load_records(path):
+    """All complete records of a telemetry file"""
+    records = []
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def summarize(records, top=5):
+    """Throughput figures plus the slowest ligands"""
+    docked = [r for r in records if r.get('vina_wall_s') is not None]
+    if not records:
+        return {}
+    # Elapsed time is the sum of each run's span, so gaps between reruns of
+    # the same output directory don't count
+    runs = {}
+    for r in records:
+        runs.setdefault(r.get('run_id'), []).append(r)
+    elapsed_s = sum(max(r['end'] for r in run) - min(r['start'] for r in run) for run in runs.values())
+    elapsed_h = max(elapsed_s, 1e-9) / 3600
+    cpu_h = sum(r.get('vina_cpu_s') or 0 for r in records) / 3600
+    poses = sum(r.get('poses', 0) for r in records)
+
+    walls = [r['vina_wall_s'] for r in docked]
+    median = statistics.median(walls) if walls else 0.0
+    mad = statistics.median(abs(w - median) for w in walls) if walls else 0.0
+    slowest = sorted(docked, key=lambda r: r['vina_wall_s'], reverse=True)[:top]
+
+    return {
+        'jobs': len(records),
+        'runs': len(runs),
+        'screening_jobs': sum(1 for r in records if r.get('stage') == "screen"),
+        'docked_with_vina': len(docked),
+        'cache_hits': sum(1 for r in records if r.get('cache_hit')),
+        'failed': sum(1 for r in records if not r.get('success')),
+        'elapsed_h': elapsed_h,
+        'ligands_per_hour': len(records) / elapsed_h,
+        'poses': poses,
+        'vina_cpu_h': cpu_h,
+        'poses_per_cpu_hour': poses / cpu_h if cpu_h > 0 else None,
+        'median_vina_wall_s': median,
+        'split_convert_s': sum(r.get('split_convert_s') or 0 for r in records),
+        'peak_rss_mb': max((r.get('peak_rss_mb') or 0 for r in records), default=0),
+        'timeouts': sum(r.get('timeouts', 0) for r in records),
+        'slowest': slowest,
+        # More than 3 MADs above the median counts as an outlier
+        'outliers': [r for r in docked if mad > 0 and r['vina_wall_s'] > median + 3 * mad],
+    }
+
+
+def print_summary(summary):
+    """Console report in the style of the docking driver"""
+    print("📈 Docking Telemetry Summary")
+    print("=" * 60)
+    print(f"   Jobs: {summary['jobs']} ({summary['docked_with_vina']} ran Vina, "
+          f"{summary['cache_hits']} cache hits, {summary['failed']} failed, "
+          f"{summary['screening_jobs']} screening)")
+    print(f"   Elapsed: {summary['elapsed_h']:.2f} h over {summary['runs']} run(s)")
+    print(f"   Throughput: {summary['ligands_per_hour']:.1f} ligands/hour")
+    per_cpu_h = summary['poses_per_cpu_hour']
+    print(f"   Poses: {summary['poses']} over {summary['vina_cpu_h']:.2f} Vina CPU-hours "
+          f"({'n/a' if per_cpu_h is None else f'{per_cpu_h:.1f}'} poses/CPU-hour)")
+    print(f"   Median Vina wall time: {summary['median_vina_wall_s']:.1f} s")
+    print(f"   Split + convert total: {summary['split_convert_s']:.2f} s")
+    print(f"   Peak Vina RSS: {summary['peak_rss_mb']:.0f} MB")
+    print(f"   Timeouts: {summary['timeouts']}")
+
+    print(f"\n🐢 Slowest ligands:")
+    for r in summary['slowest']:
+        flag = "  ⚠️ outlier" if r in summary['outliers'] else ""
+        print(f"   {r['ligand']}: {r['vina_wall_s']:.1f} s wall, {r.get('vina_cpu_s') or 0:.1f} s CPU, "
+              f"{r.get('heavy_atoms')} heavy atoms, {r.get('torsions')} torsions, "
+              f"exhaustiveness {r.get('exhaustiveness')}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise docking telemetry (JSON Lines)")
+    parser.add_argument("telemetry", nargs="?", default=os.path.join("Top10_compounds_docking", TELEMETRY_NAME),
+                        help="Telemetry file written by vina_docking_params.py")
+    parser.add_argument("--top", type=int, default=5, help="How many slowest ligands to list")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.telemetry):
+        print(f"❌ Telemetry file not found: {args.telemetry}")
+        sys.exit(1)
+
+    summary = summarize(load_records(args.telemetry), args.top)
+    if not summary:
+        print("⚠️  No telemetry records")
+        return
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
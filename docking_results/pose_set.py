@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Array-backed model of AutoDock Vina docking output.
+
+A PoseSet holds every pose of one ligand as NumPy arrays - coordinates
+(n_poses x n_atoms x 3, float32), per-atom names, AutoDock types and elements,
+and per-pose affinity / RMSD l.b. / RMSD u.b. from the `REMARK VINA RESULT`
+lines - so pose comparison and filtering run in memory. Writing the
+individual per-pose PDBQT/PDB files is an optional serializer on top.
+"""
+import os
+import re
+
+import numpy as np
+
+# Records kept in the per-pose PDBQT files
+POSE_PDBQT_RECORDS = ('ATOM', 'HETATM', 'ROOT', 'ENDROOT', 'BRANCH', 'ENDBRANCH', 'TORSDOF')
+MODEL_PATTERN = re.compile(r'MODEL\s+(\d+)')
+VINA_RESULT_PATTERN = re.compile(r'REMARK VINA RESULT:\s+(\S+)\s+(\S+)\s+(\S+)')
+
+# AutoDock atom type -> element
+AD_TYPE_ELEMENTS = {
+    'A': 'C', 'C': 'C', 'N': 'N', 'NA': 'N', 'NS': 'N', 'OA': 'O', 'OS': 'O',
+    'S': 'S', 'SA': 'S', 'H': 'H', 'HD': 'H', 'HS': 'H', 'F': 'F', 'P': 'P',
+    'Cl': 'Cl', 'CL': 'Cl', 'Br': 'Br', 'BR': 'Br', 'I': 'I',
+}
+
+
+def pdb_header(pose_num, score):
+    """REMARK block at the top of every clean pose PDB"""
+    return ("REMARK   Single pose from AutoDock Vina\n"
+            f"REMARK   Pose {pose_num} - Binding Affinity: {score} kcal/mol\n"
+            "REMARK   Clean PDB for Discovery Studio\n")
+
+
+def clean_pdb_atom_line(line, atom_counter):
+    """
+    Clean one PDBQT ATOM/HETATM line for PDB output.
+    Returns (clean_line, next_atom_counter).
+    """
+    # Remove PDBQT stuff from columns 67+
+    clean_line = line[:66].rstrip()
+
+    # Replace atom number with sequential counter
+    if len(clean_line) >= 11:
+        clean_line = clean_line[:6] + f"{atom_counter:5d}" + clean_line[11:]
+        atom_counter += 1
+
+    return clean_line, atom_counter
+
+
+def ad_type_to_element(ad_type):
+    """Element symbol for an AutoDock atom type"""
+    return AD_TYPE_ELEMENTS.get(ad_type, ad_type[:1].upper() + ad_type[1:2].lower())
+
+
+class PoseSet:
+    """All docked poses of one ligand as NumPy arrays"""
+
+    def __init__(self, coords, atom_names, atom_types, affinity, rmsd_lb, rmsd_ub,
+                 model_numbers=None, template=None, name=""):
+        self.coords = np.asarray(coords, dtype=np.float32)
+        self.atom_names = np.asarray(atom_names)
+        self.atom_types = np.asarray(atom_types)
+        self.elements = np.array([ad_type_to_element(t) for t in self.atom_types])
+        self.affinity = np.asarray(affinity, dtype=np.float32)
+        self.rmsd_lb = np.asarray(rmsd_lb, dtype=np.float32)
+        self.rmsd_ub = np.asarray(rmsd_ub, dtype=np.float32)
+        if model_numbers is None:
+            model_numbers = np.arange(1, len(self.coords) + 1)
+        self.model_numbers = np.asarray(model_numbers, dtype=np.int32)
+        # Stripped PDBQT record lines of one pose (ATOM coordinates get
+        # substituted per pose) - only needed for the file serializers
+        self.template = template
+        self.name = name
+
+    def __len__(self):
+        return self.coords.shape[0]
+
+    def __repr__(self):
+        return f"PoseSet({self.name!r}, poses={len(self)}, atoms={self.n_atoms})"
+
+    @property
+    def n_atoms(self):
+        return self.coords.shape[1]
+
+    @property
+    def heavy_mask(self):
+        return self.elements != 'H'
+
+    @classmethod
+    def from_vina_output(cls, path):
+        """Parse a multi-model Vina PDBQT in one pass"""
+        coords, affinity, rmsd_lb, rmsd_ub, model_numbers = [], [], [], [], []
+        atom_names, atom_types, template = [], [], []
+        pose = None
+
+        with open(path, 'r') as f:
+            for line in f:
+                match = MODEL_PATTERN.search(line)
+                if match:
+                    pose = []
+                    coords.append(pose)
+                    model_numbers.append(int(match.group(1)))
+                    affinity.append(np.nan)
+                    rmsd_lb.append(np.nan)
+                    rmsd_ub.append(np.nan)
+                    continue
+                if pose is None:
+                    continue
+                line = line.strip()
+                if line.startswith(('ATOM', 'HETATM')):
+                    pose.append((float(line[30:38]), float(line[38:46]), float(line[46:54])))
+                    if len(coords) == 1:
+                        atom_names.append(line[12:16].strip())
+                        atom_types.append(line.split()[-1])
+                if line.startswith(POSE_PDBQT_RECORDS) and len(coords) == 1:
+                    template.append(line)
+                elif line.startswith('REMARK VINA RESULT'):
+                    result = VINA_RESULT_PATTERN.match(line)
+                    if result:
+                        affinity[-1], rmsd_lb[-1], rmsd_ub[-1] = map(float, result.groups())
+                elif line.startswith('ENDMDL'):
+                    pose = None
+
+        n_atoms = len(atom_names)
+        for model_num, pose_coords in zip(model_numbers, coords):
+            if len(pose_coords) != n_atoms:
+                raise ValueError(f"{path}: model {model_num} has {len(pose_coords)} atoms, "
+                                 f"expected {n_atoms}")
+
+        return cls(np.array(coords, dtype=np.float32).reshape(len(coords), n_atoms, 3),
+                   atom_names, atom_types, affinity, rmsd_lb, rmsd_ub,
+                   model_numbers, template,
+                   name=os.path.basename(path).replace('_all_poses.pdbqt', ''))
+
+    def select(self, index):
+        """New PoseSet with the poses picked by a mask, slice or index array"""
+        return PoseSet(self.coords[index], self.atom_names, self.atom_types,
+                       self.affinity[index], self.rmsd_lb[index], self.rmsd_ub[index],
+                       self.model_numbers[index], self.template, self.name)
+
+    def filter(self, max_affinity=None, max_rmsd_lb=None):
+        """Poses at or below an affinity (kcal/mol) and/or RMSD l.b. cutoff"""
+        mask = np.ones(len(self), dtype=bool)
+        if max_affinity is not None:
+            mask &= self.affinity <= max_affinity
+        if max_rmsd_lb is not None:
+            mask &= self.rmsd_lb <= max_rmsd_lb
+        return self.select(mask)
+
+    def best(self, n=1):
+        """The n best-scoring poses"""
+        return self.select(np.argsort(self.affinity, kind='stable')[:n])
+
+    def centroids(self, heavy_only=True):
+        """(n_poses x 3) geometric centre of each pose"""
+        coords = self.coords[:, self.heavy_mask] if heavy_only else self.coords
+        return coords.mean(axis=1)
+
+    def distances_to(self, point, heavy_only=True):
+        """(n_poses,) closest atom distance from each pose to a point, e.g. SER79 OG"""
+        coords = self.coords[:, self.heavy_mask] if heavy_only else self.coords
+        diff = coords - np.asarray(point, dtype=np.float32)
+        return np.sqrt((diff * diff).sum(axis=2)).min(axis=1)
+
+    def rmsd_matrix(self, heavy_only=True):
+        """(n_poses x n_poses) in-place RMSD, no superposition (as Vina reports)"""
+        coords = self.coords[:, self.heavy_mask] if heavy_only else self.coords
+        diff = coords[:, None, :, :] - coords[None, :, :, :]
+        return np.sqrt((diff * diff).sum(axis=3).mean(axis=2))
+
+    def save(self, path):
+        """Store the arrays as a compressed .npz"""
+        np.savez_compressed(path, coords=self.coords, atom_names=self.atom_names,
+                            atom_types=self.atom_types, affinity=self.affinity,
+                            rmsd_lb=self.rmsd_lb, rmsd_ub=self.rmsd_ub,
+                            model_numbers=self.model_numbers,
+                            template=np.array(self.template or []), name=np.array(self.name))
+
+    @classmethod
+    def load(cls, path):
+        """Inverse of save()"""
+        with np.load(path) as data:
+            template = list(data['template']) or None
+            return cls(data['coords'], data['atom_names'], data['atom_types'],
+                       data['affinity'], data['rmsd_lb'], data['rmsd_ub'],
+                       data['model_numbers'], template, str(data['name']))
+
+    def pose_pdbqt_lines(self, i):
+        """Stripped PDBQT record lines of pose i (without newlines)"""
+        if not self.template:
+            raise ValueError("PoseSet has no PDBQT template to serialize from")
+        atom = 0
+        lines = []
+        for line in self.template:
+            if line.startswith(('ATOM', 'HETATM')):
+                x, y, z = self.coords[i, atom]
+                line = f"{line[:30]}{x:8.3f}{y:8.3f}{z:8.3f}{line[54:]}"
+                atom += 1
+            lines.append(line)
+        return lines
+
+    def write_individual_files(self, ligand_name, output_dir, scores=None):
+        """
+        Write `{ligand_name}_pose{n}_{score}kcal.pdbqt` and `.pdb` for every pose.
+        `scores` maps pose number -> score string (as from the Vina log);
+        by default the REMARK affinities are used. Returns [(pdbqt, pdb), ...].
+        """
+        individual_files = []
+        for i, model_num in enumerate(self.model_numbers):
+            model_num = int(model_num)
+            if scores is not None:
+                score = scores.get(model_num, "unknown")
+            else:
+                score = "unknown" if np.isnan(self.affinity[i]) else f"{self.affinity[i]:.1f}"
+            pose_pdbqt = os.path.join(output_dir, f"{ligand_name}_pose{model_num}_{score}kcal.pdbqt")
+            pose_pdb = pose_pdbqt.replace('.pdbqt', '.pdb')
+            lines = self.pose_pdbqt_lines(i)
+            with open(pose_pdbqt, 'w') as out:
+                out.writelines(line + '\n' for line in lines)
+            with open(pose_pdb, 'w') as out:
+                out.write(pdb_header(model_num, score))
+                atom_counter = 1
+                for line in lines:
+                    if line.startswith(('ATOM', 'HETATM')):
+                        clean_line, atom_counter = clean_pdb_atom_line(line, atom_counter)
+                        out.write(clean_line + '\n')
+                out.write("END\n")
+            individual_files.append((pose_pdbqt, pose_pdb))
+        return individual_files
@@ -2,10 +2,21 @@
 import os
 import subprocess
 import sys
+import time
 import re
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-# Vina executable path
-vina_path = "/autogrow/autogrow/docking/docking_executables/vina/autodock_vina_1_1_2_linux_x86/bin/vina"
+from docking_backends import SubprocessBackend, BACKENDS, TIMED_OUT, select_backend, dock_with_fallback
+from docking_cache import DockingCache
+from docking_journal import DockingJournal
+from docking_telemetry import JobTimer, TelemetryWriter
+from pose_set import (PoseSet, POSE_PDBQT_RECORDS, MODEL_PATTERN, pdb_header, clean_pdb_atom_line,
+                      ad_type_to_element)
+
+# Vina executable path (VINA_EXECUTABLE overrides it, e.g. to point at a stub)
+vina_path = os.environ.get("VINA_EXECUTABLE",
+                           "/autogrow/autogrow/docking/docking_executables/vina/autodock_vina_1_1_2_linux_x86/bin/vina")
 
 # Docking parameters
 center_x = 17.254
@@ -14,6 +25,34 @@ center_z = 20.083
 size_x = size_y = size_z = 25
 exhaustiveness = 8
 num_modes = 5
+energy_range = 3
+
+# Two-stage mode (--two-stage): cheap screen of every ligand, then a full
+# exhaustiveness re-dock of the top-K and/or those at or below the cutoff
+screen_exhaustiveness = 2
+refine_top_k = 3
+refine_cutoff = None  # kcal/mol, e.g. -7.0
+
+# Vina timeouts scale with ligand size and flexibility (seconds at
+# exhaustiveness 8 with >= 8 CPUs), clamped to [timeout_min, timeout_max]
+timeout_base = 120
+timeout_per_heavy_atom = 10
+timeout_per_torsion = 180
+timeout_min = 300
+timeout_max = 4 * 3600
+# What to do when Vina times out: kill (give up on the ligand), retry (halve
+# exhaustiveness up to max_timeout_retries times) or straggler (re-run after
+# everything else, with all cores and straggler_timeout_factor x the limit)
+timeout_policy = "straggler"
+max_timeout_retries = 2
+straggler_timeout_factor = 3
+
+# Docking backend (see docking_backends.py): subprocess, batch, bindings or auto
+docking_backend = "subprocess"
+
+# Result cache (see docking_cache.py)
+cache_dir = ".vina_cache"
+cache_max_mb = 2048
 
 # Receptor file
 receptor = "target.pdbqt"
@@ -34,47 +73,215 @@ def create_output_directory():
         print(f"✅ Using existing output directory: {output_dir}")
     return output_dir
 
-def run_vina_docking(ligand, output_dir):
-    """Run Vina docking to get all poses in one PDBQT file"""
+def docking_parameters():
+    """Everything besides the input files that determines Vina's output"""
+    return {
+        'vina': os.path.basename(vina_path),
+        'center': [center_x, center_y, center_z],
+        'size': [size_x, size_y, size_z],
+        'exhaustiveness': exhaustiveness,
+        'num_modes': num_modes,
+        'energy_range': energy_range,
+    }
+
+def count_heavy_atoms(ligand):
+    """Non-hydrogen ATOM/HETATM records in a ligand PDBQT (0 if unreadable)"""
+    heavy = 0
+    try:
+        with open(ligand, 'r') as f:
+            for line in f:
+                if line.startswith(('ATOM', 'HETATM')) and ad_type_to_element(line.split()[-1]) != 'H':
+                    heavy += 1
+    except (OSError, IndexError):
+        pass
+    return heavy
+
+def estimate_timeout(ligand, exh=None, cpu=None, scale=1.0):
+    """
+    Vina time limit for one ligand from heavy-atom count and TORSDOF.
+    Vina runs one Monte Carlo chain per exhaustiveness unit on
+    min(cpu, exhaustiveness) threads, so wall time scales with their ratio.
+    """
+    exh = exh or exhaustiveness
+    threads = min(cpu or exh, exh)
+    seconds = (timeout_base
+               + timeout_per_heavy_atom * count_heavy_atoms(ligand)
+               + timeout_per_torsion * count_torsions(ligand))
+    seconds *= exh / threads
+    return max(timeout_min, min(timeout_max, seconds * scale))
+
+def output_paths(ligand, output_dir):
+    """Where Vina writes a ligand's poses and log"""
     ligand_name = os.path.splitext(ligand)[0]
+    return (os.path.join(output_dir, f"{ligand_name}_all_poses.pdbqt"),
+            os.path.join(output_dir, f"{ligand_name}_docking.log"))
+
+def cache_lookup(cache, ligand, all_poses_pdbqt, log_file, backend_name="subprocess", params=None):
+    """
+    Serve a ligand from the result cache.
+    Returns (hit, key); key is None when the cache is off or unusable.
+    """
+    if cache is None:
+        return False, None
+    params = dict(params or docking_parameters())
+    if backend_name != "subprocess":
+        # Vina 1.2 engines don't reproduce 1.1.2 results - keep them apart
+        params['backend'] = backend_name
+    try:
+        key = cache.key(receptor, ligand, params)
+        if cache.get(key, all_poses_pdbqt, log_file):
+            print(f"\n♻️  Cache hit for {ligand} ({key[:12]}) - skipping Vina")
+            return True, key
+        return False, key
+    except OSError as e:
+        print(f"    ⚠️  Cache unavailable: {e}")
+        return False, None
+
+def cache_store(cache, key, all_poses_pdbqt, log_file):
+    """Add a fresh Vina result to the cache"""
+    if cache is None or key is None:
+        return
+    try:
+        cache.put(key, all_poses_pdbqt, log_file)
+    except OSError as e:
+        print(f"    ⚠️  Could not cache result: {e}")
+
+def run_vina_docking(ligand, output_dir, cpu=None, cache=None, params=None, timeout=None, events=None,
+                     info=None):
+    """Run Vina docking to get all poses in one PDBQT file
+
+    ``cpu`` is passed to Vina as ``--cpu``; None lets Vina use every core.
+    With a DockingCache, unchanged inputs are served from disk without Vina.
+    ``params`` overrides docking_parameters(), e.g. for a screening pass.
+    ``timeout`` defaults to estimate_timeout(); a timeout kills Vina's process
+    group and appends an event dict to ``events``.
+    ``info`` (a dict) receives the exit code and whether the cache answered.
+    """
+    info = {} if info is None else info
+    params = params or docking_parameters()
     
     # Vina outputs all poses to one file
-    all_poses_pdbqt = os.path.join(output_dir, f"{ligand_name}_all_poses.pdbqt")
-    log_file = os.path.join(output_dir, f"{ligand_name}_docking.log")
-    
-    vina_cmd = [
-        vina_path,
-        "--receptor", receptor,
-        "--ligand", ligand,
-        "--center_x", str(center_x),
-        "--center_y", str(center_y),
-        "--center_z", str(center_z),
-        "--size_x", str(size_x),
-        "--size_y", str(size_y),
-        "--size_z", str(size_z),
-        "--out", all_poses_pdbqt,
-        "--log", log_file,
-        "--exhaustiveness", str(exhaustiveness),
-        "--num_modes", str(num_modes),
-        "--energy_range", "3"
-    ]
-    
-    print(f"\n🔄 Running Vina docking: {ligand}")
+    all_poses_pdbqt, log_file = output_paths(ligand, output_dir)
+    
+    hit, cache_key = cache_lookup(cache, ligand, all_poses_pdbqt, log_file, params=params)
+    info['cache_hit'] = hit
+    if hit:
+        return all_poses_pdbqt, log_file
+    
+    if timeout is None:
+        timeout = estimate_timeout(ligand, params['exhaustiveness'], cpu)
+    print(f"\n🔄 Running Vina docking: {ligand} (timeout {timeout:.0f}s)")
     
     try:
-        result = subprocess.run(vina_cmd, capture_output=True, text=True, timeout=2400)
+        result = SubprocessBackend(vina_path).dock_one(receptor, ligand, all_poses_pdbqt, log_file,
+                                                       params, cpu, timeout=timeout)
+        info['exit_code'] = result.returncode
         
         if result.returncode == 0:
             print(f"    ✅ Vina docking completed")
+            cache_store(cache, cache_key, all_poses_pdbqt, log_file)
             return all_poses_pdbqt, log_file
         else:
             print(f"    ❌ Vina failed: {result.stderr}")
             return None, None
+    
+    except subprocess.TimeoutExpired:
+        info['exit_code'] = -9
+        print(f"    ⏱️  Vina timed out after {timeout:.0f}s - process group killed")
+        if events is not None:
+            events.append({'ligand': ligand, 'timeout_s': round(timeout),
+                           'exhaustiveness': params['exhaustiveness'], 'action': 'killed'})
+        return None, None
             
     except Exception as e:
         print(f"    ❌ Error: {str(e)}")
         return None, None
 
+def run_batch_vina_docking(ligands, output_dir, backend, cpu=None, cache=None, journal=None, params=None,
+                           stats=None, on_timeout="kill", timeout_scale=1.0, events=None):
+    """
+    Dock several ligands through a batch-capable backend in one go, so the
+    receptor and grid are set up once. Failed ligands fall back to one Vina
+    process each. Returns {ligand: (all_poses_pdbqt, log_file) or (None, None)}.
+    `stats` (a dict) receives per-ligand telemetry with the batch's wall and
+    CPU time apportioned evenly.
+    Each ligand gets estimate_timeout() and a batch process the sum of its
+    ligands' limits. Ligands that time out go through `on_timeout` (kill /
+    retry / straggler) as a smaller batch; their events are appended to
+    `events[ligand]`.
+    """
+    stats = {} if stats is None else stats
+    events = {} if events is None else events
+    params = params or docking_parameters()
+    outputs = {}
+    jobs = []
+    keys = {}
+    for ligand in ligands:
+        all_poses_pdbqt, log_file = output_paths(ligand, output_dir)
+        hit, keys[ligand] = cache_lookup(cache, ligand, all_poses_pdbqt, log_file, backend.name, params)
+        if hit:
+            outputs[ligand] = (all_poses_pdbqt, log_file)
+            stats[ligand] = {'cache_hit': True}
+        else:
+            jobs.append((ligand, all_poses_pdbqt, log_file))
+    
+    if jobs:
+        print(f"\n🔄 Running {backend.name} backend on {len(jobs)} ligands (one receptor/box setup)")
+        if journal:
+            for ligand, _, _ in jobs:
+                journal.record(ligand, "docking")
+        errors = {}
+        used_exh = {}
+        pending = jobs
+        exh, run_cpu, scale, policy, retries = params['exhaustiveness'], cpu, timeout_scale, on_timeout, 0
+        with JobTimer() as timer:
+            while pending:
+                limits = {lig: estimate_timeout(lig, exh, run_cpu, scale) for lig, _, _ in pending}
+                errors.update(dock_with_fallback(backend, receptor, pending, dict(params, exhaustiveness=exh),
+                                                 run_cpu, timeout=limits))
+                used_exh.update((lig, exh) for lig, _, _ in pending)
+                pending = [job for job in pending if errors[job[0]] == TIMED_OUT]
+                if not pending:
+                    break
+                
+                tried_exh = exh
+                if policy == "retry" and exh > 1 and retries < max_timeout_retries:
+                    exh = max(1, exh // 2)
+                    retries += 1
+                    action = f"retried at exhaustiveness {exh}"
+                elif policy == "straggler":
+                    # The rest of the batch is done, so the straggler pass is now
+                    run_cpu, scale, policy = None, scale * straggler_timeout_factor, "kill"
+                    action = "rescheduled as straggler"
+                else:
+                    action = "killed"
+                for ligand, _, _ in pending:
+                    print(f"    ⏱️  {ligand} timed out after {limits[ligand]:.0f}s → {action}")
+                    events.setdefault(ligand, []).append({'ligand': ligand, 'timeout_s': round(limits[ligand]),
+                                                          'exhaustiveness': tried_exh, 'action': action})
+                if action == "killed":
+                    break
+        for ligand, all_poses_pdbqt, log_file in jobs:
+            stats[ligand] = {'cache_hit': False, 'batch_size': len(jobs), 'exhaustiveness': used_exh[ligand],
+                             'vina_wall_s': timer.wall_s / len(jobs), 'vina_cpu_s': timer.cpu_s / len(jobs),
+                             'peak_rss_mb': timer.peak_rss_mb, 'exit_code': 0 if errors.get(ligand) is None else 1}
+            if errors.get(ligand) is None and os.path.exists(all_poses_pdbqt):
+                print(f"    ✅ Docked {ligand}")
+                # A retry's reduced search isn't the result `keys` describes
+                if used_exh[ligand] == params['exhaustiveness']:
+                    cache_store(cache, keys[ligand], all_poses_pdbqt, log_file)
+                if journal:
+                    journal.record(ligand, "docked", files=[all_poses_pdbqt, log_file])
+                outputs[ligand] = (all_poses_pdbqt, log_file)
+            else:
+                print(f"    ❌ Vina failed for {ligand}: {errors.get(ligand)}")
+                outputs[ligand] = (None, None)
+    
+    return outputs
+
+# Vina log result table row: mode, affinity, rmsd l.b., rmsd u.b.
+LOG_ROW_PATTERN = re.compile(r'^\s*(\d+)\s+(-?\d+\.\d+)\s+\d+\.\d+\s+\d+\.\d+\s*$')
+
 def extract_pose_scores(log_file):
     """Extract binding scores for each pose"""
     scores = {}
@@ -82,104 +289,108 @@ def extract_pose_scores(log_file):
         with open(log_file, 'r') as f:
             content = f.read()
         
+        # Result table rows: "   1         -7.2      0.000      0.000"
         for line in content.split('\n'):
-            if re.match(r'^\s*\d+\s+[-\d\.]+', line) and 'kcal/mol' in line:
-                parts = line.split()
-                if len(parts) >= 2:
-                    pose_num = int(parts[0])
-                    score = parts[1]
-                    scores[pose_num] = score
+            match = LOG_ROW_PATTERN.match(line)
+            if match:
+                scores[int(match.group(1))] = match.group(2)
         
         return scores
     except Exception as e:
         print(f"    ⚠️  Error reading scores: {e}")
         return {}
 
+class _PoseWriter:
+    """Writes one pose's PDBQT and clean PDB side by side while streaming"""
+    
+    def __init__(self, ligand_name, output_dir, model_num, score):
+        self.model_num = model_num
+        self.score = score
+        self.pdbqt_path = os.path.join(output_dir, f"{ligand_name}_pose{model_num}_{score}kcal.pdbqt")
+        self.pdb_path = self.pdbqt_path.replace('.pdbqt', '.pdb')
+        self.pdbqt = open(self.pdbqt_path, 'w')
+        self.pdb = open(self.pdb_path, 'w')
+        self.pdb.write(pdb_header(model_num, score))
+        self.atom_count = 0
+        self.atom_counter = 1
+        self.ended = False
+    
+    def add(self, line):
+        """Feed one raw line of this model (ignored after ENDMDL)"""
+        if self.ended:
+            return
+        line = line.strip()
+        if line.startswith(POSE_PDBQT_RECORDS):
+            self.pdbqt.write(line + '\n')
+            if line.startswith(('ATOM', 'HETATM')):
+                self.atom_count += 1
+                clean_line, self.atom_counter = clean_pdb_atom_line(line, self.atom_counter)
+                self.pdb.write(clean_line + '\n')
+        elif line.startswith('ENDMDL'):
+            self.ended = True
+    
+    def close(self):
+        """Finish both files; returns True if the pose had any atoms"""
+        self.pdb.write("END\n")
+        self.pdbqt.close()
+        self.pdb.close()
+        if self.atom_count > 0:
+            print(f"    📄 Created: {os.path.basename(self.pdbqt_path)} ({self.atom_count} atoms)")
+            print(f"    🎯 Converted: {os.path.basename(self.pdb_path)}")
+            return True
+        print(f"    ❌ Pose {self.model_num}: No atoms found")
+        for path in (self.pdbqt_path, self.pdb_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return False
+
 def split_poses_to_individual_files(all_poses_pdbqt, ligand_name, output_dir, scores):
     """
     Split the multi-model PDBQT into individual PDBQT files (one per pose)
-    Then convert each to clean PDB
+    and clean PDB files, in one line-at-a-time pass over the Vina output
     """
+    individual_files = []
+    pose = None
     try:
         with open(all_poses_pdbqt, 'r') as f:
-            content = f.read()
-        
-        # Split by MODEL keyword
-        models = re.split(r'MODEL\s+(\d+)', content)
+            for line in f:
+                match = MODEL_PATTERN.search(line)
+                if match:
+                    if pose is not None and pose.close():
+                        individual_files.append((pose.pdbqt_path, pose.pdb_path))
+                    model_num = int(match.group(1))
+                    # Get binding score
+                    pose = _PoseWriter(ligand_name, output_dir, model_num, scores.get(model_num, "unknown"))
+                    line = line[match.end():]
+                if pose is not None:
+                    pose.add(line)
         
-        individual_files = []
-        
-        # Process each model (skip first empty element)
-        for i in range(1, len(models), 2):
-            if i + 1 >= len(models):
-                break
-                
-            model_num = int(models[i])
-            model_content = models[i + 1]
-            
-            # Get binding score
-            score = scores.get(model_num, "unknown")
-            
-            # Create individual PDBQT file for this pose
-            pose_pdbqt = os.path.join(output_dir, f"{ligand_name}_pose{model_num}_{score}kcal.pdbqt")
-            
-            with open(pose_pdbqt, 'w') as outfile:
-                # Write clean PDBQT content (just atoms, no MODEL/ENDMDL)
-                lines = model_content.split('\n')
-                atom_count = 0
-                
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith(('ATOM', 'HETATM', 'ROOT', 'ENDROOT', 'BRANCH', 'ENDBRANCH', 'TORSDOF')):
-                        outfile.write(line + '\n')
-                        if line.startswith(('ATOM', 'HETATM')):
-                            atom_count += 1
-                    elif line.startswith('ENDMDL'):
-                        break
-            
-            if atom_count > 0:
-                print(f"    📄 Created: {os.path.basename(pose_pdbqt)} ({atom_count} atoms)")
-                
-                # Now convert this individual PDBQT to clean PDB
-                pose_pdb = pose_pdbqt.replace('.pdbqt', '.pdb')
-                convert_single_pdbqt_to_pdb(pose_pdbqt, pose_pdb, model_num, score)
-                
-                individual_files.append((pose_pdbqt, pose_pdb))
-            else:
-                print(f"    ❌ Pose {model_num}: No atoms found")
-                if os.path.exists(pose_pdbqt):
-                    os.remove(pose_pdbqt)
+        if pose is not None:
+            last, pose = pose, None
+            if last.close():
+                individual_files.append((last.pdbqt_path, last.pdb_path))
         
         return individual_files
         
     except Exception as e:
         print(f"    ❌ Error splitting poses: {str(e)}")
         return []
+    finally:
+        if pose is not None:
+            pose.pdbqt.close()
+            pose.pdb.close()
 
 def convert_single_pdbqt_to_pdb(pdbqt_file, pdb_file, pose_num, score):
     """Convert a single-pose PDBQT file to clean PDB"""
     try:
-        with open(pdbqt_file, 'r') as infile:
-            lines = infile.readlines()
-        
-        with open(pdb_file, 'w') as outfile:
+        with open(pdbqt_file, 'r') as infile, open(pdb_file, 'w') as outfile:
             # Clean PDB header
-            outfile.write("REMARK   Single pose from AutoDock Vina\n")
-            outfile.write(f"REMARK   Pose {pose_num} - Binding Affinity: {score} kcal/mol\n")
-            outfile.write("REMARK   Clean PDB for Discovery Studio\n")
+            outfile.write(pdb_header(pose_num, score))
             
             atom_counter = 1
-            for line in lines:
+            for line in infile:
                 if line.startswith(('ATOM', 'HETATM')):
-                    # Clean the line - remove PDBQT stuff from columns 67+
-                    clean_line = line[:66].rstrip()
-                    
-                    # Ensure proper atom numbering
-                    if len(clean_line) >= 11:
-                        # Replace atom number with sequential counter
-                        clean_line = clean_line[:6] + f"{atom_counter:5d}" + clean_line[11:]
-                        atom_counter += 1
-                    
+                    clean_line, atom_counter = clean_pdb_atom_line(line, atom_counter)
                     outfile.write(clean_line + '\n')
             
             outfile.write("END\n")
@@ -191,14 +402,413 @@ def convert_single_pdbqt_to_pdb(pdbqt_file, pdb_file, pose_num, score):
         print(f"    ❌ PDB conversion error: {e}")
         return False
 
-def main():
+def count_torsions(ligand):
+    """Read TORSDOF from a ligand PDBQT (0 if it can't be read)"""
+    try:
+        with open(ligand, 'r') as f:
+            for line in f:
+                if line.startswith('TORSDOF'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def order_by_torsions(ligands):
+    """Most flexible ligands first so the slowest Vina jobs don't start last"""
+    return sorted(ligands, key=count_torsions, reverse=True)
+
+def plan_cpu_budget(n_ligands, total_cpus=None, jobs=None, cpu_per_job=None):
+    """
+    Split a core budget between concurrent Vina jobs and each job's --cpu.
+    
+    Vina only parallelises over its Monte Carlo runs, so threads beyond
+    `exhaustiveness` sit idle - spare cores go to extra concurrent jobs instead.
+    When every ligand has its own job, the cores left over from the even split
+    go one each to the first `spare_cpus` jobs (see job_cpus()).
+    Returns (jobs, cpu_per_job, spare_cpus).
+    """
+    total_cpus = max(1, total_cpus or os.cpu_count() or 1)
+    n_ligands = max(1, n_ligands)
+    split_evenly = cpu_per_job is None
+    
+    if jobs is None and cpu_per_job is None:
+        jobs = min(n_ligands, total_cpus)
+    if cpu_per_job is None:
+        cpu_per_job = max(1, min(exhaustiveness, total_cpus // jobs))
+    if jobs is None:
+        jobs = max(1, min(n_ligands, total_cpus // cpu_per_job))
+    
+    spare_cpus = 0
+    if split_evenly and n_ligands <= jobs and cpu_per_job < exhaustiveness:
+        spare_cpus = max(0, min(jobs, total_cpus - jobs * cpu_per_job))
+    return jobs, cpu_per_job, spare_cpus
+
+def job_cpus(schedule, cpu_per_job, spare_cpus=0):
+    """--cpu per ligand: the first `spare_cpus` of the schedule (most torsions) get one more core"""
+    return {lig: cpu_per_job + (i < spare_cpus) for i, lig in enumerate(schedule)}
+
+def save_pose_arrays(all_poses_pdbqt, ligand_name, output_dir):
+    """Parse the Vina output into a PoseSet and store it as {ligand}_poses.npz"""
+    try:
+        poses = PoseSet.from_vina_output(all_poses_pdbqt)
+        npz_path = os.path.join(output_dir, f"{ligand_name}_poses.npz")
+        poses.save(npz_path)
+        print(f"    🧮 Saved pose arrays: {os.path.basename(npz_path)} "
+              f"({len(poses)} poses × {poses.n_atoms} atoms)")
+        return npz_path
+    except Exception as e:
+        print(f"    ⚠️  Could not build pose arrays: {e}")
+        return None
+
+def dock_ligand(ligand, output_dir, cpu=None, cache=None, journal=None, resume=None,
+                pose_arrays=False, docked=None, on_timeout=timeout_policy, timeout_scale=1.0,
+                telemetry=None, vina_stats=None, timeouts=None, converted=None):
+    """
+    Dock one ligand, split its poses and return a per-molecule summary.
+    
+    With a DockingJournal every step is recorded; `resume` is the ligand's
+    journal resume point ('converted' skips it, 'docked' skips Vina) and
+    `converted` the journal's 'converted' record of a finished ligand.
+    `pose_arrays` also stores the poses as a PoseSet .npz.
+    `docked` is an (all_poses_pdbqt, log_file) pair from a batch backend run.
+    `on_timeout` is the timeout policy (kill / retry / straggler); timeout
+    events are listed in summary['timeouts'].
+    `telemetry` (a TelemetryWriter) gets one record per docking job;
+    `vina_stats` carries the Vina-side figures of a batch backend run and
+    `timeouts` its timeout events for this ligand.
+    summary['best_affinity'] is the best score of the poses this call split
+    (None if it failed).
+    """
+    ligand_name = os.path.splitext(ligand)[0]
+    summary = {'ligand': ligand, 'success': False, 'poses': 0, 'best_affinity': None}
+    record = {'ligand': ligand, 'start': time.time(), 'heavy_atoms': count_heavy_atoms(ligand),
+              'torsions': count_torsions(ligand), 'exhaustiveness': exhaustiveness,
+              'vina_wall_s': None, 'vina_cpu_s': None, 'peak_rss_mb': None, 'exit_code': None,
+              'cache_hit': False, 'split_convert_s': None}
+    
+    if resume == "converted":
+        poses = (converted or {}).get('poses', 0)
+        print(f"\n⏭️  {ligand}: already converted ({poses} poses) - skipping")
+        summary.update(success=True, poses=poses, resumed=True,
+                       best_affinity=(converted or {}).get('best_affinity'))
+        return summary
+    
+    # Step 1: Run Vina docking
+    if docked is not None:
+        all_poses_pdbqt, log_file = docked
+        record.update(vina_stats or {})
+        if timeouts:
+            summary['timeouts'] = list(timeouts)
+    elif resume == "docked":
+        all_poses_pdbqt, log_file = output_paths(ligand, output_dir)
+        print(f"\n⏭️  {ligand}: docked output intact - re-splitting only")
+    else:
+        if journal:
+            journal.record(ligand, "docking")
+        info = {}
+        with JobTimer() as timer:
+            all_poses_pdbqt, log_file = dock_with_timeout_policy(ligand, output_dir, cpu, cache, summary,
+                                                                 on_timeout, timeout_scale, info)
+        record.update(info, exhaustiveness=summary.get('exhaustiveness', exhaustiveness))
+        if not info.get('cache_hit'):
+            record.update(vina_wall_s=timer.wall_s, vina_cpu_s=timer.cpu_s, peak_rss_mb=timer.peak_rss_mb)
+        if journal and all_poses_pdbqt and os.path.exists(all_poses_pdbqt):
+            journal.record(ligand, "docked", files=[all_poses_pdbqt, log_file])
+    
+    if all_poses_pdbqt and os.path.exists(all_poses_pdbqt):
+        # Step 2: Extract scores
+        scores = extract_pose_scores(log_file)
+        print(f"    📊 Extracted {len(scores)} pose scores")
+        
+        # Step 3: Split into individual files
+        with JobTimer() as timer:
+            individual_files = split_poses_to_individual_files(all_poses_pdbqt, ligand_name, output_dir, scores)
+        record['split_convert_s'] = timer.wall_s
+        if pose_arrays:
+            save_pose_arrays(all_poses_pdbqt, ligand_name, output_dir)
+        
+        if individual_files:
+            print(f"    ✅ Created {len(individual_files)} individual pose files")
+            summary['success'] = True
+            summary['poses'] = len(individual_files)
+            summary['best_affinity'] = best_affinity(all_poses_pdbqt)
+            if journal:
+                journal.record(ligand, "split", files=[pdbqt for pdbqt, _ in individual_files])
+                journal.record(ligand, "converted", files=[pdb for _, pdb in individual_files],
+                               poses=len(individual_files), best_affinity=summary['best_affinity'])
+        else:
+            print(f"    ❌ Failed to create individual files")
+    else:
+        print(f"    ❌ Docking failed for {ligand}")
+    
+    if telemetry is not None:
+        record.update(end=time.time(), success=summary['success'], poses=summary['poses'],
+                      timeouts=len(summary.get('timeouts', [])))
+        telemetry.write(record)
+    
+    return summary
+
+def dock_with_timeout_policy(ligand, output_dir, cpu, cache, summary, on_timeout, timeout_scale=1.0,
+                             info=None):
+    """
+    run_vina_docking() plus the timeout policy. Timeout events go into
+    summary['timeouts']; a ligand left for the straggler pass gets
+    summary['straggler'] = True. summary['exhaustiveness'] is the last one tried.
+    """
+    timeouts = summary.setdefault('timeouts', [])
+    exh = exhaustiveness
+    retries = 0
+    while True:
+        params = dict(docking_parameters(), exhaustiveness=exh)
+        timeout = estimate_timeout(ligand, exh, cpu, timeout_scale)
+        before = len(timeouts)
+        summary['exhaustiveness'] = exh
+        all_poses_pdbqt, log_file = run_vina_docking(ligand, output_dir, cpu, cache, params, timeout, timeouts,
+                                                     info)
+        if len(timeouts) == before:
+            return all_poses_pdbqt, log_file
+        
+        if on_timeout == "retry" and exh > 1 and retries < max_timeout_retries:
+            exh = max(1, exh // 2)
+            retries += 1
+            timeouts[-1]['action'] = f"retried at exhaustiveness {exh}"
+            print(f"    🔁 Retrying {ligand} at exhaustiveness {exh}")
+            continue
+        if on_timeout == "straggler":
+            timeouts[-1]['action'] = "rescheduled as straggler"
+            summary['straggler'] = True
+            print(f"    🐢 {ligand} will be re-run after the other ligands")
+        return None, None
+
+def run_stragglers(results, output_dir, cache=None, journal=None, pose_arrays=False, timeout_scale=1.0,
+                   telemetry=None):
+    """
+    Re-dock ligands that timed out under the straggler policy, one at a time
+    with every core and a longer limit. Updates `results` in place.
+    """
+    stragglers = [i for i, r in enumerate(results) if r.get('straggler')]
+    if not stragglers:
+        return
+    print(f"\n🐢 Straggler pass: {len(stragglers)} ligand(s), "
+          f"timeout × {straggler_timeout_factor}, all cores")
+    for i in stragglers:
+        earlier = results[i]
+        summary = dock_ligand(earlier['ligand'], output_dir, cpu=None, cache=cache, journal=journal,
+                              pose_arrays=pose_arrays, on_timeout="kill",
+                              timeout_scale=timeout_scale * straggler_timeout_factor, telemetry=telemetry)
+        summary['timeouts'] = earlier.get('timeouts', []) + summary.get('timeouts', [])
+        results[i] = summary
+
+def run_parallel_docking(ligands, output_dir, jobs, cpu_per_job, cache=None, journal=None, resume=None,
+                         converted=None, spare_cpus=0, **dock_options):
+    """
+    Dock ligands in a process pool, most torsions first.
+    Summaries come back in the original ligand order.
+    The first `spare_cpus` ligands of the schedule run with cpu_per_job + 1.
+    `resume` maps ligand -> journal resume point and `converted` ligand ->
+    'converted' record; `dock_options` go to dock_ligand().
+    """
+    resume = resume or {}
+    converted = converted or {}
+    schedule = order_by_torsions(ligands)
+    print(f"🗓️  Schedule (by TORSDOF): " + ", ".join(f"{lig}({count_torsions(lig)})" for lig in schedule))
+    cpus = job_cpus(schedule, cpu_per_job, spare_cpus)
+    
+    results = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(dock_ligand, lig, output_dir, cpus[lig], cache,
+                               journal, resume.get(lig), converted=converted.get(lig),
+                               **dock_options): lig for lig in schedule}
+        for done, future in enumerate(as_completed(futures), 1):
+            ligand = futures[future]
+            try:
+                results[ligand] = future.result()
+            except Exception as e:
+                print(f"    ❌ Worker error for {ligand}: {e}")
+                results[ligand] = {'ligand': ligand, 'success': False, 'poses': 0, 'best_affinity': None}
+            status = "✅" if results[ligand]['success'] else "❌"
+            print(f"{status} Finished {ligand} [{done}/{len(ligands)}]")
+    
+    return [results[lig] for lig in ligands]
+
+def run_batch_docking(ligands, output_dir, backend, cpu=None, cache=None, journal=None, resume=None,
+                      pose_arrays=False, telemetry=None, on_timeout=timeout_policy, timeout_scale=1.0,
+                      converted=None):
+    """Dock every unfinished ligand through one batch backend call, then split each"""
+    resume = resume or {}
+    converted = converted or {}
+    to_dock = [lig for lig in ligands if resume.get(lig) is None]
+    stats = {}
+    events = {}
+    docked = run_batch_vina_docking(to_dock, output_dir, backend, cpu, cache, journal, stats=stats,
+                                    on_timeout=on_timeout, timeout_scale=timeout_scale, events=events)
+    
+    results = []
+    for i, ligand in enumerate(ligands, 1):
+        print(f"\n📋 Post-processing {ligand} [{i}/{len(ligands)}]")
+        results.append(dock_ligand(ligand, output_dir, journal=journal, resume=resume.get(ligand),
+                                   pose_arrays=pose_arrays, docked=docked.get(ligand),
+                                   telemetry=telemetry, vina_stats=stats.get(ligand),
+                                   timeouts=events.get(ligand), converted=converted.get(ligand)))
+    return results
+
+def best_affinity(all_poses_pdbqt):
+    """Best (lowest) REMARK VINA RESULT affinity in a Vina output, or None"""
+    try:
+        poses = PoseSet.from_vina_output(all_poses_pdbqt)
+    except (OSError, ValueError):
+        return None
+    if len(poses) == 0:
+        return None
+    return float(poses.affinity.min())
+
+def write_screen_record(telemetry, ligand, params, start, outputs, stats=None, timeouts=0):
+    """Telemetry record of one stage-1 screening job (stage "screen", no poses split)"""
+    if telemetry is None:
+        return
+    record = {'ligand': ligand, 'stage': "screen", 'start': start, 'heavy_atoms': count_heavy_atoms(ligand),
+              'torsions': count_torsions(ligand), 'exhaustiveness': params['exhaustiveness'],
+              'vina_wall_s': None, 'vina_cpu_s': None, 'peak_rss_mb': None, 'exit_code': None,
+              'cache_hit': False, 'split_convert_s': None}
+    record.update(stats or {})
+    record.update(end=time.time(), success=outputs[0] is not None, poses=0, timeouts=timeouts)
+    telemetry.write(record)
+
+def screen_ligand(ligand, screen_dir, cpu=None, cache=None, params=None, telemetry=None):
+    """run_vina_docking() for one screening job, plus its telemetry record"""
+    info = {}
+    events = []
+    start = time.time()
+    with JobTimer() as timer:
+        outputs = run_vina_docking(ligand, screen_dir, cpu, cache, params, events=events, info=info)
+    if not info.get('cache_hit'):
+        info.update(vina_wall_s=timer.wall_s, vina_cpu_s=timer.cpu_s, peak_rss_mb=timer.peak_rss_mb)
+    write_screen_record(telemetry, ligand, params, start, outputs, info, len(events))
+    return outputs
+
+def screen_ligands(ligands, output_dir, backend, cpu=None, jobs=1, cache=None,
+                   screen_exh=screen_exhaustiveness, telemetry=None, spare_cpus=0):
+    """
+    Stage 1 of --two-stage: dock every ligand at exhaustiveness `screen_exh`
+    into {output_dir}/screening. Returns {ligand: best affinity or None}.
+    Each screening job gets a telemetry record with stage "screen"; with
+    `jobs` > 1, `spare_cpus` is spread as in run_parallel_docking().
+    """
+    screen_dir = os.path.join(output_dir, "screening")
+    os.makedirs(screen_dir, exist_ok=True)
+    params = dict(docking_parameters(), exhaustiveness=screen_exh)
+    print(f"\n🔎 Stage 1: screening {len(ligands)} ligands at exhaustiveness {screen_exh}")
+    
+    if backend.name != "subprocess":
+        stats = {}
+        events = {}
+        start = time.time()
+        outputs = run_batch_vina_docking(ligands, screen_dir, backend, cpu, cache, params=params,
+                                         stats=stats, events=events)
+        for ligand in ligands:
+            write_screen_record(telemetry, ligand, params, start, outputs[ligand], stats.get(ligand),
+                                len(events.get(ligand, [])))
+    elif jobs > 1:
+        schedule = order_by_torsions(ligands)
+        cpus = job_cpus(schedule, cpu, spare_cpus)
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(screen_ligand, lig, screen_dir, cpus[lig], cache, params, telemetry)
+                       for lig in schedule]
+            for future in as_completed(futures):
+                future.result()
+        outputs = {lig: output_paths(lig, screen_dir) for lig in ligands}
+    else:
+        outputs = {lig: screen_ligand(lig, screen_dir, cpu, cache, params, telemetry) for lig in ligands}
+    
+    return {lig: best_affinity(poses) if poses else None for lig, (poses, _) in outputs.items()}
+
+def select_for_refinement(screen_scores, top_k=None, cutoff=None):
+    """
+    Ligands for the full-exhaustiveness stage: the top_k best screening
+    scores plus any at or below `cutoff`, in their original order.
+    """
+    scored = [lig for lig, score in screen_scores.items() if score is not None]
+    chosen = set()
+    if top_k:
+        chosen.update(sorted(scored, key=lambda lig: screen_scores[lig])[:top_k])
+    if cutoff is not None:
+        chosen.update(lig for lig in scored if screen_scores[lig] <= cutoff)
+    return [lig for lig in screen_scores if lig in chosen]
+
+def write_two_stage_report(screen_scores, refined_scores, output_dir, screen_exh=screen_exhaustiveness):
+    """
+    CSV with screening and refined scores in separate columns.
+    `refined_scores` maps each re-docked ligand to the best affinity its
+    refine run produced (None if it failed).
+    """
+    report_path = os.path.join(output_dir, "two_stage_report.csv")
+    
+    def fmt(score):
+        return "" if score is None else f"{score:.1f}"
+    
+    print(f"\n📊 Two-stage scores (screen @ exhaustiveness {screen_exh} | refined @ {exhaustiveness}):")
+    with open(report_path, 'w') as f:
+        f.write("ligand,screen_exhaustiveness,screen_affinity_kcal_mol,refined,"
+                "refine_exhaustiveness,refined_affinity_kcal_mol\n")
+        for ligand, screen_score in screen_scores.items():
+            refined = ligand in refined_scores
+            refined_score = refined_scores.get(ligand)
+            f.write(f"{ligand},{screen_exh},{fmt(screen_score)},{'yes' if refined else 'no'},"
+                    f"{exhaustiveness if refined else ''},{fmt(refined_score)}\n")
+            print(f"   {ligand}: screen {fmt(screen_score) or 'failed'}"
+                  + (f" | refined {fmt(refined_score) or 'failed'}" if refined else ""))
+    print(f"✅ Two-stage report saved: {report_path}")
+    return report_path
+
+def parse_args(argv=None):
+    """Command line options for the docking driver"""
+    parser = argparse.ArgumentParser(description="AutoDock Vina individual pose docking")
+    parser.add_argument("--backend", choices=["auto"] + sorted(BACKENDS), default=docking_backend,
+                        help=f"Docking backend (default: {docking_backend}); batch/bindings need Vina >= 1.2")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Dock several ligands at once in a process pool")
+    parser.add_argument("--cpus", type=int, default=None,
+                        help="Total core budget for --parallel (default: all cores)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Concurrent Vina jobs (default: derived from --cpus)")
+    parser.add_argument("--cpu-per-job", type=int, default=None,
+                        help="Vina --cpu value per job (default: derived from --cpus)")
+    parser.add_argument("--on-timeout", choices=["kill", "retry", "straggler"], default=timeout_policy,
+                        help=f"What to do when Vina hits its size-based time limit (default: {timeout_policy})")
+    parser.add_argument("--timeout-scale", type=float, default=1.0,
+                        help="Multiply every estimated Vina time limit by this factor")
+    parser.add_argument("--two-stage", action="store_true",
+                        help="Screen all ligands cheaply, then fully re-dock only the best ones")
+    parser.add_argument("--screen-exhaustiveness", type=int, default=screen_exhaustiveness,
+                        help=f"Exhaustiveness of the --two-stage screen (default: {screen_exhaustiveness})")
+    parser.add_argument("--refine-top-k", type=int, default=refine_top_k,
+                        help=f"Re-dock this many best screened ligands (default: {refine_top_k})")
+    parser.add_argument("--refine-cutoff", type=float, default=refine_cutoff,
+                        help="Also re-dock every screened ligand at or below this score (kcal/mol)")
+    parser.add_argument("--pose-arrays", action="store_true",
+                        help="Also save each ligand's poses as a PoseSet .npz (see pose_set.py)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Ignore the journal and redo every ligand")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always run Vina, ignoring and not updating the result cache")
+    parser.add_argument("--cache-dir", default=cache_dir,
+                        help=f"Result cache location (default: {cache_dir})")
+    parser.add_argument("--cache-max-mb", type=float, default=cache_max_mb,
+                        help=f"Evict least recently used results above this size (default: {cache_max_mb})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main function - separate PDBQT and PDB files for each pose"""
+    args = parse_args(argv)
+    
     print("🧪 AutoDock Vina - Top 10 Compounds Individual Pose Docking")  # UPDATED: Title
     print("🎯 All 10 molecules - separate PDBQT file + separate clean PDB file for each pose")  # UPDATED: Description
     print("=" * 80)  # UPDATED: Wider separator
     
+    backend = select_backend(args.backend, vina_path)
+    
     # Check files
-    if not os.path.exists(vina_path):
+    if backend.name != "bindings" and not os.path.exists(vina_path):
         print(f"❌ Vina not found: {vina_path}")
         sys.exit(1)
     
@@ -221,42 +831,81 @@ def main():
         print(f"⚠️  Missing molecules: {', '.join(missing)}")
     
     output_dir = create_output_directory()
+    cache = None if args.no_cache else DockingCache(args.cache_dir, args.cache_max_mb)
+    journal = DockingJournal(output_dir, docking_parameters(), receptor)
+    telemetry = TelemetryWriter(output_dir)
+    
+    screen_scores = None
+    if args.two_stage:
+        screen_jobs, screen_cpu, screen_spare = 1, args.cpus, 0
+        if args.parallel and backend.name == "subprocess":
+            screen_jobs, screen_cpu, screen_spare = plan_cpu_budget(len(available_ligands), args.cpus,
+                                                                    args.jobs, args.cpu_per_job)
+        screen_scores = screen_ligands(available_ligands, output_dir, backend, screen_cpu, screen_jobs,
+                                       cache, args.screen_exhaustiveness, telemetry, screen_spare)
+        available_ligands = select_for_refinement(screen_scores, args.refine_top_k, args.refine_cutoff)
+        print(f"\n🎯 Stage 2: re-docking {len(available_ligands)}/{len(screen_scores)} ligands "
+              f"at exhaustiveness {exhaustiveness}")
+        if not available_ligands:
+            print("⚠️  No ligand passed the screen")
+            write_two_stage_report(screen_scores, {}, output_dir, args.screen_exhaustiveness)
+            return
+    
+    # Work out where each ligand stands after a previous (possibly crashed) run
+    resume = {}
+    converted = {}
+    if not args.no_resume:
+        history = journal.replay()
+        resume = {lig: journal.resume_point(lig, history) for lig in available_ligands}
+        converted = {lig: journal.ligand_history(lig, history)["converted"]
+                     for lig, point in resume.items() if point == "converted"}
+    for ligand in available_ligands:
+        if resume.get(ligand) is None:
+            journal.record(ligand, "queued")
+    finished = sum(1 for point in resume.values() if point == "converted")
+    if finished:
+        print(f"📓 Journal: {finished}/{len(available_ligands)} ligands already complete")
     
     print(f"\n📋 Parameters:")
     print(f"   Grid center: ({center_x}, {center_y}, {center_z})")
     print(f"   Grid size: {size_x}×{size_y}×{size_z} Å")
     print(f"   Poses per molecule: {num_modes}")
     print(f"   Total molecules: {len(available_ligands)}")  # UPDATED: Added molecule count
+    print(f"   Result cache: {'disabled' if cache is None else args.cache_dir}")
+    print(f"   Docking backend: {backend.name}")
     
     print(f"\n🚀 Starting individual pose generation for all compounds...")
     print("=" * 80)
     
-    total_individual_files = 0
-    successful_molecules = 0
+    if backend.name != "subprocess":
+        if args.parallel:
+            print(f"⚙️  {backend.name} backend docks in one process - using the --cpus budget for it")
+        results = run_batch_docking(available_ligands, output_dir, backend, args.cpus, cache,
+                                    journal, resume, args.pose_arrays, telemetry,
+                                    args.on_timeout, args.timeout_scale, converted)
+    elif args.parallel:
+        jobs, cpu_per_job, spare_cpus = plan_cpu_budget(len(available_ligands), args.cpus, args.jobs,
+                                                        args.cpu_per_job)
+        print(f"⚙️  Parallel mode: {jobs} concurrent jobs × {cpu_per_job} CPU each"
+              + (f" (+1 for the {spare_cpus} most flexible ligands)" if spare_cpus else ""))
+        results = run_parallel_docking(available_ligands, output_dir, jobs, cpu_per_job, cache,
+                                       journal, resume, converted, spare_cpus, pose_arrays=args.pose_arrays,
+                                       on_timeout=args.on_timeout, timeout_scale=args.timeout_scale,
+                                       telemetry=telemetry)
+    else:
+        results = []
+        for i, ligand in enumerate(available_ligands, 1):  # UPDATED: Added counter
+            print(f"\n📋 Processing {ligand} [{i}/{len(available_ligands)}]")  # UPDATED: Added progress counter
+            results.append(dock_ligand(ligand, output_dir, cache=cache, journal=journal,
+                                       resume=resume.get(ligand), converted=converted.get(ligand),
+                                       pose_arrays=args.pose_arrays, on_timeout=args.on_timeout,
+                                       timeout_scale=args.timeout_scale, telemetry=telemetry))
     
-    for i, ligand in enumerate(available_ligands, 1):  # UPDATED: Added counter
-        ligand_name = os.path.splitext(ligand)[0]
-        print(f"\n📋 Processing {ligand} [{i}/{len(available_ligands)}]")  # UPDATED: Added progress counter
-        
-        # Step 1: Run Vina docking
-        all_poses_pdbqt, log_file = run_vina_docking(ligand, output_dir)
-        
-        if all_poses_pdbqt and os.path.exists(all_poses_pdbqt):
-            # Step 2: Extract scores
-            scores = extract_pose_scores(log_file)
-            print(f"    📊 Extracted {len(scores)} pose scores")
-            
-            # Step 3: Split into individual files
-            individual_files = split_poses_to_individual_files(all_poses_pdbqt, ligand_name, output_dir, scores)
-            
-            if individual_files:
-                print(f"    ✅ Created {len(individual_files)} individual pose files")
-                total_individual_files += len(individual_files)
-                successful_molecules += 1
-            else:
-                print(f"    ❌ Failed to create individual files")
-        else:
-            print(f"    ❌ Docking failed for {ligand}")
+    # Ligands that timed out under the straggler policy get one more, longer go
+    run_stragglers(results, output_dir, cache, journal, args.pose_arrays, args.timeout_scale, telemetry)
+    
+    total_individual_files = sum(r['poses'] for r in results)
+    successful_molecules = sum(1 for r in results if r['success'])
     
     # Final summary
     print("\n" + "=" * 80)
@@ -265,6 +914,23 @@ def main():
     print(f"🎯 Total individual pose files created: {total_individual_files}")
     print(f"✅ Successful molecules: {successful_molecules}/{len(available_ligands)}")  # UPDATED: Success rate
     print(f"📁 Location: {output_dir}/")
+    print(f"📈 Telemetry: {telemetry.path} (summarise with docking_telemetry.py)")
+    
+    print(f"\n📋 Per-molecule results:")
+    for r in results:
+        status = f"✅ {r['poses']} poses" if r['success'] else "❌ failed"
+        print(f"   {r['ligand']}: {status}")
+    
+    timeout_events = [event for r in results for event in r.get('timeouts', [])]
+    if timeout_events:
+        print(f"\n⏱️  Timeout events: {len(timeout_events)}")
+        for event in timeout_events:
+            print(f"   {event['ligand']}: limit {event['timeout_s']}s at exhaustiveness "
+                  f"{event['exhaustiveness']} → {event['action']}")
+    
+    if screen_scores is not None:
+        refined_scores = {r['ligand']: r['best_affinity'] if r['success'] else None for r in results}
+        write_two_stage_report(screen_scores, refined_scores, output_dir, args.screen_exhaustiveness)
     
     if total_individual_files > 0:
         print(f"\n📂 File Structure (examples):")
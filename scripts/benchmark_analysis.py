@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 Docking Analysis Benchmark
+====================================
+
+Times the AutoGrow4DockingAnalyzer analyses (docking_analysis.py) on
+synthetic complete-analysis tables of increasing size, in memory and in
+chunked mode, and checks that both modes agree (clusterings up to label
+order, by cluster size and centre). The old row-by-row (`iterrows`)
+pose-quality loop is timed as a reference at sizes where it finishes in
+reasonable time, and extrapolated linearly beyond that.
+
+Usage:
+    python benchmark_analysis.py
+    python benchmark_analysis.py --sizes 10 10000 --output bench_analysis.json
+    python benchmark_analysis.py --sizes 1000000 --chunksize 200000
+
+Author: AutoGrow4-OXA23 Project
+"""
+
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from docking_analysis import AutoGrow4DockingAnalyzer
+
+BENCH_SIZES = (10, 10000, 1000000)
+# Largest table the row-by-row reference is run on
+ROWWISE_LIMIT = 20000
+SCAFFOLDS = ('2-Hydroxypyridine', '2-Methylpyridine', '4-Fluoropyrimidine', '4-Methylimidazole',
+             '3-Fluoropyridine', '2-Cyanopyridine', '2-Methylpyrimidine', '4-Fluorobenzene')
+PI_PI = ('None', 'Limited', 'T-shaped', 'Stacked+T-shaped')
+PRIORITIES = ('High', 'Medium', 'Low', 'Backup')
+# Synthetic binding modes: KCX82 / SER79 distance (Å), residue contacts, interaction diversity
+BINDING_MODES = np.array([[2.2, 2.3, 15, 9], [2.9, 3.1, 9, 4], [3.4, 2.6, 12, 6]])
+# Chunked and in-memory clusterings agree if matched cluster sizes differ by
+# less than this fraction of the rows and centres by less than this many
+# feature standard deviations
+CLUSTER_SIZE_TOLERANCE = 0.02
+CLUSTER_CENTER_TOLERANCE = 0.1
+
+
+def synthetic_complete_data(n, seed=0):
+    """Complete-analysis table with every column the analyzer reads, and three binding modes"""
+    rng = np.random.default_rng(seed)
+    affinity = np.round(rng.normal(-7.6, 0.4, n), 1)
+    priority = rng.choice(PRIORITIES, n).astype(object)
+    priority[0] = 'Lead_Compound'
+    mode = BINDING_MODES[rng.integers(0, len(BINDING_MODES), n)]
+    return pd.DataFrame({
+        'Molecule_ID': np.arange(1, n + 1),
+        'SMILES': 'O=C([C@@H]1N2C(=O)C[C@H]2S(=O)(=O)C1(C)C)Nc1ncccc1O',
+        'Binding_Affinity_kcal_mol': affinity,
+        'Second_Best_Pose_kcal_mol': np.round(affinity + rng.uniform(0, 1.5, n), 1),
+        'Scaffold_Type': rng.choice(SCAFFOLDS, n),
+        'KCX82_Distance_A': np.round(mode[:, 0] + rng.normal(0, 0.15, n), 1),
+        'SER79_Distance_A': np.round(mode[:, 1] + rng.normal(0, 0.15, n), 1),
+        'Pi_Pi_Interactions': rng.choice(PI_PI, n),
+        'Total_Residue_Contacts': mode[:, 2].astype(int) + rng.integers(-2, 3, n),
+        'Interaction_Diversity_Score': mode[:, 3].astype(int) + rng.integers(-1, 2, n),
+        'Ligand_Efficiency': np.round(rng.uniform(0.22, 0.28, n), 3),
+        'ADME_Score': np.round(rng.uniform(6.5, 12.0, n), 2),
+        'Development_Priority': priority,
+    })
+
+
+def rowwise_pose_quality(data):
+    """The pre-vectorization analyze_pose_quality loop, kept as the reference"""
+    pose_analysis = []
+    for _, mol in data.iterrows():
+        primary_pose = mol['Binding_Affinity_kcal_mol']
+        secondary_pose = mol['Second_Best_Pose_kcal_mol']
+        pose_difference = abs(primary_pose - secondary_pose)
+        convergence_quality = "Excellent" if pose_difference < 0.5 else "Good" if pose_difference < 1.0 else "Moderate"
+        pose_analysis.append({
+            'Molecule_ID': mol['Molecule_ID'],
+            'Primary_Pose': primary_pose,
+            'Secondary_Pose': secondary_pose,
+            'Pose_Difference': pose_difference,
+            'Convergence_Quality': convergence_quality,
+            'Ligand_Efficiency': mol['Ligand_Efficiency']
+        })
+    return pd.DataFrame(pose_analysis)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def close(a, b):
+    """Analysis results equal up to float rounding"""
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(close(a[k], b[k]) for k in a)
+    if isinstance(a, pd.DataFrame):
+        return a.shape == b.shape and np.allclose(a.to_numpy(dtype=float), b.to_numpy(dtype=float), equal_nan=True)
+    return bool(np.isclose(a, b, equal_nan=True))
+
+
+def clusters_match(a, b, data):
+    """
+    Same clustering from two analyzers, up to label order: clusters paired by
+    nearest centre must agree in size and centre (see the tolerances)
+    """
+    from scipy.optimize import linear_sum_assignment
+    from docking_analysis import CLUSTERING_FEATURES
+
+    a, b = a.analysis_results['clustering'], b.analysis_results['clustering']
+    if len(a['centers']) != len(b['centers']):
+        return False
+    scale = data[CLUSTERING_FEATURES].std().to_numpy()
+    centers_a, centers_b = a['centers'].to_numpy() / scale, b['centers'].to_numpy() / scale
+    cost = np.linalg.norm(centers_a[:, None, :] - centers_b[None, :, :], axis=2)
+    rows, cols = linear_sum_assignment(cost)
+    count = ('Binding_Affinity_kcal_mol', 'count')
+    sizes_a = a['cluster_analysis'][count].to_numpy()[rows]
+    sizes_b = b['cluster_analysis'][count].to_numpy()[cols]
+    return bool((np.abs(sizes_a - sizes_b) <= CLUSTER_SIZE_TOLERANCE * len(data)).all()
+                and (cost[rows, cols] <= CLUSTER_CENTER_TOLERANCE).all())
+
+
+def bench_size(n, chunksize, workdir, clusters=True):
+    data = synthetic_complete_data(n)
+    data_dir = Path(workdir) / f"data_{n}"
+    data_dir.mkdir(exist_ok=True)
+    data.to_csv(data_dir / "AutoGrow4_OXA23_Complete_Analysis_bench.csv", index=False)
+    result = {'rows': n}
+
+    analyzer = AutoGrow4DockingAnalyzer(data_dir, Path(workdir) / "out")
+    result['load_s'], _ = timed(lambda: analyzer.complete_data)
+    result['binding_s'], binding = timed(analyzer.analyze_binding_affinities)
+    result['poses_s'], (pose_df, pose_stats) = timed(analyzer.analyze_pose_quality)
+    result['sar_s'], sar = timed(analyzer.analyze_structure_activity_relationships)
+    if clusters:
+        result['clusters_s'], _ = timed(analyzer.cluster_binding_modes)
+
+    if n <= ROWWISE_LIMIT:
+        result['poses_rowwise_s'], reference = timed(rowwise_pose_quality, data)
+        result['poses_match_rowwise'] = bool(
+            (reference['Convergence_Quality'].values == pose_df['Convergence_Quality'].values).all()
+            and np.allclose(reference['Pose_Difference'], pose_df['Pose_Difference']))
+    else:
+        result['poses_rowwise_s'] = None
+
+    chunked = AutoGrow4DockingAnalyzer(data_dir, Path(workdir) / "out", chunksize=chunksize)
+    start = time.perf_counter()
+    chunked_binding = chunked.analyze_binding_affinities()
+    _, chunked_pose_stats = chunked.analyze_pose_quality()
+    chunked_sar = chunked.analyze_structure_activity_relationships()
+    result['chunked_s'] = time.perf_counter() - start
+    result['chunked_matches'] = (close(binding[0], chunked_binding[0]) and close(pose_stats, chunked_pose_stats)
+                                 and close(sar[0], chunked_sar[0]) and close(sar[1], chunked_sar[1]))
+    if clusters:
+        start = time.perf_counter()
+        chunked.cluster_binding_modes()
+        result['chunked_clusters_s'] = time.perf_counter() - start
+        result['clusters_match'] = clusters_match(analyzer, chunked, data)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark docking_analysis.py on synthetic tables")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(BENCH_SIZES), help="Table sizes (rows)")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Rows per chunk in chunked mode")
+    parser.add_argument("--skip-clusters", action="store_true", help="Don't time K-means clustering")
+    parser.add_argument("--output", default=None, help="Write results as JSON here")
+    args = parser.parse_args()
+
+    results = []
+    rowwise_per_row = None
+    with tempfile.TemporaryDirectory(prefix="bench_analysis_") as workdir:
+        for n in args.sizes:
+            result = bench_size(n, args.chunksize, workdir, not args.skip_clusters)
+            if result['poses_rowwise_s'] is not None:
+                rowwise_per_row = result['poses_rowwise_s'] / n
+            elif rowwise_per_row is not None:
+                result['poses_rowwise_extrapolated_s'] = rowwise_per_row * n
+            results.append(result)
+
+    print(f"\n{'rows':>9} {'load':>7} {'binding':>8} {'poses':>7} {'rowwise':>9} {'sar':>7} "
+          f"{'clusters':>9} {'chunked':>8}  checks")
+    for r in results:
+        rowwise = (f"{r['poses_rowwise_s']:.3f}" if r['poses_rowwise_s'] is not None
+                   else f"~{r['poses_rowwise_extrapolated_s']:.0f}" if 'poses_rowwise_extrapolated_s' in r else "-")
+        checks = ("✅" if r['chunked_matches'] and r.get('poses_match_rowwise', True) and r.get('clusters_match', True)
+                  else "❌")
+        clusters = f"{r['clusters_s']:.3f}" if 'clusters_s' in r else "-"
+        print(f"{r['rows']:>9} {r['load_s']:>7.3f} {r['binding_s']:>8.3f} {r['poses_s']:>7.3f} {rowwise:>9} "
+              f"{r['sar_s']:>7.3f} {clusters:>9} {r['chunked_s']:>8.3f}  {checks}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
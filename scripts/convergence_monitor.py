@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 Convergence Monitor
+=============================
+
+Decides when more generations stop paying for their docking. After each
+`generation_N_ranked.smi` is written, the monitor records:
+
+    best          best Vina score of the generation and of the campaign so far
+    top-k mean    mean of the campaign's k best unique compounds so far
+    diversity     mean diversity score of the generation
+    novelty       fraction of the generation's new compounds whose canonical
+                  SMILES was never seen in an earlier generation
+
+Plateau rules (all configurable):
+    best plateau   campaign best improved by less than --best-delta over the
+                   last --patience generations
+    top-k plateau  campaign top-k mean improved by less than --topk-delta
+                   over the last --patience generations
+    novelty        mean novelty over the last --patience generations is below
+                   --min-novelty
+Stopping is recommended once --min-generations have run and either both
+score plateaus hold, or the novelty rule does.
+
+On a stop recommendation the monitor writes a JSON stop file (default:
+../output/STOP_AUTOGROW.json) and, with --once, exits with status 2, so a
+wrapper around run_autogrow.py can kill the run or skip resuming it.
+
+Retrospective mode replays the finished generations and reports when the
+monitor would have stopped the run and how much docking that saves, both
+observed and projected to config.json's num_generations.
+
+Usage:
+    python convergence_monitor.py --once
+    python convergence_monitor.py --interval 120 --patience 6
+    python convergence_monitor.py --retrospective
+
+Author: AutoGrow4-OXA23 Project
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+from generation_io import find_ranked_files, read_ranked_file, canonical_smiles
+
+DEFAULT_CONFIG = "../config/config.json"
+DEFAULT_STOP_FILE = "../output/STOP_AUTOGROW.json"
+STOP_EXIT_CODE = 2
+
+DEFAULT_RULES = {
+    'min_generations': 8,
+    'patience': 6,
+    'best_delta': 0.1,
+    'topk_delta': 0.1,
+    'min_novelty': 0.5,
+    'top_k': 10,
+}
+
+
+class ConvergenceMonitor:
+    """Per-generation convergence statistics and plateau rules"""
+
+    def __init__(self, rules=None):
+        self.rules = dict(DEFAULT_RULES, **(rules or {}))
+        self.history = []
+        self.seen = set()
+        # canonical SMILES -> best affinity, for the campaign top-k
+        self.best_by_compound = {}
+
+    def add_generation(self, generation, rows):
+        """Fold one generation's ranked rows in; returns its statistics"""
+        new_rows = [row for row in rows if not row['carried_over']]
+        new_keys = [canonical_smiles(row['smiles']) for row in new_rows]
+        novel = len({key for key in new_keys if key not in self.seen})
+        for row in rows:
+            key = canonical_smiles(row['smiles'])
+            self.seen.add(key)
+            if row['affinity'] < self.best_by_compound.get(key, float('inf')):
+                self.best_by_compound[key] = row['affinity']
+
+        k = self.rules['top_k']
+        top = sorted(self.best_by_compound.values())[:k]
+        generation_top = sorted(row['affinity'] for row in rows)[:k]
+        stats = {
+            'generation': generation,
+            'compounds': len(rows),
+            'docked': len(new_rows),
+            'best': min((row['affinity'] for row in rows), default=None),
+            'running_best': top[0] if top else None,
+            'top_k_mean': sum(generation_top) / len(generation_top) if generation_top else None,
+            'running_top_k_mean': sum(top) / len(top) if top else None,
+            'mean_diversity': sum(row['diversity'] for row in rows) / len(rows) if rows else None,
+            'novelty': novel / len(new_rows) if new_rows else 0.0,
+        }
+        self.history.append(stats)
+        stats['stop'], stats['reasons'] = self.check()
+        return stats
+
+    def check(self):
+        """(stop?, [reasons]) from the history so far"""
+        rules = self.rules
+        patience = rules['patience']
+        if len(self.history) < max(rules['min_generations'], patience + 1):
+            return False, []
+        now, then = self.history[-1], self.history[-1 - patience]
+        best_gain = then['running_best'] - now['running_best']
+        topk_gain = then['running_top_k_mean'] - now['running_top_k_mean']
+        novelty = sum(g['novelty'] for g in self.history[-patience:]) / patience
+
+        reasons = []
+        score_plateau = best_gain < rules['best_delta'] and topk_gain < rules['topk_delta']
+        if score_plateau:
+            reasons.append(f"best improved {best_gain:.2f} and top-{rules['top_k']} mean improved "
+                           f"{topk_gain:.2f} kcal/mol over the last {patience} generations")
+        if novelty < rules['min_novelty']:
+            reasons.append(f"only {novelty:.0%} of new compounds were novel over the last {patience} generations")
+        return bool(reasons), reasons
+
+
+def docking_per_generation(config):
+    """Nominal Vina jobs per generation from config.json (mutants + crossovers)"""
+    return config.get("number_of_mutants", 0) + config.get("number_of_crossovers", 0)
+
+
+def write_stop_file(path, stats, rules):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump({'stop': True, 'time': time.time(), 'generation': stats['generation'],
+                   'reasons': stats['reasons'], 'statistics': stats, 'rules': rules}, f, indent=2)
+    tmp.replace(path)
+
+
+def retrospective(output_path, rules, config):
+    """Replay finished generations; returns (history, stop generation or None, savings dict)"""
+    monitor = ConvergenceMonitor(rules)
+    stop_at = None
+    for generation, path in find_ranked_files(output_path).items():
+        stats = monitor.add_generation(generation, read_ranked_file(path, generation))
+        if stats['stop'] and stop_at is None:
+            stop_at = stats
+    history = monitor.history
+    savings = {}
+    if stop_at is not None:
+        after = [g for g in history if g['generation'] > stop_at['generation']]
+        planned = config.get("num_generations", history[-1]['generation'])
+        remaining = max(planned - history[-1]['generation'], 0)
+        savings = {
+            'observed_generations': len(after),
+            'observed_docking': sum(g['docked'] for g in after),
+            'observed_total_docking': sum(g['docked'] for g in history),
+            'projected_generations': len(after) + remaining,
+            'projected_docking': sum(g['docked'] for g in after) + remaining * docking_per_generation(config),
+            'best_at_stop': stop_at['running_best'],
+            'final_best': history[-1]['running_best'],
+            'top_k_mean_at_stop': stop_at['running_top_k_mean'],
+            'final_top_k_mean': history[-1]['running_top_k_mean'],
+        }
+    return history, stop_at, savings
+
+
+def print_generation(stats):
+    flag = "🛑" if stats['stop'] else "  "
+    print(f"{flag} gen {stats['generation']:>3}: best {stats['best']:>5}  running best {stats['running_best']:>5}  "
+          f"top-k {stats['running_top_k_mean']:.2f}  diversity {stats['mean_diversity']:.1f}  "
+          f"novelty {stats['novelty']:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend when an AutoGrow4 run has converged")
+    parser.add_argument("--output-path", default="../output/", help="AutoGrow4 output folder")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help=f"AutoGrow4 config (default: {DEFAULT_CONFIG})")
+    parser.add_argument("--stop-file", default=DEFAULT_STOP_FILE, help=f"Stop signal file (default: {DEFAULT_STOP_FILE})")
+    parser.add_argument("--retrospective", action="store_true", help="Replay finished generations and report savings")
+    parser.add_argument("--once", action="store_true", help="Check once; exit 2 if stopping is recommended")
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between polls")
+    parser.add_argument("--settle", type=float, default=5.0,
+                        help="A ranked file must be unchanged this long before it is read")
+    for name, value in DEFAULT_RULES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    rules = {name: getattr(args, name) for name in DEFAULT_RULES}
+    config = {}
+    if Path(args.config).exists():
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+
+    if args.retrospective:
+        history, stop_at, savings = retrospective(args.output_path, rules, config)
+        for stats in history:
+            print_generation(stats)
+        if stop_at is None:
+            print("📈 No stop recommended: the run was still improving")
+            return
+        print(f"🛑 Stop recommended after generation {stop_at['generation']}: {'; '.join(stop_at['reasons'])}")
+        print(f"💰 Saved {savings['observed_docking']} of {savings['observed_total_docking']} docked compounds "
+              f"({savings['observed_generations']} generations) in this run; "
+              f"~{savings['projected_docking']} over the planned {config.get('num_generations', '?')} generations")
+        print(f"   Best {savings['best_at_stop']} at stop vs {savings['final_best']} final; "
+              f"top-{rules['top_k']} mean {savings['top_k_mean_at_stop']:.2f} vs {savings['final_top_k_mean']:.2f}")
+        return
+
+    monitor = ConvergenceMonitor(rules)
+    processed = set()
+    try:
+        while True:
+            now = time.time()
+            for generation, path in find_ranked_files(args.output_path).items():
+                if generation in processed or now - path.stat().st_mtime < args.settle:
+                    continue
+                stats = monitor.add_generation(generation, read_ranked_file(path, generation))
+                processed.add(generation)
+                print_generation(stats)
+            latest = monitor.history[-1] if monitor.history else None
+            if latest and latest['stop']:
+                write_stop_file(args.stop_file, latest, rules)
+                print(f"🛑 Stop recommended: {'; '.join(latest['reasons'])}")
+                print(f"   Signal written to {args.stop_file}")
+                sys.exit(STOP_EXIT_CODE)
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n👋 Monitor stopped")
+
+
+if __name__ == "__main__":
+    main()
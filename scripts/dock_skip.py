@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 Dock-Skip Stage
+=========================
+
+AutoGrow4 keeps regenerating molecules it has already docked, through other
+mutation or crossover routes, and converts and docks them again from
+`generation_N_to_convert.smi`. Run this stage on that file before conversion.
+
+1. Every incoming SMILES is canonicalized and looked up, by canonical SMILES,
+   in the results store (results_store.py), which holds every compound from
+   the ranked files of earlier generations.
+2. Known compounds reuse their best Vina score from an earlier generation.
+   Their docked pose is copied out of that generation's PDB archive into
+   `generation_N/PDBs/<new id>__1.pdbqt.vina`, next to the poses Vina writes
+   for this generation. AutoGrow4 ranks the generation from those files, so
+   reused compounds are ranked with the docked ones. The matches are listed
+   in `generation_N_dock_skipped.smi`.
+3. Only new compounds, and known ones whose pose could not be reused, stay in
+   the to-convert list. A SMILES repeated within the same file is also only
+   kept once.
+4. After ranking, `--merge` checks that every skipped compound made it into
+   `generation_N_ranked.smi`. It adds any that are missing with their reused
+   score, re-sorts the file and recomputes its diversity scores.
+
+Every run appends its hit rate to dock_skip_log.jsonl, since each hit saves a
+Vina job.
+
+Usage:
+    python dock_skip.py ../output/generation_33/generation_33_to_convert.smi
+    python dock_skip.py ../output/generation_33/generation_33_to_convert.smi --in-place
+    python dock_skip.py ../output/generation_33/generation_33_to_convert.smi --merge
+
+Author: AutoGrow4-OXA23 Project
+"""
+
+import json
+import time
+import shutil
+import argparse
+from pathlib import Path
+
+from generation_io import lineage_compound_id, canonical_smiles
+from results_store import ResultsStore, DEFAULT_DB
+from pdb_archive import GenerationArchives
+
+DEFAULT_LOG = "../output/analysis/dock_skip_log.jsonl"
+POSE_SUFFIX = "__1.pdbqt.vina"
+
+
+def reuse_pose(archives, source_id, new_id, pose_dir):
+    """Copy a compound's docked pose out of its generation archive; returns the path or None"""
+    try:
+        text = archives.get(source_id + POSE_SUFFIX)
+    except KeyError:
+        return None
+    pose_dir.mkdir(parents=True, exist_ok=True)
+    pose_path = pose_dir / (new_id + POSE_SUFFIX)
+    pose_path.write_text(text)
+    return pose_path
+
+
+def filter_to_convert(to_convert, output_path="../output/", db_path=DEFAULT_DB, in_place=False,
+                      copy_poses=True, log_path=DEFAULT_LOG):
+    """
+    Split a to-convert .smi into already-docked and new compounds.
+    Returns a summary dict (also appended to the run log).
+    """
+    to_convert = Path(to_convert)
+    generation_dir = to_convert.parent
+    stem = to_convert.name.replace("_to_convert.smi", "")
+    generation = int(stem.split('_')[-1]) if stem.split('_')[-1].isdigit() else None
+    with open(to_convert, 'r') as f:
+        rows = [line.rstrip('\n').split('\t') for line in f]
+    rows = [fields for fields in rows if len(fields) >= 2 and fields[0]]
+    keys = [canonical_smiles(fields[0]) for fields in rows]
+
+    with ResultsStore(db_path) as store:
+        store.ingest(output_path)
+        # Only earlier generations count, so re-running on a finished generation works too
+        known = store.lookup_canonical(keys, before_generation=generation)
+
+    archives = GenerationArchives(output_path) if copy_poses else None
+    # Where this generation's Vina outputs go, so ranking picks the reused poses up
+    pose_dir = generation_dir / "PDBs"
+    new_lines, skipped_lines, seen = [], [], set()
+    hits = duplicates = known_redocked = 0
+    for fields, key in zip(rows, keys):
+        smiles, lineage = fields[0], fields[1]
+        compound_id = lineage_compound_id(lineage)
+        match = known.get(key)
+        pose = reuse_pose(archives, match['id'], compound_id, pose_dir) if match and archives else None
+        if pose is not None:
+            hits += 1
+            skipped_lines.append('\t'.join([smiles, lineage, compound_id, match['id'], str(match['generation']),
+                                            str(match['affinity']), str(pose)]) + '\n')
+        elif key in seen:
+            duplicates += 1
+        else:
+            # Known but without a reusable pose: dock it again rather than drop it
+            known_redocked += match is not None
+            seen.add(key)
+            new_lines.append('\t'.join(fields) + '\n')
+
+    skipped_path = generation_dir / f"{stem}_dock_skipped.smi"
+    with open(skipped_path, 'w') as f:
+        f.writelines(skipped_lines)
+
+    if in_place:
+        backup = to_convert.with_name(f"{stem}_to_convert.all.smi")
+        if not backup.exists():
+            shutil.copyfile(to_convert, backup)
+        new_path = to_convert
+    else:
+        new_path = to_convert.with_name(f"{stem}_to_convert.new.smi")
+    tmp = new_path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        f.writelines(new_lines)
+    tmp.replace(new_path)
+
+    summary = {
+        'time': time.time(), 'file': str(to_convert), 'incoming': len(rows), 'hits': hits,
+        'duplicates': duplicates, 'to_dock': len(new_lines), 'known_redocked': known_redocked,
+        'hit_rate': (hits + duplicates) / len(rows) if rows else 0.0,
+        'skipped_file': str(skipped_path), 'to_dock_file': str(new_path),
+    }
+    if log_path:
+        Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, 'a') as f:
+            f.write(json.dumps(summary) + '\n')
+    return summary
+
+
+def merge_skipped(to_convert):
+    """
+    Add the skipped compounds of a to-convert file that are missing from the
+    generation's ranked file, with their reused scores. Returns how many were
+    added (0 leaves the file untouched).
+    """
+    to_convert = Path(to_convert)
+    stem = to_convert.name.replace("_to_convert.smi", "")
+    skipped_path = to_convert.with_name(f"{stem}_dock_skipped.smi")
+    ranked_path = to_convert.with_name(f"{stem}_ranked.smi")
+    if not skipped_path.exists():
+        return 0
+    ranked = []
+    if ranked_path.exists():
+        with open(ranked_path, 'r') as f:
+            ranked = [fields for fields in (line.rstrip('\n').split('\t') for line in f) if len(fields) >= 5]
+    present = {fields[2] or lineage_compound_id(fields[1]) for fields in ranked}
+    added = []
+    with open(skipped_path, 'r') as f:
+        for line in f:
+            smiles, lineage, compound_id, _, _, affinity = line.rstrip('\n').split('\t')[:6]
+            if compound_id not in present:
+                present.add(compound_id)
+                added.append([smiles, lineage, compound_id, '0', affinity])
+    if not added:
+        return 0
+
+    # Diversity is relative to the whole generation, so it changes for every row
+    from fingerprint_index import morgan_fingerprints
+    from selection_engine import diversity_scores
+    rows = sorted(ranked + added, key=lambda fields: float(fields[4]))
+    diversity = diversity_scores(morgan_fingerprints([fields[0] for fields in rows]))
+    tmp = ranked_path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        for fields, score in zip(rows, diversity):
+            f.write('\t'.join(fields[:3] + [str(score)] + fields[4:]) + '\n')
+    tmp.replace(ranked_path)
+    return len(added)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Skip docking for compounds AutoGrow4 has already docked")
+    parser.add_argument("to_convert", nargs="+", help="generation_N_to_convert.smi file(s)")
+    parser.add_argument("--output-path", default="../output/", help="AutoGrow4 output folder")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"Results store (default: {DEFAULT_DB})")
+    parser.add_argument("--in-place", action="store_true",
+                        help="Rewrite the to-convert file (original kept as *_to_convert.all.smi)")
+    parser.add_argument("--no-poses", action="store_true",
+                        help="Don't copy poses; known compounds are then docked again")
+    parser.add_argument("--merge", action="store_true",
+                        help="After ranking: add skipped compounds missing from generation_N_ranked.smi")
+    parser.add_argument("--log", default=DEFAULT_LOG, help=f"Run log (default: {DEFAULT_LOG})")
+    args = parser.parse_args()
+
+    for path in args.to_convert:
+        if args.merge:
+            added = merge_skipped(path)
+            print(f"♻️  {Path(path).name}: {added} skipped compounds added to the ranked file")
+            continue
+        summary = filter_to_convert(path, args.output_path, args.db, args.in_place,
+                                    not args.no_poses, args.log)
+        print(f"♻️  {Path(path).name}: {summary['hits']} already docked, "
+              f"{summary['duplicates']} repeated in file, {summary['to_dock']} to dock "
+              f"({summary['hit_rate']:.1%} Vina jobs saved, {summary['known_redocked']} known but redocked)")
+        print(f"   Skipped: {summary['skipped_file']}")
+        print(f"   To dock: {summary['to_dock_file']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,80 +6,472 @@ AutoGrow4-OXA23 Docking Analysis Script
 Comprehensive analysis of AutoDock Vina docking results for OXA-23 β-lactamase inhibitors
 discovered through genetic algorithm evolution.
 
+Usage:
+    python docking_analysis.py                 # visualizations + full report
+    python docking_analysis.py binding
+    python docking_analysis.py sar
+    python docking_analysis.py --chunksize 100000 binding
+    python docking_analysis.py clusters --k auto --n-jobs 4
+    python docking_analysis.py visualize --preview
+    python docking_analysis.py import-time --max-ms 300
+
 Author: AutoGrow4-OXA23 Project
 Date: August 2025
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import os
+import sys
+import time
+import argparse
+import subprocess
 import warnings
+from functools import cached_property
 from pathlib import Path
 from datetime import datetime
 import json
-from scipy import stats
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+
+# pandas, matplotlib, seaborn, plotly, scipy and scikit-learn are imported
+# inside the methods that use them: importing this module (and running a
+# single analysis) must not pay for the whole plotting/ML stack.
 
 warnings.filterwarnings('ignore')
 
+# Per-molecule labels (scatter annotations, heatmap columns) beyond this many
+# rows are limited to the best binders
+MAX_LABELED_MOLECULES = 50
+
+# Binding-mode clustering
+CLUSTERING_FEATURES = [
+    'Binding_Affinity_kcal_mol', 'Total_Residue_Contacts',
+    'Interaction_Diversity_Score', 'KCX82_Distance_A', 'SER79_Distance_A'
+]
+# Above this many rows clustering switches to MiniBatchKMeans
+SCALABLE_CLUSTERING_ROWS = 50000
+CLUSTER_BATCH_SIZE = 4096
+# Rows used to pick k automatically
+CLUSTER_SAMPLE_SIZE = 10000
+# Rows the silhouette score itself is computed on (it is O(n^2))
+SILHOUETTE_SAMPLE_SIZE = 3000
+# k-means++ restarts for the final fit, in memory and on the chunked path's
+# sample alike; sklearn's default ('auto') is a single one for KMeans, which
+# can settle in a local optimum that splits a binding mode by affinity
+KMEANS_N_INIT = 10
+
+
+def cluster_centers(kmeans, scaler):
+    """Fitted cluster centres in feature units, one row per cluster"""
+    import pandas as pd
+    return pd.DataFrame(scaler.inverse_transform(kmeans.cluster_centers_), columns=CLUSTERING_FEATURES
+                        ).rename_axis('Binding_Cluster')
+
+
+def complete_cluster_index(cluster_analysis, n_clusters):
+    """Cluster summary indexed on every cluster 0..k-1; empty ones get count 0 and priority 'Mixed'"""
+    cluster_analysis = cluster_analysis.reindex(range(n_clusters))
+    count, priority = ('Binding_Affinity_kcal_mol', 'count'), ('Development_Priority', '<lambda>')
+    cluster_analysis[count] = cluster_analysis[count].fillna(0).astype(int)
+    cluster_analysis[priority] = cluster_analysis[priority].fillna('Mixed')
+    return cluster_analysis.rename_axis('Binding_Cluster')
+
+
+def choose_n_clusters(sample, k_range=(2, 8), random_state=42):
+    """
+    k in `k_range` (inclusive) with the best silhouette score of a
+    MiniBatchKMeans fit on `sample`; returns (k, {k: score}).
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.metrics import silhouette_score
+    
+    scores = {}
+    for k in range(k_range[0], min(k_range[1], len(sample) - 1) + 1):
+        labels = MiniBatchKMeans(n_clusters=k, batch_size=CLUSTER_BATCH_SIZE, n_init=3,
+                                 random_state=random_state).fit_predict(sample)
+        if len(set(labels)) < 2:
+            continue
+        scores[k] = float(silhouette_score(sample, labels, sample_size=min(SILHOUETTE_SAMPLE_SIZE, len(sample)),
+                                           random_state=random_state))
+    if not scores:
+        return k_range[0], scores
+    return max(scores, key=scores.get), scores
+
+
+def chunk_moments(frame, by, columns):
+    """
+    Per-group count, mean, M2 (sum of squared deviations), min and max of
+    `columns` for one chunk; `by=None` treats the chunk as a single group.
+    """
+    import numpy as np
+    keys = np.zeros(len(frame), dtype=int) if by is None else by
+    grouped = frame.groupby(keys)[columns]
+    count = grouped.count()
+    return {'count': count, 'mean': grouped.mean(), 'm2': grouped.var(ddof=0) * count,
+            'min': grouped.min(), 'max': grouped.max()}
+
+
+def merge_moments(a, b):
+    """Combine two chunk_moments() results (Chan et al. parallel variance)"""
+    import numpy as np
+    if a is None:
+        return b
+    index = a['count'].index.union(b['count'].index)
+    na, nb = (m['count'].reindex(index, fill_value=0) for m in (a, b))
+    ma, mb = (m['mean'].reindex(index).fillna(0.0) for m in (a, b))
+    m2a, m2b = (m['m2'].reindex(index).fillna(0.0) for m in (a, b))
+    n = na + nb
+    delta = mb - ma
+    safe_n = n.where(n > 0, 1)
+    return {'count': n, 'mean': (ma + delta * nb / safe_n).where(n > 0),
+            'm2': m2a + m2b + delta ** 2 * na * nb / safe_n,
+            'min': np.fmin(a['min'].reindex(index), b['min'].reindex(index)),
+            'max': np.fmax(a['max'].reindex(index), b['max'].reindex(index))}
+
+
+def finish_moments(moments):
+    """`<column>_<mean|std|min|max|count>` table from merged moments (std with ddof=1)"""
+    import numpy as np
+    import pandas as pd
+    n = moments['count']
+    stats = {'mean': moments['mean'], 'std': np.sqrt(moments['m2'] / (n - 1).where(n > 1)),
+             'min': moments['min'], 'max': moments['max'], 'count': n}
+    table = pd.DataFrame(index=n.index)
+    for column in n.columns:
+        for name, values in stats.items():
+            table[f"{column}_{name}"] = values[column]
+    return table
+
+
+# ---------------------------------------------------------------- rendering
+#
+# Figures are rendered by module-level functions so they can run in worker
+# processes. Each one forces the non-interactive Agg backend (no plt.show(),
+# nothing to block on a headless node) and only sees the columns it uses,
+# which is also what its cache hash covers.
+
+FULL_DPI = 300
+PREVIEW_DPI = 60
+RENDER_CACHE = ".render_cache.json"
+# Bump when a renderer changes so cached figures are drawn again
+RENDER_VERSION = 1
+
+
+def _headless_pyplot():
+    """pyplot on the Agg backend, with the project figure style"""
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    # Set style for publication-quality figures ('seaborn-whitegrid' was renamed in matplotlib 3.6)
+    style = 'seaborn-whitegrid' if 'seaborn-whitegrid' in plt.style.available else 'seaborn-v0_8-whitegrid'
+    plt.style.use(style)
+    sns.set_palette("husl")
+    return plt, sns
+
+
+def render_summary_figure(data, path, dpi=FULL_DPI):
+    """2x2 summary: affinity histogram, affinity vs ADME, scaffold ranking, priorities."""
+    plt, _ = _headless_pyplot()
+    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+    
+    # Subplot 1: Binding affinity histogram
+    axes[0,0].hist(data['Binding_Affinity_kcal_mol'], 
+                  bins=8, alpha=0.7, color='skyblue', edgecolor='black')
+    axes[0,0].axvline(data['Binding_Affinity_kcal_mol'].mean(), 
+                     color='red', linestyle='--', label='Mean')
+    axes[0,0].set_xlabel('Binding Affinity (kcal/mol)')
+    axes[0,0].set_ylabel('Number of Compounds')
+    axes[0,0].set_title('Binding Affinity Distribution')
+    axes[0,0].legend()
+    
+    # Subplot 2: Affinity vs ADME Score
+    axes[0,1].scatter(data['Binding_Affinity_kcal_mol'],
+                      data['ADME_Score'],
+                      c=data['Molecule_ID'],
+                      cmap='viridis', s=100, alpha=0.7)
+    axes[0,1].set_xlabel('Binding Affinity (kcal/mol)')
+    axes[0,1].set_ylabel('ADME Score')
+    axes[0,1].set_title('Binding Affinity vs ADME Properties')
+    
+    # Add molecule labels (best binders only on campaign-sized tables)
+    labeled = data.nsmallest(MAX_LABELED_MOLECULES, 'Binding_Affinity_kcal_mol')
+    for mid, affinity, adme in zip(labeled['Molecule_ID'].to_numpy(),
+                                   labeled['Binding_Affinity_kcal_mol'].to_numpy(),
+                                   labeled['ADME_Score'].to_numpy()):
+        axes[0,1].annotate(f"M{int(mid)}", (affinity, adme),
+                          xytext=(5, 5), textcoords='offset points', fontsize=8)
+    
+    # Subplot 3: Scaffold performance
+    scaffold_means = data.groupby('Scaffold_Type')['Binding_Affinity_kcal_mol'].mean().sort_values()
+    axes[1,0].barh(range(len(scaffold_means)), scaffold_means.values, color='lightcoral')
+    axes[1,0].set_yticks(range(len(scaffold_means)))
+    axes[1,0].set_yticklabels(scaffold_means.index, fontsize=8)
+    axes[1,0].set_xlabel('Average Binding Affinity (kcal/mol)')
+    axes[1,0].set_title('Scaffold Performance Ranking')
+    
+    # Subplot 4: Development priority distribution
+    priority_counts = data['Development_Priority'].value_counts()
+    axes[1,1].pie(priority_counts.values, labels=priority_counts.index, autopct='%1.1f%%',
+                 startangle=90, colors=['gold', 'lightgreen', 'lightblue', 'lightpink'])
+    axes[1,1].set_title('Development Priority Distribution')
+    
+    plt.tight_layout()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+def render_interactive_3d(data, path, dpi=None):
+    """Interactive Plotly 3D scatter (affinity vs ADME vs contacts) as standalone HTML."""
+    import plotly.graph_objects as go
+    
+    fig = go.Figure(data=go.Scatter3d(
+        x=data['Binding_Affinity_kcal_mol'],
+        y=data['ADME_Score'],
+        z=data['Total_Residue_Contacts'],
+        mode='markers+text',
+        text="M" + data['Molecule_ID'].astype(int).astype(str),
+        textposition="top center",
+        marker=dict(
+            size=data['Ligand_Efficiency'] * 50,
+            color=data['KCX82_Distance_A'],
+            colorscale='Viridis',
+            colorbar=dict(title="KCX82 Distance (Å)"),
+            showscale=True,
+            opacity=0.8
+        ),
+        hovertemplate=
+        '<b>Molecule %{text}</b><br>' +
+        'Binding Affinity: %{x:.1f} kcal/mol<br>' +
+        'ADME Score: %{y:.1f}<br>' +
+        'Residue Contacts: %{z}<br>' +
+        'Scaffold: %{customdata}<br>' +
+        '<extra></extra>',
+        customdata=data['Scaffold_Type']
+    ))
+    
+    fig.update_layout(
+        title='3D Binding Analysis: Affinity vs ADME vs Contacts',
+        scene=dict(
+            xaxis_title='Binding Affinity (kcal/mol)',
+            yaxis_title='ADME Score',
+            zaxis_title='Total Residue Contacts'
+        ),
+        width=800,
+        height=600
+    )
+    
+    # Previews link plotly.js from the CDN instead of embedding 3+ MB of it
+    fig.write_html(path, include_plotlyjs=True if dpi is None or dpi >= FULL_DPI else 'cdn')
+
+
+def render_interaction_heatmap(data, path, dpi=FULL_DPI):
+    """KCX82 / SER79 interaction-strength heatmap (best binders only on large tables)."""
+    plt, sns = _headless_pyplot()
+    
+    # Prepare interaction matrix
+    key_residues = ['KCX82_Distance_A', 'SER79_Distance_A']
+    interaction_data = data[['Molecule_ID'] + key_residues]
+    if len(interaction_data) > MAX_LABELED_MOLECULES:
+        best = data['Binding_Affinity_kcal_mol'].nsmallest(MAX_LABELED_MOLECULES).index
+        interaction_data = interaction_data.loc[best.sort_values()]
+    interaction_data = interaction_data.set_index('Molecule_ID')
+    
+    # Convert distances to interaction strengths (closer = stronger)
+    interaction_strengths = 4.0 - interaction_data  # 4.0 Å as reference
+    interaction_strengths = interaction_strengths.clip(lower=0)
+    
+    fig = plt.figure(figsize=(10, 8))
+    sns.heatmap(interaction_strengths.T, 
+               annot=True, 
+               fmt='.1f',
+               cmap='RdYlBu_r',
+               cbar_kws={'label': 'Interaction Strength'})
+    plt.title('Protein-Ligand Interaction Heatmap\n(Key Catalytic Residues)')
+    plt.xlabel('Molecule ID')
+    plt.ylabel('Residue Interaction')
+    plt.tight_layout()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+# name -> (renderer, output file, columns it reads)
+FIGURES = {
+    'summary': (render_summary_figure, 'comprehensive_docking_analysis.png',
+                ['Molecule_ID', 'Binding_Affinity_kcal_mol', 'ADME_Score', 'Scaffold_Type', 'Development_Priority']),
+    'interactive_3d': (render_interactive_3d, 'interactive_3d_analysis.html',
+                       ['Molecule_ID', 'Binding_Affinity_kcal_mol', 'ADME_Score', 'Total_Residue_Contacts',
+                        'Ligand_Efficiency', 'KCX82_Distance_A', 'Scaffold_Type']),
+    'heatmap': (render_interaction_heatmap, 'interaction_heatmap.png',
+                ['Molecule_ID', 'Binding_Affinity_kcal_mol', 'KCX82_Distance_A', 'SER79_Distance_A']),
+}
+
+
+def figure_hash(data, name, dpi):
+    """Hash of everything a figure depends on: its input columns, dpi and renderer version."""
+    import hashlib
+    import pandas as pd
+    columns = FIGURES[name][2]
+    digest = hashlib.sha256(f"{name}|{dpi}|{RENDER_VERSION}|{','.join(columns)}".encode())
+    digest.update(pd.util.hash_pandas_object(data[columns], index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def _render_job(job):
+    name, data, path, dpi = job
+    FIGURES[name][0](data, path, dpi)
+    return name
+
+
+def render_figures(data, output_path, preview=False, workers=None, force=False, figures=None):
+    """
+    Render the figures (default: all of FIGURES) into `output_path`, each in
+    its own worker process. A figure whose inputs hash the same as at its
+    last render (and whose file still exists) is skipped unless `force`.
+    Preview mode renders at PREVIEW_DPI into `*_preview.*` files so the
+    full-resolution figures are left alone. Returns {name: 'rendered' | 'cached'}.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    
+    output_path = Path(output_path)
+    cache_path = output_path / RENDER_CACHE
+    cache = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+    dpi = PREVIEW_DPI if preview else FULL_DPI
+    
+    status, jobs, hashes = {}, [], {}
+    for name in figures or FIGURES:
+        _, filename, columns = FIGURES[name]
+        path = output_path / filename
+        if preview:
+            path = path.with_name(f"{path.stem}_preview{path.suffix}")
+        key = f"{name}_preview" if preview else name
+        hashes[key] = figure_hash(data, name, dpi)
+        if not force and cache.get(key) == hashes[key] and path.exists():
+            status[name] = 'cached'
+            continue
+        jobs.append((name, data[columns], path, dpi))
+    
+    workers = min(workers or os.cpu_count() or 1, len(jobs)) if jobs else 0
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            done = list(pool.map(_render_job, jobs))
+    else:
+        done = [_render_job(job) for job in jobs]
+    for name in done:
+        status[name] = 'rendered'
+        key = f"{name}_preview" if preview else name
+        cache[key] = hashes[key]
+    
+    if done:
+        cache_path.write_text(json.dumps(cache, indent=2))
+    return status
+
 class AutoGrow4DockingAnalyzer:
     """
     Comprehensive docking analysis for AutoGrow4-OXA23 discovery project.
     """
     
-    def __init__(self, data_path="../output/analysis/", output_path="../docking_results/"):
-        """Initialize analyzer with data and output paths."""
+    def __init__(self, data_path="../output/analysis/", output_path="../docking_results/", chunksize=None):
+        """
+        Initialize analyzer with data and output paths (datasets load on first use).
+        With `chunksize`, the binding, pose-quality and SAR analyses stream the
+        complete analysis CSV in chunks of that many rows instead of loading it.
+        """
         self.data_path = Path(data_path)
         self.output_path = Path(output_path)
         self.output_path.mkdir(exist_ok=True)
-        
-        # Load comprehensive analysis data
-        self.load_data()
+        self.chunksize = chunksize
         
         # Initialize analysis results storage
         self.analysis_results = {}
         
+    def _latest_csv(self, pattern):
+        """Most recently modified CSV in the data folder matching `pattern`, or None."""
+        files = list(self.data_path.glob(pattern))
+        return max(files, key=lambda x: x.stat().st_mtime) if files else None
+    
+    @cached_property
+    def complete_data_path(self):
+        """Most recent complete analysis CSV."""
+        latest_file = self._latest_csv("AutoGrow4_OXA23_Complete_Analysis_*.csv")
+        if latest_file is None:
+            print(f"❌ Error loading data: Complete analysis CSV not found")
+            raise FileNotFoundError("Complete analysis CSV not found")
+        return latest_file
+    
+    @cached_property
+    def complete_data(self):
+        """Most recent complete analysis CSV (loaded once, on first access)."""
+        import pandas as pd
+        data = pd.read_csv(self.complete_data_path)
+        print(f"✅ Loaded complete analysis: {self.complete_data_path.name}")
+        return data
+    
+    @cached_property
+    def scaffold_data(self):
+        """Most recent scaffold analysis CSV, or None if there is none."""
+        import pandas as pd
+        latest_scaffold = self._latest_csv("AutoGrow4_OXA23_Scaffold_Analysis_*.csv")
+        if latest_scaffold is None:
+            return None
+        data = pd.read_csv(latest_scaffold)
+        print(f"✅ Loaded scaffold analysis: {latest_scaffold.name}")
+        return data
+    
     def load_data(self):
-        """Load all available analysis data."""
-        try:
-            # Find the most recent complete analysis file
-            analysis_files = list(self.data_path.glob("AutoGrow4_OXA23_Complete_Analysis_*.csv"))
-            if analysis_files:
-                latest_file = max(analysis_files, key=lambda x: x.stat().st_mtime)
-                self.complete_data = pd.read_csv(latest_file)
-                print(f"✅ Loaded complete analysis: {latest_file.name}")
-            else:
-                raise FileNotFoundError("Complete analysis CSV not found")
-                
-            # Load scaffold analysis if available
-            scaffold_files = list(self.data_path.glob("AutoGrow4_OXA23_Scaffold_Analysis_*.csv"))
-            if scaffold_files:
-                latest_scaffold = max(scaffold_files, key=lambda x: x.stat().st_mtime)
-                self.scaffold_data = pd.read_csv(latest_scaffold)
-                print(f"✅ Loaded scaffold analysis: {latest_scaffold.name}")
-            
-        except Exception as e:
-            print(f"❌ Error loading data: {e}")
-            raise
+        """Load all available analysis data now instead of on first use."""
+        return self.complete_data, self.scaffold_data
+    
+    @property
+    def chunked(self):
+        """True when analyses stream the CSV (chunksize set and the table not already loaded)."""
+        return self.chunksize is not None and 'complete_data' not in self.__dict__
+    
+    def iter_complete_data(self, columns=None):
+        """The complete analysis table as DataFrame chunks (a single chunk when not chunked)."""
+        if not self.chunked:
+            yield self.complete_data if columns is None else self.complete_data[columns]
+            return
+        import pandas as pd
+        yield from pd.read_csv(self.complete_data_path, usecols=columns, chunksize=self.chunksize)
+    
+    @cached_property
+    def row_count(self):
+        """Number of compounds in the complete analysis table."""
+        return sum(len(chunk) for chunk in self.iter_complete_data(['Molecule_ID']))
+    
+    def first_row(self, column, value):
+        """First row (Series) whose `column` equals `value`; IndexError if there is none."""
+        for chunk in self.iter_complete_data():
+            matches = chunk[chunk[column] == value]
+            if len(matches):
+                return matches.iloc[0]
+        raise IndexError(f"No row with {column} == {value!r}")
+    
+    def count_rows(self, column, values):
+        """Number of rows whose `column` is one of `values`."""
+        return sum(int(chunk[column].isin(values).sum()) for chunk in self.iter_complete_data([column]))
     
     def analyze_binding_affinities(self):
         """Comprehensive binding affinity analysis."""
         print("\n🔬 Analyzing Binding Affinities...")
         
-        # Basic statistics
-        binding_stats = {
-            'mean_affinity': self.complete_data['Binding_Affinity_kcal_mol'].mean(),
-            'std_affinity': self.complete_data['Binding_Affinity_kcal_mol'].std(),
-            'min_affinity': self.complete_data['Binding_Affinity_kcal_mol'].min(),
-            'max_affinity': self.complete_data['Binding_Affinity_kcal_mol'].max(),
-            'compounds_above_8': len(self.complete_data[self.complete_data['Binding_Affinity_kcal_mol'] <= -8.0]),
-            'compounds_above_7_5': len(self.complete_data[self.complete_data['Binding_Affinity_kcal_mol'] <= -7.5])
-        }
+        # Basic statistics (one pass over the column, or over each chunk)
+        moments, above_8, above_7_5 = None, 0, 0
+        for chunk in self.iter_complete_data(['Binding_Affinity_kcal_mol']):
+            affinity = chunk['Binding_Affinity_kcal_mol']
+            above_8 += int((affinity <= -8.0).sum())
+            above_7_5 += int((affinity <= -7.5).sum())
+            if not self.chunked:
+                binding_stats = {'mean_affinity': affinity.mean(), 'std_affinity': affinity.std(),
+                                 'min_affinity': affinity.min(), 'max_affinity': affinity.max()}
+            else:
+                moments = merge_moments(moments, chunk_moments(chunk, None, ['Binding_Affinity_kcal_mol']))
+        if self.chunked:
+            summary = finish_moments(moments).iloc[0]
+            binding_stats = {'mean_affinity': summary['Binding_Affinity_kcal_mol_mean'],
+                             'std_affinity': summary['Binding_Affinity_kcal_mol_std'],
+                             'min_affinity': summary['Binding_Affinity_kcal_mol_min'],
+                             'max_affinity': summary['Binding_Affinity_kcal_mol_max']}
+        binding_stats['compounds_above_8'] = above_8
+        binding_stats['compounds_above_7_5'] = above_7_5
         
         # Clinical comparison analysis
         clinical_standards = {
@@ -89,17 +481,12 @@ class AutoGrow4DockingAnalyzer:
             'Durlobactam': -7.1
         }
         
-        improvements = {}
-        for standard, affinity in clinical_standards.items():
-            best_improvement = self.complete_data['Binding_Affinity_kcal_mol'].min() - affinity
-            lead_improvement = self.complete_data[
-                self.complete_data['Development_Priority'] == 'Lead_Compound'
-            ]['Binding_Affinity_kcal_mol'].iloc[0] - affinity
-            
-            improvements[standard] = {
-                'best_improvement': best_improvement,
-                'lead_improvement': lead_improvement
-            }
+        lead_affinity = self.first_row('Development_Priority', 'Lead_Compound')['Binding_Affinity_kcal_mol']
+        improvements = {
+            standard: {'best_improvement': binding_stats['min_affinity'] - affinity,
+                       'lead_improvement': lead_affinity - affinity}
+            for standard, affinity in clinical_standards.items()
+        }
         
         self.analysis_results['binding_analysis'] = {
             'statistics': binding_stats,
@@ -109,35 +496,47 @@ class AutoGrow4DockingAnalyzer:
         return binding_stats, improvements
     
     def analyze_pose_quality(self):
-        """Analyze docking pose quality and convergence."""
+        """
+        Analyze docking pose quality and convergence. In chunked mode only the
+        statistics are kept and the per-molecule table comes back as None.
+        """
         print("📊 Analyzing Pose Quality...")
-        
-        # Calculate pose quality metrics
-        pose_analysis = []
-        for _, mol in self.complete_data.iterrows():
-            primary_pose = mol['Binding_Affinity_kcal_mol']
-            secondary_pose = mol['Second_Best_Pose_kcal_mol']
-            
-            pose_difference = abs(primary_pose - secondary_pose)
-            convergence_quality = "Excellent" if pose_difference < 0.5 else "Good" if pose_difference < 1.0 else "Moderate"
-            
-            pose_analysis.append({
-                'Molecule_ID': mol['Molecule_ID'],
-                'Primary_Pose': primary_pose,
-                'Secondary_Pose': secondary_pose,
-                'Pose_Difference': pose_difference,
-                'Convergence_Quality': convergence_quality,
-                'Ligand_Efficiency': mol['Ligand_Efficiency']
-            })
-        
-        pose_df = pd.DataFrame(pose_analysis)
+        import numpy as np
+        import pandas as pd
+        
+        columns = ['Molecule_ID', 'Binding_Affinity_kcal_mol', 'Second_Best_Pose_kcal_mol', 'Ligand_Efficiency']
+        frames, total, count = [], 0.0, 0
+        quality_counts = {'Excellent': 0, 'Good': 0, 'Moderate': 0}
+        for chunk in self.iter_complete_data(columns):
+            # Calculate pose quality metrics column-wise
+            primary_pose = chunk['Binding_Affinity_kcal_mol']
+            secondary_pose = chunk['Second_Best_Pose_kcal_mol']
+            pose_difference = (primary_pose - secondary_pose).abs()
+            convergence_quality = np.select([pose_difference < 0.5, pose_difference < 1.0],
+                                            ['Excellent', 'Good'], default='Moderate')
+            for quality in quality_counts:
+                quality_counts[quality] += int((convergence_quality == quality).sum())
+            total += pose_difference.sum()
+            count += int(pose_difference.count())
+            if not self.chunked:
+                frames.append(pd.DataFrame({
+                    'Molecule_ID': chunk['Molecule_ID'].values,
+                    'Primary_Pose': primary_pose.values,
+                    'Secondary_Pose': secondary_pose.values,
+                    'Pose_Difference': pose_difference.values,
+                    'Convergence_Quality': convergence_quality,
+                    'Ligand_Efficiency': chunk['Ligand_Efficiency'].values
+                }))
+        
+        pose_df = frames[0] if frames else None
         
         # Pose quality statistics
         quality_stats = {
-            'average_pose_difference': pose_df['Pose_Difference'].mean(),
-            'excellent_convergence': len(pose_df[pose_df['Convergence_Quality'] == 'Excellent']),
-            'good_convergence': len(pose_df[pose_df['Convergence_Quality'] == 'Good']),
-            'moderate_convergence': len(pose_df[pose_df['Convergence_Quality'] == 'Moderate'])
+            'average_pose_difference': pose_df['Pose_Difference'].mean() if pose_df is not None
+            else (total / count if count else float('nan')),
+            'excellent_convergence': quality_counts['Excellent'],
+            'good_convergence': quality_counts['Good'],
+            'moderate_convergence': quality_counts['Moderate']
         }
         
         self.analysis_results['pose_quality'] = {
@@ -151,26 +550,29 @@ class AutoGrow4DockingAnalyzer:
         """Detailed SAR analysis based on scaffolds and binding data."""
         print("🧬 Analyzing Structure-Activity Relationships...")
         
-        # Group by scaffold type
-        scaffold_performance = self.complete_data.groupby('Scaffold_Type').agg({
-            'Binding_Affinity_kcal_mol': ['mean', 'std', 'min', 'max', 'count'],
-            'ADME_Score': ['mean', 'std'],
-            'Ligand_Efficiency': ['mean', 'std'],
-            'Total_Residue_Contacts': ['mean', 'std']
-        }).round(3)
-        
-        # Flatten column names
-        scaffold_performance.columns = ['_'.join(col).strip() for col in scaffold_performance.columns]
+        if self.chunked:
+            scaffold_performance, interaction_analysis = self._chunked_sar()
+        else:
+            # Group by scaffold type
+            scaffold_performance = self.complete_data.groupby('Scaffold_Type').agg({
+                'Binding_Affinity_kcal_mol': ['mean', 'std', 'min', 'max', 'count'],
+                'ADME_Score': ['mean', 'std'],
+                'Ligand_Efficiency': ['mean', 'std'],
+                'Total_Residue_Contacts': ['mean', 'std']
+            }).round(3)
+            
+            # Flatten column names
+            scaffold_performance.columns = ['_'.join(col).strip() for col in scaffold_performance.columns]
+            
+            # Interaction type analysis
+            interaction_analysis = self.complete_data.groupby('Pi_Pi_Interactions').agg({
+                'Binding_Affinity_kcal_mol': 'mean',
+                'ADME_Score': 'mean'
+            }).round(3)
         
         # Identify top-performing scaffolds
         top_scaffolds = scaffold_performance.sort_values('Binding_Affinity_kcal_mol_min').head(5)
         
-        # Interaction type analysis
-        interaction_analysis = self.complete_data.groupby('Pi_Pi_Interactions').agg({
-            'Binding_Affinity_kcal_mol': 'mean',
-            'ADME_Score': 'mean'
-        }).round(3)
-        
         self.analysis_results['sar_analysis'] = {
             'scaffold_performance': scaffold_performance,
             'top_scaffolds': top_scaffolds,
@@ -179,24 +581,85 @@ class AutoGrow4DockingAnalyzer:
         
         return scaffold_performance, interaction_analysis
     
-    def cluster_binding_modes(self):
-        """Cluster molecules based on binding characteristics."""
+    def _chunked_sar(self):
+        """SAR tables from per-chunk group moments (same columns as the in-memory groupby)."""
+        numeric = ['Binding_Affinity_kcal_mol', 'ADME_Score', 'Ligand_Efficiency', 'Total_Residue_Contacts']
+        by_scaffold, by_interaction = None, None
+        for chunk in self.iter_complete_data(['Scaffold_Type', 'Pi_Pi_Interactions'] + numeric):
+            by_scaffold = merge_moments(by_scaffold, chunk_moments(chunk, 'Scaffold_Type', numeric))
+            by_interaction = merge_moments(by_interaction, chunk_moments(
+                chunk, 'Pi_Pi_Interactions', ['Binding_Affinity_kcal_mol', 'ADME_Score']))
+        scaffold = finish_moments(by_scaffold)
+        interaction = finish_moments(by_interaction)
+        
+        scaffold_columns = (['Binding_Affinity_kcal_mol_' + s for s in ('mean', 'std', 'min', 'max', 'count')]
+                            + [f"{c}_{s}" for c in numeric[1:] for s in ('mean', 'std')])
+        interaction_analysis = interaction[['Binding_Affinity_kcal_mol_mean', 'ADME_Score_mean']]
+        interaction_analysis.columns = ['Binding_Affinity_kcal_mol', 'ADME_Score']
+        return scaffold[scaffold_columns].round(3), interaction_analysis.round(3)
+    
+    def cluster_binding_modes(self, n_clusters=3, scalable=None, k_range=(2, 8),
+                              sample_size=CLUSTER_SAMPLE_SIZE, n_jobs=None, random_state=42):
+        """
+        Cluster molecules based on binding characteristics.
+        
+        By default this is full-batch KMeans with k=3, as before. With
+        `scalable` (the default above SCALABLE_CLUSTERING_ROWS rows, and always
+        in chunked mode) it uses MiniBatchKMeans, streaming the CSV in chunked
+        mode. `n_clusters='auto'` picks k from `k_range` by silhouette score on a
+        `sample_size`-row sample. `n_jobs` caps the BLAS/OpenMP threads used.
+        Returns (clustered_data, cluster_analysis); cluster_analysis has a row for
+        every cluster 0..k-1, and the centres are kept in
+        analysis_results['clustering']['centers']. In chunked mode clustered_data
+        only holds Molecule_ID and Binding_Cluster.
+        """
         print("🎯 Clustering Binding Modes...")
+        from threadpoolctl import threadpool_limits
         
-        # Prepare clustering features
-        clustering_features = [
-            'Binding_Affinity_kcal_mol', 'Total_Residue_Contacts',
-            'Interaction_Diversity_Score', 'KCX82_Distance_A', 'SER79_Distance_A'
-        ]
+        with threadpool_limits(limits=n_jobs):
+            if self.chunked:
+                clustered_data, cluster_analysis, k_scores, centers = self._cluster_chunked(
+                    n_clusters, k_range, sample_size, random_state)
+            else:
+                clustered_data, cluster_analysis, k_scores, centers = self._cluster_in_memory(
+                    n_clusters, scalable, k_range, sample_size, random_state)
+        cluster_analysis = complete_cluster_index(cluster_analysis, len(centers))
         
-        X = self.complete_data[clustering_features].values
+        self.analysis_results['clustering'] = {
+            'data': clustered_data,
+            'cluster_analysis': cluster_analysis,
+            'features_used': CLUSTERING_FEATURES,
+            'k_scores': k_scores,
+            'centers': centers
+        }
+        
+        return clustered_data, cluster_analysis
+    
+    def _cluster_in_memory(self, n_clusters, scalable, k_range, sample_size, random_state):
+        import numpy as np
+        from sklearn.cluster import KMeans, MiniBatchKMeans
+        from sklearn.preprocessing import StandardScaler
+        
+        X = self.complete_data[CLUSTERING_FEATURES].values
+        if scalable is None:
+            scalable = len(X) > SCALABLE_CLUSTERING_ROWS
         
         # Standardize features
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(X)
         
+        k_scores = None
+        if n_clusters == 'auto':
+            rng = np.random.default_rng(random_state)
+            sample = X_scaled[rng.choice(len(X_scaled), min(sample_size, len(X_scaled)), replace=False)]
+            n_clusters, k_scores = choose_n_clusters(sample, k_range, random_state)
+        
         # Perform k-means clustering
-        kmeans = KMeans(n_clusters=3, random_state=42)
+        if scalable:
+            kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=CLUSTER_BATCH_SIZE, n_init=3,
+                                     random_state=random_state)
+        else:
+            kmeans = KMeans(n_clusters=n_clusters, n_init=KMEANS_N_INIT, random_state=random_state)
         clusters = kmeans.fit_predict(X_scaled)
         
         # Add cluster assignments
@@ -209,142 +672,88 @@ class AutoGrow4DockingAnalyzer:
             'ADME_Score': 'mean',
             'Development_Priority': lambda x: x.mode().iloc[0] if len(x.mode()) > 0 else 'Mixed'
         }).round(3)
-        
-        self.analysis_results['clustering'] = {
-            'data': clustered_data,
-            'cluster_analysis': cluster_analysis,
-            'features_used': clustering_features
-        }
-        
-        return clustered_data, cluster_analysis
+        return clustered_data, cluster_analysis, k_scores, cluster_centers(kmeans, scaler)
+    
+    def _cluster_chunked(self, n_clusters, k_range, sample_size, random_state):
+        """Three streaming passes: scaler + sample, MiniBatchKMeans, labels + summaries."""
+        import numpy as np
+        import pandas as pd
+        from sklearn.cluster import KMeans, MiniBatchKMeans
+        from sklearn.preprocessing import StandardScaler
+        
+        rng = np.random.default_rng(random_state)
+        keep = min(1.0, sample_size / max(self.row_count, 1))
+        scaler, samples = StandardScaler(), []
+        # read_csv(usecols=...) keeps file order: always select in CLUSTERING_FEATURES order
+        for chunk in self.iter_complete_data(CLUSTERING_FEATURES):
+            X = chunk[CLUSTERING_FEATURES].values
+            scaler.partial_fit(X)
+            samples.append(X[rng.random(len(X)) < keep])
+        sample = scaler.transform(np.concatenate(samples))
+        
+        k_scores = None
+        if n_clusters == 'auto':
+            n_clusters, k_scores = choose_n_clusters(sample, k_range, random_state)
+        
+        if keep >= 1.0:
+            # The sample is every row: solve it exactly, as the in-memory path does
+            kmeans = KMeans(n_clusters=n_clusters, n_init=KMEANS_N_INIT, random_state=random_state).fit(sample)
+        else:
+            # Start from the sample's clustering, then refine on every chunk
+            kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=CLUSTER_BATCH_SIZE, n_init=KMEANS_N_INIT,
+                                     random_state=random_state).fit(sample)
+            for chunk in self.iter_complete_data(CLUSTERING_FEATURES):
+                kmeans.partial_fit(scaler.transform(chunk[CLUSTERING_FEATURES].values))
+        
+        labels, moments, priorities = [], None, None
+        for chunk in self.iter_complete_data(['Molecule_ID', 'ADME_Score', 'Development_Priority']
+                                             + CLUSTERING_FEATURES):
+            chunk = chunk.assign(Binding_Cluster=kmeans.predict(scaler.transform(chunk[CLUSTERING_FEATURES].values)))
+            labels.append(chunk[['Molecule_ID', 'Binding_Cluster']])
+            moments = merge_moments(moments, chunk_moments(
+                chunk, 'Binding_Cluster', ['Binding_Affinity_kcal_mol', 'ADME_Score']))
+            counts = chunk.groupby(['Binding_Cluster', 'Development_Priority']).size()
+            priorities = counts if priorities is None else priorities.add(counts, fill_value=0)
+        
+        summary = finish_moments(moments)
+        # Most common priority per cluster (ties: alphabetical first, like Series.mode)
+        mode = (priorities.rename('n').reset_index()
+                .sort_values(['Binding_Cluster', 'n', 'Development_Priority'], ascending=[True, False, True])
+                .drop_duplicates('Binding_Cluster').set_index('Binding_Cluster')['Development_Priority'])
+        cluster_analysis = pd.DataFrame({
+            ('Binding_Affinity_kcal_mol', 'mean'): summary['Binding_Affinity_kcal_mol_mean'],
+            ('Binding_Affinity_kcal_mol', 'std'): summary['Binding_Affinity_kcal_mol_std'],
+            ('Binding_Affinity_kcal_mol', 'count'): summary['Binding_Affinity_kcal_mol_count'].astype(int),
+            ('ADME_Score', 'mean'): summary['ADME_Score_mean'],
+            ('Development_Priority', '<lambda>'): mode.reindex(summary.index).fillna('Mixed'),
+        }).rename_axis('Binding_Cluster').round(3)
+        return pd.concat(labels, ignore_index=True), cluster_analysis, k_scores, cluster_centers(kmeans, scaler)
     
-    def create_comprehensive_visualizations(self):
-        """Generate comprehensive visualization suite."""
+    def create_comprehensive_visualizations(self, preview=False, workers=None, force=False):
+        """
+        Generate comprehensive visualization suite (2x2 summary, Plotly 3D HTML,
+        interaction heatmap) headless and in parallel; unchanged figures are skipped.
+        """
         print("📈 Creating Comprehensive Visualizations...")
+        status = render_figures(self.complete_data, self.output_path, preview, workers, force)
+        for name, state in status.items():
+            print(f"   {'🖼️ ' if state == 'rendered' else '♻️ '} {name}: {state}")
+        return status
         
-        # Set style for publication-quality figures
-        plt.style.use('seaborn-whitegrid')
-        sns.set_palette("husl")
-        
-        # 1. Binding Affinity Distribution
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-        
-        # Subplot 1: Binding affinity histogram
-        axes[0,0].hist(self.complete_data['Binding_Affinity_kcal_mol'], 
-                      bins=8, alpha=0.7, color='skyblue', edgecolor='black')
-        axes[0,0].axvline(self.complete_data['Binding_Affinity_kcal_mol'].mean(), 
-                         color='red', linestyle='--', label='Mean')
-        axes[0,0].set_xlabel('Binding Affinity (kcal/mol)')
-        axes[0,0].set_ylabel('Number of Compounds')
-        axes[0,0].set_title('Binding Affinity Distribution')
-        axes[0,0].legend()
-        
-        # Subplot 2: Affinity vs ADME Score
-        scatter = axes[0,1].scatter(self.complete_data['Binding_Affinity_kcal_mol'],
-                                   self.complete_data['ADME_Score'],
-                                   c=self.complete_data['Molecule_ID'],
-                                   cmap='viridis', s=100, alpha=0.7)
-        axes[0,1].set_xlabel('Binding Affinity (kcal/mol)')
-        axes[0,1].set_ylabel('ADME Score')
-        axes[0,1].set_title('Binding Affinity vs ADME Properties')
-        
-        # Add molecule labels
-        for _, row in self.complete_data.iterrows():
-            axes[0,1].annotate(f"M{int(row['Molecule_ID'])}", 
-                              (row['Binding_Affinity_kcal_mol'], row['ADME_Score']),
-                              xytext=(5, 5), textcoords='offset points', fontsize=8)
-        
-        # Subplot 3: Scaffold performance
-        scaffold_means = self.complete_data.groupby('Scaffold_Type')['Binding_Affinity_kcal_mol'].mean().sort_values()
-        axes[1,0].barh(range(len(scaffold_means)), scaffold_means.values, color='lightcoral')
-        axes[1,0].set_yticks(range(len(scaffold_means)))
-        axes[1,0].set_yticklabels(scaffold_means.index, fontsize=8)
-        axes[1,0].set_xlabel('Average Binding Affinity (kcal/mol)')
-        axes[1,0].set_title('Scaffold Performance Ranking')
-        
-        # Subplot 4: Development priority distribution
-        priority_counts = self.complete_data['Development_Priority'].value_counts()
-        axes[1,1].pie(priority_counts.values, labels=priority_counts.index, autopct='%1.1f%%',
-                     startangle=90, colors=['gold', 'lightgreen', 'lightblue', 'lightpink'])
-        axes[1,1].set_title('Development Priority Distribution')
-        
-        plt.tight_layout()
-        plt.savefig(self.output_path / 'comprehensive_docking_analysis.png', dpi=300, bbox_inches='tight')
-        plt.show()
-        
-        # 2. Interactive 3D Analysis
-        self.create_interactive_3d_plot()
-        
-        # 3. Heatmap Analysis
-        self.create_interaction_heatmap()
-        
-    def create_interactive_3d_plot(self):
+    def create_interactive_3d_plot(self, preview=False):
         """Create interactive 3D plot with Plotly."""
-        fig = go.Figure(data=go.Scatter3d(
-            x=self.complete_data['Binding_Affinity_kcal_mol'],
-            y=self.complete_data['ADME_Score'],
-            z=self.complete_data['Total_Residue_Contacts'],
-            mode='markers+text',
-            text=[f"M{int(mid)}" for mid in self.complete_data['Molecule_ID']],
-            textposition="top center",
-            marker=dict(
-                size=self.complete_data['Ligand_Efficiency'] * 50,
-                color=self.complete_data['KCX82_Distance_A'],
-                colorscale='Viridis',
-                colorbar=dict(title="KCX82 Distance (Å)"),
-                showscale=True,
-                opacity=0.8
-            ),
-            hovertemplate=
-            '<b>Molecule %{text}</b><br>' +
-            'Binding Affinity: %{x:.1f} kcal/mol<br>' +
-            'ADME Score: %{y:.1f}<br>' +
-            'Residue Contacts: %{z}<br>' +
-            'Scaffold: %{customdata}<br>' +
-            '<extra></extra>',
-            customdata=self.complete_data['Scaffold_Type']
-        ))
-        
-        fig.update_layout(
-            title='3D Binding Analysis: Affinity vs ADME vs Contacts',
-            scene=dict(
-                xaxis_title='Binding Affinity (kcal/mol)',
-                yaxis_title='ADME Score',
-                zaxis_title='Total Residue Contacts'
-            ),
-            width=800,
-            height=600
-        )
-        
-        fig.write_html(self.output_path / 'interactive_3d_analysis.html')
-        fig.show()
-        
-    def create_interaction_heatmap(self):
+        return render_figures(self.complete_data, self.output_path, preview, workers=1, force=True,
+                              figures=['interactive_3d'])
+        
+    def create_interaction_heatmap(self, preview=False):
         """Create comprehensive interaction heatmap."""
-        # Prepare interaction matrix
-        key_residues = ['KCX82_Distance_A', 'SER79_Distance_A']
-        interaction_data = self.complete_data[['Molecule_ID'] + key_residues].set_index('Molecule_ID')
-        
-        # Convert distances to interaction strengths (closer = stronger)
-        interaction_strengths = 4.0 - interaction_data  # 4.0 Å as reference
-        interaction_strengths = interaction_strengths.clip(lower=0)
-        
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(interaction_strengths.T, 
-                   annot=True, 
-                   fmt='.1f',
-                   cmap='RdYlBu_r',
-                   cbar_kws={'label': 'Interaction Strength'})
-        plt.title('Protein-Ligand Interaction Heatmap\n(Key Catalytic Residues)')
-        plt.xlabel('Molecule ID')
-        plt.ylabel('Residue Interaction')
-        plt.tight_layout()
-        plt.savefig(self.output_path / 'interaction_heatmap.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        return render_figures(self.complete_data, self.output_path, preview, workers=1, force=True,
+                              figures=['heatmap'])
     
     def generate_comprehensive_report(self):
         """Generate comprehensive analysis report."""
         print("\n📋 Generating Comprehensive Docking Report...")
+        import pandas as pd
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         report_path = self.output_path / f"AutoGrow4_Docking_Report_{timestamp}.md"
@@ -354,6 +763,8 @@ class AutoGrow4DockingAnalyzer:
         pose_df, pose_stats = self.analyze_pose_quality()
         scaffold_perf, interaction_analysis = self.analyze_structure_activity_relationships()
         clustered_data, cluster_analysis = self.cluster_binding_modes()
+        lead = self.first_row('Molecule_ID', 1)
+        n_compounds = self.row_count
         
         # Generate report content
         report_content = f"""# AutoGrow4-OXA23 Comprehensive Docking Analysis Report
@@ -364,12 +775,12 @@ class AutoGrow4DockingAnalyzer:
 
 ## Executive Summary
 
-This report presents comprehensive analysis of {len(self.complete_data)} top-performing compounds discovered through AutoGrow4 genetic algorithm evolution for OXA-23 β-lactamase inhibition.
+This report presents comprehensive analysis of {n_compounds} top-performing compounds discovered through AutoGrow4 genetic algorithm evolution for OXA-23 β-lactamase inhibition.
 
 ### Key Achievements
 - **Best Binding Affinity:** {binding_stats['min_affinity']:.1f} kcal/mol
 - **Average Affinity:** {binding_stats['mean_affinity']:.1f} ± {binding_stats['std_affinity']:.1f} kcal/mol
-- **Compounds >-8.0 kcal/mol:** {binding_stats['compounds_above_8']}/10
+- **Compounds >-8.0 kcal/mol:** {binding_stats['compounds_above_8']}/{n_compounds}
 - **Lead Compound:** Molecule 1 (-7.9 kcal/mol, ADME Score: 11.66)
 
 ## Binding Affinity Analysis
@@ -380,8 +791,8 @@ This report presents comprehensive analysis of {len(self.complete_data)} top-per
 | Mean Affinity | {binding_stats['mean_affinity']:.2f} kcal/mol |
 | Standard Deviation | {binding_stats['std_affinity']:.2f} kcal/mol |
 | Best Performance | {binding_stats['min_affinity']:.1f} kcal/mol |
-| Compounds >-8.0 | {binding_stats['compounds_above_8']}/10 |
-| Compounds >-7.5 | {binding_stats['compounds_above_7_5']}/10 |
+| Compounds >-8.0 | {binding_stats['compounds_above_8']}/{n_compounds} |
+| Compounds >-7.5 | {binding_stats['compounds_above_7_5']}/{n_compounds} |
 
 ### Clinical Superiority
 Our compounds show significant improvements over clinical standards:
@@ -399,9 +810,9 @@ Our compounds show significant improvements over clinical standards:
 ### Convergence Statistics
 | Quality Level | Count | Percentage |
 |---------------|-------|------------|
-| Excellent (<0.5 kcal/mol) | {pose_stats['excellent_convergence']} | {pose_stats['excellent_convergence']/len(self.complete_data)*100:.1f}% |
-| Good (0.5-1.0 kcal/mol) | {pose_stats['good_convergence']} | {pose_stats['good_convergence']/len(self.complete_data)*100:.1f}% |
-| Moderate (>1.0 kcal/mol) | {pose_stats['moderate_convergence']} | {pose_stats['moderate_convergence']/len(self.complete_data)*100:.1f}% |
+| Excellent (<0.5 kcal/mol) | {pose_stats['excellent_convergence']} | {pose_stats['excellent_convergence']/n_compounds*100:.1f}% |
+| Good (0.5-1.0 kcal/mol) | {pose_stats['good_convergence']} | {pose_stats['good_convergence']/n_compounds*100:.1f}% |
+| Moderate (>1.0 kcal/mol) | {pose_stats['moderate_convergence']} | {pose_stats['moderate_convergence']/n_compounds*100:.1f}% |
 
 Average pose difference: {pose_stats['average_pose_difference']:.2f} kcal/mol
 
@@ -420,14 +831,14 @@ Average pose difference: {pose_stats['average_pose_difference']:.2f} kcal/mol
 
 ## Lead Compound Analysis: MOLECULE 1
 
-**SMILES:** `{self.complete_data[self.complete_data['Molecule_ID']==1]['SMILES'].iloc[0]}`
+**SMILES:** `{lead['SMILES']}`
 
 ### Key Properties
-- **Binding Affinity:** {self.complete_data[self.complete_data['Molecule_ID']==1]['Binding_Affinity_kcal_mol'].iloc[0]:.1f} kcal/mol
-- **ADME Score:** {self.complete_data[self.complete_data['Molecule_ID']==1]['ADME_Score'].iloc[0]:.2f} (exceptional)
-- **Scaffold Type:** {self.complete_data[self.complete_data['Molecule_ID']==1]['Scaffold_Type'].iloc[0]}
-- **KCX82 Distance:** {self.complete_data[self.complete_data['Molecule_ID']==1]['KCX82_Distance_A'].iloc[0]:.1f} Å
-- **Development Priority:** {self.complete_data[self.complete_data['Molecule_ID']==1]['Development_Priority'].iloc[0]}
+- **Binding Affinity:** {lead['Binding_Affinity_kcal_mol']:.1f} kcal/mol
+- **ADME Score:** {lead['ADME_Score']:.2f} (exceptional)
+- **Scaffold Type:** {lead['Scaffold_Type']}
+- **KCX82 Distance:** {lead['KCX82_Distance_A']:.1f} Å
+- **Development Priority:** {lead['Development_Priority']}
 
 ### Why Molecule 1 is the Lead Compound
 Despite Molecule 9 having higher binding affinity (-8.4 kcal/mol), Molecule 1 was selected as the lead due to:
@@ -479,34 +890,118 @@ The AutoGrow4 genetic algorithm successfully identified {binding_stats['compound
         
         return report_path
 
-def main():
-    """Main execution function."""
-    print("🧬 AutoGrow4-OXA23 Comprehensive Docking Analysis")
-    print("=" * 60)
-    
+def measure_import_time(repeats=5):
+    """Best-of-`repeats` wall time (ms) to import this module in a fresh interpreter."""
+    script_dir = str(Path(__file__).resolve().parent)
+    code = ("import sys, time; sys.path.insert(0, %r); start = time.perf_counter(); "
+            "import docking_analysis; print(1000 * (time.perf_counter() - start))" % script_dir)
+    times = []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+
+def run_full_analysis(analyzer):
+    """Visualizations plus the comprehensive report (the original end-to-end run)."""
     try:
-        # Initialize analyzer
-        analyzer = AutoGrow4DockingAnalyzer()
+        # Report first: its analyses stream the CSV with --chunksize, while the
+        # figures need the whole table in memory
+        report_path = analyzer.generate_comprehensive_report()
         
         # Generate comprehensive visualizations
         analyzer.create_comprehensive_visualizations()
         
-        # Generate comprehensive report
-        report_path = analyzer.generate_comprehensive_report()
-        
         print(f"\n🎯 Analysis Complete!")
         print(f"📊 Visualizations saved in: {analyzer.output_path}")
         print(f"📋 Comprehensive report: {report_path}")
         
         # Display key insights
         print(f"\n🏆 KEY INSIGHTS:")
-        print(f"   Best Binding Affinity: {analyzer.complete_data['Binding_Affinity_kcal_mol'].min():.1f} kcal/mol")
-        print(f"   Lead Compound: Molecule {analyzer.complete_data[analyzer.complete_data['Development_Priority']=='Lead_Compound']['Molecule_ID'].iloc[0]:.0f}")
-        print(f"   High-Priority Compounds: {len(analyzer.complete_data[analyzer.complete_data['Development_Priority'].isin(['Lead_Compound', 'High', 'Maximum_Potency'])])}/10")
+        binding_stats = analyzer.analysis_results['binding_analysis']['statistics']
+        lead = analyzer.first_row('Development_Priority', 'Lead_Compound')
+        high_priority = analyzer.count_rows('Development_Priority', ['Lead_Compound', 'High', 'Maximum_Potency'])
+        print(f"   Best Binding Affinity: {binding_stats['min_affinity']:.1f} kcal/mol")
+        print(f"   Lead Compound: Molecule {lead['Molecule_ID']:.0f}")
+        print(f"   High-Priority Compounds: {high_priority}/{analyzer.row_count}")
         
     except Exception as e:
         print(f"❌ Analysis failed: {e}")
         raise
 
+
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="AutoGrow4-OXA23 docking analysis")
+    parser.add_argument("--data-path", default="../output/analysis/", help="Folder with the analysis CSVs")
+    parser.add_argument("--output-path", default="../docking_results/", help="Where figures and reports go")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the complete analysis CSV in chunks of this many rows")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("all", help="Visualizations and full report (default)")
+    sub.add_parser("binding", help="Binding affinity statistics and clinical comparison")
+    sub.add_parser("poses", help="Pose convergence quality")
+    sub.add_parser("sar", help="Scaffold structure-activity relationships")
+    p = sub.add_parser("clusters", help="K-means clustering of binding modes")
+    p.add_argument("--k", default="3", help="Number of clusters, or 'auto' to pick by sampled silhouette")
+    p.add_argument("--k-range", type=int, nargs=2, default=[2, 8], metavar=("MIN", "MAX"),
+                   help="Range searched by --k auto")
+    p.add_argument("--scalable", action="store_true", default=None,
+                   help=f"MiniBatchKMeans (default above {SCALABLE_CLUSTERING_ROWS} rows or with --chunksize)")
+    p.add_argument("--sample-size", type=int, default=CLUSTER_SAMPLE_SIZE, help="Rows used to pick k")
+    p.add_argument("--n-jobs", type=int, default=None, help="Max CPU threads for clustering")
+    p.add_argument("--random-state", type=int, default=42)
+    p = sub.add_parser("visualize", help="Figures only (headless, parallel, cached)")
+    p.add_argument("--preview", action="store_true", help=f"Fast {PREVIEW_DPI} dpi *_preview files")
+    p.add_argument("--workers", type=int, default=None, help="Render processes (default: one per figure)")
+    p.add_argument("--force", action="store_true", help="Re-render even if the inputs are unchanged")
+    sub.add_parser("report", help="Markdown report only")
+    p = sub.add_parser("import-time", help="Measure module import time (startup regression check)")
+    p.add_argument("--repeats", type=int, default=5)
+    p.add_argument("--max-ms", type=float, default=None, help="Exit 1 if the import takes longer")
+    args = parser.parse_args()
+
+    if args.command == "import-time":
+        elapsed = measure_import_time(args.repeats)
+        print(f"⏱️  import docking_analysis: {elapsed:.1f} ms (best of {args.repeats})")
+        if args.max_ms is not None and elapsed > args.max_ms:
+            print(f"❌ Import time above the {args.max_ms:.0f} ms budget")
+            sys.exit(1)
+        return
+
+    print("🧬 AutoGrow4-OXA23 Comprehensive Docking Analysis")
+    print("=" * 60)
+    analyzer = AutoGrow4DockingAnalyzer(args.data_path, args.output_path, args.chunksize)
+    start = time.perf_counter()
+    if args.command in (None, "all"):
+        run_full_analysis(analyzer)
+    elif args.command == "binding":
+        binding_stats, improvements = analyzer.analyze_binding_affinities()
+        for name, value in binding_stats.items():
+            print(f"   {name}: {value:.2f}" if isinstance(value, float) else f"   {name}: {value}")
+        for standard, data in improvements.items():
+            print(f"   vs {standard}: best {data['best_improvement']:+.1f}, lead {data['lead_improvement']:+.1f} kcal/mol")
+    elif args.command == "poses":
+        _, quality_stats = analyzer.analyze_pose_quality()
+        for name, value in quality_stats.items():
+            print(f"   {name}: {value:.2f}" if isinstance(value, float) else f"   {name}: {value}")
+    elif args.command == "sar":
+        scaffold_performance, interaction_analysis = analyzer.analyze_structure_activity_relationships()
+        print(scaffold_performance.to_string())
+        print(interaction_analysis.to_string())
+    elif args.command == "clusters":
+        n_clusters = args.k if args.k == 'auto' else int(args.k)
+        _, cluster_analysis = analyzer.cluster_binding_modes(n_clusters, args.scalable, tuple(args.k_range),
+                                                             args.sample_size, args.n_jobs, args.random_state)
+        k_scores = analyzer.analysis_results['clustering']['k_scores']
+        if k_scores:
+            print("   Silhouette by k: " + ", ".join(f"{k}: {score:.3f}" for k, score in k_scores.items()))
+        print(cluster_analysis.to_string())
+    elif args.command == "visualize":
+        analyzer.create_comprehensive_visualizations(args.preview, args.workers, args.force)
+    elif args.command == "report":
+        print(f"📋 Comprehensive report: {analyzer.generate_comprehensive_report()}")
+    print(f"⏱️  {args.command or 'all'}: {time.perf_counter() - start:.2f} s")
+
 if __name__ == "__main__":
     main()
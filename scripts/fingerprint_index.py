@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 Fingerprint Index
+===========================
+
+Morgan fingerprints of every compound in the generation outputs, stored as a
+bit-packed uint64 matrix (2048 bits -> 32 words per compound) with Tanimoto
+similarity computed by vectorized popcount.
+
+Files in the index directory:
+    fingerprints.u64   raw little-endian uint64 rows, appended per generation
+    compounds.tsv      one line per row: canonical SMILES, ID, generation, affinity
+    manifest.json      fingerprint settings, row count and ingested ranked files
+
+The manifest is saved last and is the source of truth: rows beyond its counts
+(an update that died before saving it) are truncated away on the next open.
+
+The matrix is opened with np.memmap, so an index with hundreds of thousands of
+compounds loads instantly and one-vs-all searches stream over it in blocks.
+
+Usage:
+    python fingerprint_index.py update
+    python fingerprint_index.py search Gen_1_Mutant_43_485563 --threshold 0.7
+    python fingerprint_index.py search "CC1(C)[C@H](C(=O)O)N2C(=O)C[C@H]2S1(=O)=O" -k 10
+    python fingerprint_index.py benchmark --rows 300000
+
+Author: AutoGrow4-OXA23 Project
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from generation_io import find_ranked_files, read_ranked_file, canonical_smiles
+
+DEFAULT_INDEX_DIR = "../output/analysis/fingerprints/"
+N_BITS = 2048
+RADIUS = 2
+# Rows read per block when streaming over the memmap
+BLOCK_ROWS = 65536
+# Cap on the (queries x rows x words) AND temporary, in uint64 words (32 MB)
+BLOCK_WORDS = 1 << 22
+
+if hasattr(np, "bitwise_count"):
+    def popcount_rows(words):
+        """Set bits per row of a uint64 matrix"""
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int32)
+else:
+    _POPCOUNT_16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+    def popcount_rows(words):
+        """Set bits per row of a uint64 matrix (16-bit lookup table for NumPy < 2.0)"""
+        halves = np.ascontiguousarray(words).view(np.uint16)
+        return _POPCOUNT_16[halves].sum(axis=-1, dtype=np.int32)
+
+
+def morgan_fingerprints(smiles_list, n_bits=N_BITS, radius=RADIUS):
+    """(n x n_bits/64) packed uint64 Morgan fingerprints; unparsable SMILES get an all-zero row"""
+    from rdkit import Chem
+    from rdkit import RDLogger
+    from rdkit.Chem import rdFingerprintGenerator
+    RDLogger.DisableLog('rdApp.*')
+
+    generator = rdFingerprintGenerator.GetMorganGenerator(radius=radius, fpSize=n_bits)
+    bits = np.zeros((len(smiles_list), n_bits), dtype=np.uint8)
+    for i, smiles in enumerate(smiles_list):
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is not None:
+            bits[i] = generator.GetFingerprintAsNumPy(mol)
+    return np.packbits(bits, axis=1, bitorder='little').view('<u8')
+
+
+def tanimoto(queries, matrix, counts=None):
+    """(n_queries x n_rows) Tanimoto similarity between packed fingerprints"""
+    queries = np.atleast_2d(queries)
+    if counts is None:
+        counts = popcount_rows(matrix)
+    query_counts = popcount_rows(queries)
+    out = np.empty((len(queries), len(matrix)), dtype=np.float32)
+    block_rows = max(256, min(BLOCK_ROWS, BLOCK_WORDS // (len(queries) * queries.shape[1])))
+    for start in range(0, len(matrix), block_rows):
+        block = np.asarray(matrix[start:start + block_rows])
+        common = popcount_rows(queries[:, None, :] & block[None, :, :])
+        union = query_counts[:, None] + counts[None, start:start + len(block)] - common
+        out[:, start:start + len(block)] = np.where(union > 0, common / np.maximum(union, 1), 0.0)
+    return out
+
+
+class FingerprintIndex:
+    """Memory-mapped packed fingerprint matrix with incremental per-generation updates"""
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.matrix_path = self.index_dir / "fingerprints.u64"
+        self.compounds_path = self.index_dir / "compounds.tsv"
+        self.manifest_path = self.index_dir / "manifest.json"
+        self.manifest = {'n_bits': N_BITS, 'radius': RADIUS, 'rows': 0, 'ingested': {}}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r') as f:
+                self.manifest = json.load(f)
+        self._truncate_to_manifest()
+        self._reset_views()
+
+    @property
+    def words(self):
+        return self.manifest['n_bits'] // 64
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def _truncate_to_manifest(self):
+        """
+        Drop rows appended after the last saved manifest (an update that
+        crashed before save_manifest()), so the data files match its counts.
+        """
+        matrix_bytes = len(self) * self.words * 8
+        if self.matrix_path.exists() and self.matrix_path.stat().st_size > matrix_bytes:
+            os.truncate(self.matrix_path, matrix_bytes)
+        if not self.compounds_path.exists():
+            return
+        compounds_bytes = self.manifest.get('compounds_bytes')
+        if compounds_bytes is None:
+            # Manifests from before compounds_bytes: find the end of row `rows`
+            compounds_bytes = 0
+            with open(self.compounds_path, 'rb') as f:
+                for _, line in zip(range(len(self)), f):
+                    compounds_bytes += len(line)
+        if self.compounds_path.stat().st_size > compounds_bytes:
+            os.truncate(self.compounds_path, compounds_bytes)
+
+    def _reset_views(self):
+        self._matrix = self._counts = self._compounds = self._lookup = None
+
+    @property
+    def matrix(self):
+        """(rows x words) uint64 memmap"""
+        if self._matrix is None:
+            if len(self) == 0:
+                self._matrix = np.zeros((0, self.words), dtype='<u8')
+            else:
+                self._matrix = np.memmap(self.matrix_path, dtype='<u8', mode='r', shape=(len(self), self.words))
+        return self._matrix
+
+    @property
+    def counts(self):
+        """Set bits per row (computed once per load)"""
+        if self._counts is None:
+            self._counts = np.concatenate([popcount_rows(np.asarray(self.matrix[s:s + BLOCK_ROWS]))
+                                           for s in range(0, len(self), BLOCK_ROWS)] or [np.zeros(0, np.int32)])
+        return self._counts
+
+    @property
+    def compounds(self):
+        """Row metadata: list of (canonical SMILES, ID, generation, affinity)"""
+        if self._compounds is None:
+            self._compounds = []
+            if self.compounds_path.exists():
+                with open(self.compounds_path, 'r', newline='') as f:
+                    for key, compound_id, generation, affinity in csv.reader(f, delimiter='\t'):
+                        self._compounds.append((key, compound_id, int(generation), float(affinity)))
+        return self._compounds
+
+    def row_of(self, name):
+        """Row index of a compound ID or canonical SMILES, or None"""
+        if self._lookup is None:
+            self._lookup = {}
+            for row, (key, compound_id, _, _) in enumerate(self.compounds):
+                self._lookup.setdefault(key, row)
+                self._lookup.setdefault(compound_id, row)
+        return self._lookup.get(name)
+
+    # ---------------------------------------------------------------- update
+
+    def add(self, rows):
+        """Append ranked-file row dicts whose canonical SMILES isn't indexed yet; returns rows added"""
+        known = {key for key, _, _, _ in self.compounds}
+        new = {}
+        for row in rows:
+            key = canonical_smiles(row['smiles'])
+            if key not in known and key not in new:
+                new[key] = row
+        if not new:
+            return 0
+        fingerprints = morgan_fingerprints(list(new), self.manifest['n_bits'], self.manifest['radius'])
+        with open(self.matrix_path, 'ab') as f:
+            f.write(fingerprints.tobytes())
+        with open(self.compounds_path, 'a', newline='') as f:
+            writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+            for key, row in new.items():
+                writer.writerow([key, row['id'], row['generation'], row['affinity']])
+        # Rows only count once the manifest is saved; a crash before that is
+        # undone by _truncate_to_manifest() on the next open
+        self.manifest['rows'] += len(new)
+        self.manifest['compounds_bytes'] = self.compounds_path.stat().st_size
+        self._reset_views()
+        return len(new)
+
+    def update(self, output_path="../output/"):
+        """Index new or changed generation ranked files; returns {generation: rows added}"""
+        added = {}
+        for generation, path in find_ranked_files(output_path).items():
+            stat = path.stat()
+            signature = [stat.st_size, stat.st_mtime_ns]
+            if self.manifest['ingested'].get(str(generation)) == signature:
+                continue
+            added[generation] = self.add(read_ranked_file(path, generation))
+            self.manifest['ingested'][str(generation)] = signature
+        if added:
+            self.save_manifest()
+        return added
+
+    def save_manifest(self):
+        tmp = self.manifest_path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        tmp.replace(self.manifest_path)
+
+    # ---------------------------------------------------------------- search
+
+    def fingerprint(self, query):
+        """Packed fingerprint of an indexed ID / canonical SMILES, or of any SMILES"""
+        row = self.row_of(query)
+        if row is None:
+            row = self.row_of(canonical_smiles(query))
+        if row is not None:
+            return np.asarray(self.matrix[row])
+        return morgan_fingerprints([query], self.manifest['n_bits'], self.manifest['radius'])[0]
+
+    def similarity(self, queries):
+        """(n_queries x rows) Tanimoto of packed query fingerprints against the whole index"""
+        return tanimoto(queries, self.matrix, self.counts)
+
+    def top_k(self, query, k=10):
+        """[(row, similarity)] of the k most similar compounds"""
+        sims = self.similarity(self.fingerprint(query))[0]
+        k = min(k, len(sims))
+        best = np.argpartition(-sims, k - 1)[:k] if k else np.zeros(0, dtype=int)
+        best = best[np.argsort(-sims[best], kind='stable')]
+        return [(int(i), float(sims[i])) for i in best]
+
+    def within(self, query, threshold=0.7):
+        """[(row, similarity)] of every compound at or above a Tanimoto threshold"""
+        sims = self.similarity(self.fingerprint(query))[0]
+        rows = np.flatnonzero(sims >= threshold)
+        rows = rows[np.argsort(-sims[rows], kind='stable')]
+        return [(int(i), float(sims[i])) for i in rows]
+
+    def all_vs_all(self, rows=None):
+        """Dense Tanimoto matrix of the whole index (or a subset of rows)"""
+        matrix = self.matrix if rows is None else np.asarray(self.matrix)[rows]
+        counts = self.counts if rows is None else self.counts[rows]
+        return tanimoto(np.asarray(matrix), matrix, counts)
+
+    def pairs_above(self, threshold=0.7, batch=256):
+        """(i, j, similarity) for every pair i < j at or above the threshold"""
+        pairs = []
+        for start in range(0, len(self), batch):
+            sims = self.similarity(np.asarray(self.matrix[start:start + batch]))
+            i, j = np.nonzero(sims >= threshold)
+            i += start
+            keep = i < j
+            pairs.extend(zip(i[keep].tolist(), j[keep].tolist(), sims[i[keep] - start, j[keep]].tolist()))
+        return pairs
+
+
+def benchmark(rows=300000, queries=100, seed=0):
+    """Time one-vs-all searches over a synthetic packed matrix of `rows` compounds"""
+    rng = np.random.default_rng(seed)
+    # ~5% bit density, similar to 2048-bit Morgan fingerprints of drug-like molecules
+    bits = rng.random((rows, N_BITS), dtype=np.float32) < 0.05
+    matrix = np.packbits(bits, axis=1, bitorder='little').view('<u8')
+    start = time.perf_counter()
+    counts = popcount_rows(matrix)
+    count_time = time.perf_counter() - start
+    start = time.perf_counter()
+    tanimoto(matrix[:queries], matrix, counts)
+    search_time = time.perf_counter() - start
+    return {'rows': rows, 'queries': queries, 'popcount_s': count_time, 'search_s': search_time,
+            'per_query_ms': 1000 * search_time / queries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packed Morgan fingerprint index with Tanimoto search")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR, help=f"Index location (default: {DEFAULT_INDEX_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("update", help="Add new generations to the index")
+    p.add_argument("output_path", nargs="?", default="../output/")
+    p = sub.add_parser("search", help="Nearest neighbours of a compound ID or SMILES")
+    p.add_argument("query")
+    p.add_argument("-k", type=int, default=10, help="How many neighbours (ignored with --threshold)")
+    p.add_argument("--threshold", type=float, default=None, help="Every compound at or above this Tanimoto")
+    p = sub.add_parser("benchmark", help="Time one-vs-all search on synthetic fingerprints")
+    p.add_argument("--rows", type=int, default=300000)
+    p.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        result = benchmark(args.rows, args.queries)
+        print(f"⏱️  {result['rows']} rows: popcount {result['popcount_s']:.2f} s, "
+              f"{result['queries']} one-vs-all searches {result['search_s']:.2f} s "
+              f"({result['per_query_ms']:.1f} ms/query)")
+        return
+
+    index = FingerprintIndex(args.index_dir)
+    if args.command == "update":
+        added = index.update(args.output_path)
+        for generation, count in added.items():
+            print(f"✅ generation_{generation}: {count} new compounds")
+        print(f"📊 {len(index)} compounds indexed in {args.index_dir}")
+    elif args.command == "search":
+        start = time.perf_counter()
+        hits = (index.within(args.query, args.threshold) if args.threshold is not None
+                else index.top_k(args.query, args.k))
+        elapsed = time.perf_counter() - start
+        for row, sim in hits:
+            key, compound_id, generation, affinity = index.compounds[row]
+            print(f"   {sim:.3f}  {compound_id}  gen {generation}  {affinity}  {key}")
+        print(f"⏱️  {len(hits)} hits in {1000 * elapsed:.1f} ms over {len(index)} compounds")
+
+
+if __name__ == "__main__":
+    main()
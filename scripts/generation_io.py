@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 Generation File Reader
+================================
+
+Shared parsing of the `generation_N/generation_N_ranked.smi` files AutoGrow4
+writes each generation. Every row is tab separated:
+
+    SMILES  lineage  ID  diversity score  Vina score
+
+The lineage is `(parent1+parent2)ID` - for mutants the second parent is the
+reaction reagent (a ZINC ID), for crossovers both are earlier compounds;
+single-reactant mutations have just `(parent1)ID`.
+Seed compounds carry their own name as lineage and ID. Compounds carried over
+unchanged from an earlier generation (elitism) have an empty ID column; their
+ID is the one at the end of the lineage.
+
+Author: AutoGrow4-OXA23 Project
+"""
+
+import re
+from functools import lru_cache
+from pathlib import Path
+
+RANKED_GLOB = "generation_*/generation_*_ranked.smi"
+SEED_FOLDER_GLOB = "generation_*/SeedFolder/*.smi"
+LINEAGE_PATTERN = re.compile(r'^\(([^+)]*)(?:\+([^)]*))?\)(.+)$')
+ID_PATTERN = re.compile(r'^Gen_(\d+)_(Mutant|Cross)_(?:(\d+)_)?(\d+)$')
+
+
+def find_ranked_files(output_path="../output/"):
+    """{generation number: ranked .smi path}, in generation order"""
+    files = {}
+    for path in Path(output_path).glob(RANKED_GLOB):
+        generation = int(path.parent.name.split('_')[-1])
+        files[generation] = path
+    return dict(sorted(files.items()))
+
+
+def parse_lineage(lineage):
+    """(parent1, parent2) of a lineage string; parent2 is None for one-reactant mutations, both for seeds"""
+    match = LINEAGE_PATTERN.match(lineage)
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+def lineage_compound_id(lineage):
+    """Compound ID a lineage string ends with (the lineage itself for seeds)"""
+    match = LINEAGE_PATTERN.match(lineage)
+    return match.group(3) if match else lineage
+
+
+def parse_compound_id(compound_id):
+    """
+    (operator, reaction number) of a compound ID: ('Mutant', 23) for
+    Gen_5_Mutant_23_340201, ('Cross', None) for crossovers, ('Seed', None) otherwise.
+    """
+    match = ID_PATTERN.match(compound_id)
+    if not match:
+        return "Seed", None
+    reaction = match.group(3)
+    return match.group(2), int(reaction) if reaction is not None else None
+
+
+def generation_of(compound_id):
+    """Generation a compound was created in (0 for seeds)"""
+    match = ID_PATTERN.match(compound_id)
+    return int(match.group(1)) if match else 0
+
+
+@lru_cache(maxsize=None)
+def canonical_smiles(smiles):
+    """RDKit canonical SMILES (isomeric); the input unchanged if RDKit can't parse it"""
+    from rdkit import Chem
+    from rdkit import RDLogger
+    RDLogger.DisableLog('rdApp.*')
+
+    mol = Chem.MolFromSmiles(smiles)
+    return Chem.MolToSmiles(mol) if mol is not None else smiles
+
+
+def read_ranked_file(path, generation=None):
+    """
+    Parse one ranked .smi file into a list of row dicts (in rank order) with
+    keys generation, rank, smiles, lineage, id, parent1, parent2, operator,
+    reaction, diversity, affinity and carried_over.
+    """
+    path = Path(path)
+    if generation is None:
+        generation = int(path.parent.name.split('_')[-1])
+    rows = []
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 5:
+                continue
+            smiles, lineage, compound_id, diversity, affinity = fields[:5]
+            carried_over = not compound_id
+            if carried_over:
+                compound_id = lineage_compound_id(lineage)
+            parent1, parent2 = parse_lineage(lineage)
+            operator, reaction = parse_compound_id(compound_id)
+            rows.append({
+                'generation': generation,
+                'rank': len(rows) + 1,
+                'smiles': smiles,
+                'lineage': lineage,
+                'id': compound_id,
+                'parent1': parent1,
+                'parent2': parent2,
+                'operator': operator,
+                'reaction': reaction,
+                'diversity': float(diversity),
+                'affinity': float(affinity),
+                'carried_over': carried_over,
+            })
+    return rows
+
+
+def read_lineage_file(path):
+    """
+    Minimal parse of any AutoGrow4 .smi file with at least SMILES and lineage
+    columns (ranked files, SeedFolder lists, the seed ligand file). Returns
+    row dicts with keys smiles, id, parent1, parent2 and affinity (None when
+    the file has no score column).
+    """
+    rows = []
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 2 or not fields[0]:
+                continue
+            lineage = fields[1]
+            compound_id = fields[2] if len(fields) > 2 and fields[2] else lineage_compound_id(lineage)
+            parent1, parent2 = parse_lineage(lineage)
+            rows.append({
+                'smiles': fields[0],
+                'id': compound_id,
+                'parent1': parent1,
+                'parent2': parent2,
+                'affinity': float(fields[4]) if len(fields) > 4 and fields[4] else None,
+            })
+    return rows
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 Generation Watcher
+============================
+
+Live statistics while a campaign is still running. The watcher polls the
+AutoGrow4 output folder and processes each `generation_N/` once, as soon as
+its `generation_N_ranked.smi` appears and stops changing. It then updates the
+running aggregates and the running Top-150, which was previously exported
+by hand to Top_150_Best_Binders.xlsx.
+
+Running aggregates cover newly created compounds only, so elites carried over
+between generations are counted once. They include the count, best, mean and
+quantiles of affinity and diversity.
+
+All state is kept in a small JSON file, so each update only reads the new
+generation, including after a restart. Vina scores have 0.1 kcal/mol
+resolution, so the affinity quantiles come from an exact histogram.
+Diversity quantiles use 0.1-wide bins.
+
+Usage:
+    python generation_watcher.py --interval 60
+    python generation_watcher.py --once
+
+Author: AutoGrow4-OXA23 Project
+"""
+
+import csv
+import json
+import time
+import heapq
+import argparse
+from pathlib import Path
+
+from generation_io import find_ranked_files, read_ranked_file, canonical_smiles
+
+TOP_N = 150
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+DEFAULT_STATE_DIR = "../output/analysis/live/"
+
+
+class RunningStats:
+    """Count/sum/min/max plus a fixed-resolution histogram for quantiles"""
+
+    def __init__(self, resolution, count=0, total=0.0, total_sq=0.0, minimum=None, maximum=None, histogram=None):
+        self.resolution = resolution
+        self.count = count
+        self.total = total
+        self.total_sq = total_sq
+        self.minimum = minimum
+        self.maximum = maximum
+        # bin index -> count; JSON turns the keys into strings
+        self.histogram = {int(k): v for k, v in (histogram or {}).items()}
+
+    def add(self, values):
+        for value in values:
+            self.count += 1
+            self.total += value
+            self.total_sq += value * value
+            self.minimum = value if self.minimum is None else min(self.minimum, value)
+            self.maximum = value if self.maximum is None else max(self.maximum, value)
+            key = round(value / self.resolution)
+            self.histogram[key] = self.histogram.get(key, 0) + 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return None
+        variance = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+        return max(variance, 0.0) ** 0.5
+
+    def quantile(self, q):
+        """Lower quantile from the histogram (exact at the histogram's resolution)"""
+        if not self.count:
+            return None
+        target = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.histogram):
+            seen += self.histogram[key]
+            if seen > target:
+                return round(key * self.resolution, 6)
+        return self.maximum
+
+    def summary(self):
+        summary = {'count': self.count, 'min': self.minimum, 'max': self.maximum,
+                   'mean': self.mean, 'std': self.std}
+        summary.update({f"q{int(q * 100):02d}": self.quantile(q) for q in QUANTILES})
+        return summary
+
+    def to_dict(self):
+        return {'resolution': self.resolution, 'count': self.count, 'total': self.total,
+                'total_sq': self.total_sq, 'minimum': self.minimum, 'maximum': self.maximum,
+                'histogram': self.histogram}
+
+
+class GenerationWatcher:
+    """Incremental per-generation aggregation with persisted state"""
+
+    def __init__(self, output_path="../output/", state_dir=DEFAULT_STATE_DIR, top_n=TOP_N, settle=5.0):
+        self.output_path = Path(output_path)
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.state_path = self.state_dir / "watcher_state.json"
+        self.top_n = top_n
+        self.settle = settle
+        self.load_state()
+
+    def load_state(self):
+        state = {}
+        if self.state_path.exists():
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        self.processed = state.get('processed', {})
+        self.affinity = RunningStats(**state.get('affinity', {'resolution': 0.1}))
+        self.diversity = RunningStats(**state.get('diversity', {'resolution': 0.1}))
+        self.top = state.get('top', [])
+        self.generations = state.get('generations', [])
+
+    def save_state(self):
+        state = {'processed': self.processed, 'affinity': self.affinity.to_dict(),
+                 'diversity': self.diversity.to_dict(), 'top': self.top, 'generations': self.generations}
+        tmp = self.state_path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        tmp.replace(self.state_path)
+
+    def ready_generations(self):
+        """(generation, ranked file) pairs that are complete and not processed yet"""
+        now = time.time()
+        ready = []
+        for generation, path in find_ranked_files(self.output_path).items():
+            if str(generation) in self.processed:
+                continue
+            if now - path.stat().st_mtime < self.settle:
+                continue  # AutoGrow4 may still be writing it
+            ready.append((generation, path))
+        return ready
+
+    def process_generation(self, generation, path):
+        """Fold one finished generation into the running state"""
+        rows = read_ranked_file(path, generation)
+        new_rows = [row for row in rows if not row['carried_over']]
+        self.affinity.add(row['affinity'] for row in new_rows)
+        self.diversity.add(row['diversity'] for row in new_rows)
+
+        # Running Top-N: the current Top-N plus this generation's rows,
+        # one entry per canonical SMILES at its best score
+        best = {entry['canonical_smiles']: entry for entry in self.top}
+        for row in rows:
+            key = canonical_smiles(row['smiles'])
+            if key not in best or row['affinity'] < best[key]['affinity']:
+                best[key] = {'canonical_smiles': key, 'id': row['id'], 'smiles': row['smiles'],
+                             'generation': row['generation'], 'affinity': row['affinity'],
+                             'diversity': row['diversity']}
+        self.top = heapq.nsmallest(self.top_n, best.values(), key=lambda e: (e['affinity'], e['generation']))
+
+        affinities = sorted(row['affinity'] for row in rows)
+        self.generations.append({
+            'generation': generation,
+            'compounds': len(rows),
+            'new_compounds': len(new_rows),
+            'best_affinity': affinities[0] if affinities else None,
+            'mean_affinity': sum(affinities) / len(affinities) if affinities else None,
+            'median_affinity': affinities[len(affinities) // 2] if affinities else None,
+            'mean_diversity': sum(r['diversity'] for r in rows) / len(rows) if rows else None,
+            'running_best': self.affinity.minimum,
+            'top_n_cutoff': self.top[-1]['affinity'] if len(self.top) == self.top_n else None,
+        })
+        self.generations.sort(key=lambda g: g['generation'])
+        stat = path.stat()
+        self.processed[str(generation)] = [stat.st_size, stat.st_mtime_ns]
+
+    def update(self):
+        """Process every newly finished generation; returns their numbers"""
+        done = []
+        for generation, path in self.ready_generations():
+            self.process_generation(generation, path)
+            done.append(generation)
+        if done:
+            self.save_state()
+            self.export()
+        return done
+
+    def export(self):
+        """Write the running Top-N and per-generation summary as CSV"""
+        top_path = self.state_dir / f"Top_{self.top_n}_Best_Binders_live.csv"
+        with open(top_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Rank', 'ID', 'Generation', 'Binding_Affinity_kcal_mol', 'Diversity', 'SMILES'])
+            for rank, entry in enumerate(self.top, 1):
+                writer.writerow([rank, entry['id'], entry['generation'], entry['affinity'],
+                                 entry['diversity'], entry['smiles']])
+        if self.generations:
+            with open(self.state_dir / "generation_summary_live.csv", 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(self.generations[0]))
+                writer.writeheader()
+                writer.writerows(self.generations)
+
+    def print_status(self, new_generations):
+        aff, div = self.affinity.summary(), self.diversity.summary()
+
+        def mean(summary):
+            # None until a generation with scored compounds has been read
+            return 'n/a' if summary['mean'] is None else f"{summary['mean']:.2f}"
+
+        print(f"🧬 Processed generation(s) {', '.join(map(str, new_generations))} "
+              f"({len(self.processed)} total)")
+        print(f"   Affinity: best {aff['min']}, mean {mean(aff)}, "
+              f"median {aff['q50']}, 5-95% [{aff['q05']}, {aff['q95']}] kcal/mol over {aff['count']} compounds")
+        print(f"   Diversity: mean {mean(div)}, median {div['q50']}")
+        if self.top:
+            print(f"   Top-{self.top_n}: best {self.top[0]['id']} ({self.top[0]['affinity']}), "
+                  f"cutoff {self.top[-1]['affinity']} kcal/mol")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live statistics for a running AutoGrow4 campaign")
+    parser.add_argument("--output-path", default="../output/", help="AutoGrow4 output folder")
+    parser.add_argument("--state-dir", default=DEFAULT_STATE_DIR, help="Where state and live CSVs go")
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between polls")
+    parser.add_argument("--settle", type=float, default=5.0,
+                        help="A ranked file must be unchanged this long before it is read")
+    parser.add_argument("--top", type=int, default=TOP_N, help="Size of the running top list")
+    parser.add_argument("--once", action="store_true", help="Process what's there and exit")
+    args = parser.parse_args()
+
+    watcher = GenerationWatcher(args.output_path, args.state_dir, args.top, args.settle)
+    print(f"👀 Watching {args.output_path} ({len(watcher.processed)} generation(s) already processed)")
+    try:
+        while True:
+            new_generations = watcher.update()
+            if new_generations:
+                watcher.print_status(new_generations)
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n👋 Watcher stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -219,9 +219,9 @@ def main():
     
     print("🏆 TOP 5 COMPOUNDS BY BINDING AFFINITY:")
     top_5_affinity = interaction_df.nsmallest(5, 'Binding_Affinity_kcal_mol')
-    for _, row in top_5_affinity.iterrows():
-        print(f"   Molecule {int(row['Molecule_ID'])}: {row['Binding_Affinity_kcal_mol']:.1f} kcal/mol "
-              f"({row['Scaffold_Type']}) - {row['Development_Priority']}")
+    for row in top_5_affinity.itertuples(index=False):
+        print(f"   Molecule {int(row.Molecule_ID)}: {row.Binding_Affinity_kcal_mol:.1f} kcal/mol "
+              f"({row.Scaffold_Type}) - {row.Development_Priority}")
     
     print(f"\n🎖️ LEAD COMPOUND EXCELLENCE (Molecule 1):")
     lead = interaction_df[interaction_df['Development_Priority'] == 'Lead_Compound'].iloc[0]
@@ -234,14 +234,14 @@ def main():
     print(f"\n⚡ BINDING AFFINITY ACHIEVEMENTS:")
     print(f"   Highest Affinity: {interaction_df['Binding_Affinity_kcal_mol'].min():.1f} kcal/mol (Molecule {interaction_df.loc[interaction_df['Binding_Affinity_kcal_mol'].idxmin(), 'Molecule_ID']:.0f})")
     print(f"   Average Affinity: {interaction_df['Binding_Affinity_kcal_mol'].mean():.1f} kcal/mol")
-    print(f"   Compounds >-8.0: {len(interaction_df[interaction_df['Binding_Affinity_kcal_mol'] <= -8.0])}/10")
+    print(f"   Compounds >-8.0: {(interaction_df['Binding_Affinity_kcal_mol'] <= -8.0).sum()}/{len(interaction_df)}")
     print(f"   Clinical Superiority: +{interaction_df['Clinical_Superiority_vs_Sulbactam'].mean():.1f} kcal/mol vs sulbactam")
     
     print(f"\n🧪 SCAFFOLD PERFORMANCE:")
     best_scaffolds = scaffold_df.head(5)
-    for _, row in best_scaffolds.iterrows():
-        print(f"   {row['Scaffold_Type']}: {row['Best_Affinity']:.1f} kcal/mol "
-              f"(ADME: {row['ADME_Score']:.1f}) - {row['Development_Status']}")
+    for row in best_scaffolds.itertuples(index=False):
+        print(f"   {row.Scaffold_Type}: {row.Best_Affinity:.1f} kcal/mol "
+              f"(ADME: {row.ADME_Score:.1f}) - {row.Development_Status}")
     
     print(f"\n📁 FILES GENERATED:")
     print(f"   📄 {main_filename} - Complete molecular analysis")
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 Lineage Index
+=======================
+
+Parent -> child DAG of every compound in a campaign, built from the lineage
+strings (`(Gen_31_Mutant_24_458387+ZINC000014000268)Gen_32_Mutant_23_953592`)
+of the ranked and SeedFolder .smi files plus the seed ligand file.
+
+Nodes are seeds, ZINC reagent fragments and generated compounds; edges point
+from parent to child and carry the parent's role ('parent', 'reagent' or
+'cross'). Each compound also stores its SMILES, creation generation, best
+seen Vina score and depth to the nearest seed.
+
+The graph is pickled next to the other analysis outputs together with the
+size/mtime of every source file, and only rebuilt when one of them changes.
+
+Usage:
+    python lineage_index.py build
+    python lineage_index.py path Gen_32_Mutant_23_953592
+    python lineage_index.py ancestors Gen_32_Mutant_23_953592
+    python lineage_index.py descendants Sulbactam --limit 20
+    python lineage_index.py contributions --top 150
+
+Author: AutoGrow4-OXA23 Project
+"""
+
+import pickle
+import argparse
+from collections import Counter
+from pathlib import Path
+
+import networkx as nx
+
+from generation_io import read_lineage_file, generation_of, RANKED_GLOB, SEED_FOLDER_GLOB
+
+DEFAULT_INDEX = "../output/analysis/lineage_index.pkl"
+DEFAULT_SEEDS = "../config/seed_ligands.smi"
+INDEX_VERSION = 1
+
+
+def source_files(output_path, seed_file):
+    """Every file the index is built from"""
+    output_path = Path(output_path)
+    files = sorted(output_path.glob(RANKED_GLOB)) + sorted(output_path.glob(SEED_FOLDER_GLOB))
+    if Path(seed_file).exists():
+        files.insert(0, Path(seed_file))
+    return files
+
+
+def file_signatures(files):
+    return {str(path): (path.stat().st_size, path.stat().st_mtime_ns) for path in files}
+
+
+class LineageIndex:
+    """Persisted lineage DAG with ancestor/descendant and seed-contribution queries"""
+
+    def __init__(self, graph, signatures=None):
+        self.graph = graph
+        self.signatures = signatures or {}
+
+    # ----------------------------------------------------------------- build
+
+    @classmethod
+    def build(cls, output_path="../output/", seed_file=DEFAULT_SEEDS):
+        """Parse every source file into a fresh DAG"""
+        graph = nx.DiGraph()
+        files = source_files(output_path, seed_file)
+
+        def add_compound(compound_id, kind, smiles=None, affinity=None):
+            if compound_id not in graph:
+                graph.add_node(compound_id, kind=kind, smiles=smiles,
+                               generation=generation_of(compound_id), affinity=affinity)
+                return
+            attrs = graph.nodes[compound_id]
+            if smiles and not attrs.get('smiles'):
+                attrs['smiles'] = smiles
+            if affinity is not None and (attrs.get('affinity') is None or affinity < attrs['affinity']):
+                attrs['affinity'] = affinity
+
+        for path in files:
+            for row in read_lineage_file(path):
+                compound_id = row['id']
+                kind = 'compound' if generation_of(compound_id) else 'seed'
+                add_compound(compound_id, kind, row['smiles'], row['affinity'])
+                parents = [(row['parent1'], 'parent'), (row['parent2'], 'reagent')]
+                for parent, role in parents:
+                    if parent is None or graph.has_edge(parent, compound_id):
+                        continue
+                    if parent.startswith('ZINC'):
+                        add_compound(parent, 'fragment')
+                    else:
+                        add_compound(parent, 'compound' if generation_of(parent) else 'seed')
+                        if role == 'reagent':
+                            role = 'cross'
+                    graph.add_edge(parent, compound_id, role=role)
+
+        cls._assign_depths(graph)
+        return cls(graph, file_signatures(files))
+
+    @staticmethod
+    def _assign_depths(graph):
+        """Depth to the nearest seed via compound parents (fragments don't count)"""
+        for node in nx.topological_sort(graph):
+            attrs = graph.nodes[node]
+            if attrs['kind'] == 'seed':
+                attrs['depth'] = 0
+                continue
+            depths = [graph.nodes[p].get('depth') for p in graph.predecessors(node)
+                      if graph.nodes[p]['kind'] != 'fragment']
+            depths = [d for d in depths if d is not None]
+            attrs['depth'] = 1 + min(depths) if depths else None
+
+    # ----------------------------------------------------------- persistence
+
+    def save(self, path=DEFAULT_INDEX):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump({'version': INDEX_VERSION, 'signatures': self.signatures, 'graph': self.graph}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX, output_path="../output/", seed_file=DEFAULT_SEEDS):
+        """The saved index if its sources are unchanged, otherwise a rebuilt (and saved) one"""
+        path = Path(path)
+        current = file_signatures(source_files(output_path, seed_file))
+        if path.exists():
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('version') == INDEX_VERSION and data.get('signatures') == current:
+                return cls(data['graph'], data['signatures'])
+        index = cls.build(output_path, seed_file)
+        index.save(path)
+        return index
+
+    # ---------------------------------------------------------------- queries
+
+    def _check(self, compound_id):
+        if compound_id not in self.graph:
+            raise KeyError(compound_id)
+
+    def ancestors(self, compound_id, kind=None):
+        """Everything `compound_id` was made from, optionally only one kind"""
+        self._check(compound_id)
+        found = nx.ancestors(self.graph, compound_id)
+        return {n for n in found if kind is None or self.graph.nodes[n]['kind'] == kind}
+
+    def descendants(self, compound_id):
+        """Every compound derived from `compound_id`"""
+        self._check(compound_id)
+        return nx.descendants(self.graph, compound_id)
+
+    def parents(self, compound_id):
+        """{parent: role} of one compound"""
+        self._check(compound_id)
+        return {p: self.graph.edges[p, compound_id]['role'] for p in self.graph.predecessors(compound_id)}
+
+    def depth(self, compound_id):
+        """Generations of synthesis between `compound_id` and its nearest seed"""
+        self._check(compound_id)
+        return self.graph.nodes[compound_id].get('depth')
+
+    def path_to_seed(self, compound_id):
+        """Shortest chain of compounds from the nearest seed down to `compound_id`"""
+        self._check(compound_id)
+        node, path = compound_id, [compound_id]
+        while self.graph.nodes[node]['kind'] != 'seed':
+            candidates = [p for p in self.graph.predecessors(node)
+                          if self.graph.nodes[p]['kind'] != 'fragment'
+                          and self.graph.nodes[p].get('depth') is not None]
+            if not candidates:
+                break
+            node = min(candidates, key=lambda p: self.graph.nodes[p]['depth'])
+            path.append(node)
+        return path[::-1]
+
+    def top_compounds(self, n=150):
+        """The n best-scoring generated compounds (each ID once, at its best score)"""
+        scored = [(attrs['affinity'], node) for node, attrs in self.graph.nodes(data=True)
+                  if attrs['kind'] == 'compound' and attrs.get('affinity') is not None]
+        return [node for _, node in sorted(scored)[:n]]
+
+    def contributions(self, compound_ids):
+        """
+        (seed Counter, fragment Counter): how many of `compound_ids` have each
+        seed / ZINC fragment among their ancestors
+        """
+        seeds, fragments = Counter(), Counter()
+        for compound_id in compound_ids:
+            for node in self.ancestors(compound_id):
+                kind = self.graph.nodes[node]['kind']
+                if kind == 'seed':
+                    seeds[node] += 1
+                elif kind == 'fragment':
+                    fragments[node] += 1
+        return seeds, fragments
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the AutoGrow4 lineage index")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help=f"Index file (default: {DEFAULT_INDEX})")
+    parser.add_argument("--output-path", default="../output/", help="AutoGrow4 output folder")
+    parser.add_argument("--seeds", default=DEFAULT_SEEDS, help="Seed ligand .smi file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Rebuild and save the index")
+    for name in ("path", "ancestors", "descendants"):
+        p = sub.add_parser(name)
+        p.add_argument("compound_id")
+        p.add_argument("--limit", type=int, default=None)
+    p = sub.add_parser("contributions", help="Seeds and ZINC fragments behind the top compounds")
+    p.add_argument("--top", type=int, default=150)
+    p.add_argument("--fragments", type=int, default=10, help="How many fragments to list")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = LineageIndex.build(args.output_path, args.seeds)
+        index.save(args.index)
+        kinds = Counter(attrs['kind'] for _, attrs in index.graph.nodes(data=True))
+        print(f"✅ Lineage index saved: {args.index}")
+        print(f"📊 {index.graph.number_of_nodes()} nodes ({', '.join(f'{v} {k}s' for k, v in kinds.items())}), "
+              f"{index.graph.number_of_edges()} edges")
+        return
+
+    index = LineageIndex.load(args.index, args.output_path, args.seeds)
+    try:
+        if args.command == "path":
+            path = index.path_to_seed(args.compound_id)
+            print(" -> ".join(path))
+            print(f"🌱 Depth to seed: {index.depth(args.compound_id)}")
+        elif args.command in ("ancestors", "descendants"):
+            found = getattr(index, args.command)(args.compound_id)
+            nodes = sorted(found, key=lambda n: (index.graph.nodes[n]['generation'], n))
+            for node in nodes[:args.limit]:
+                attrs = index.graph.nodes[node]
+                print(f"   {node}  {attrs['kind']}  gen {attrs['generation']}  {attrs.get('affinity')}")
+            print(f"📊 {len(found)} {args.command}")
+    except KeyError:
+        parser.exit(1, f"❌ {args.compound_id} is not in the lineage index\n")
+
+    if args.command == "contributions":
+        top = index.top_compounds(args.top)
+        seeds, fragments = index.contributions(top)
+        print(f"🌱 Seeds behind the top {len(top)} compounds:")
+        for seed, count in seeds.most_common():
+            print(f"   {seed}: {count}")
+        print(f"🧩 Most used ZINC fragments:")
+        for fragment, count in fragments.most_common(args.fragments):
+            print(f"   {fragment}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 Parallel Generation Ingest
+====================================
+
+Reads every `generation_N/` folder of a campaign in a process pool: each
+worker parses one generation's ranked .smi, its SeedFolder lists and the
+Vina poses in its gzipped PDB archive.
+
+Workers send back typed NumPy columns (fixed-width string arrays,
+int/float arrays, one float32 coordinate block per generation) instead of
+lists of dicts, so a generation is pickled as a handful of buffers. The
+parent concatenates them in generation order, so the result is the same for
+any worker count.
+
+Tables returned by `ingest_campaign()`:
+    ranked   generation, rank, smiles, lineage, id, parent1, parent2, operator,
+             reaction (-1 = none), diversity, affinity, carried_over
+    seeds    generation, list (SeedFolder file, e.g. Chosen_Mutants), smiles,
+             id, parent1, parent2
+    poses    generation, id, model, affinity, start, n_atoms
+    atoms    coords (atoms x 3 float32), elements (atomic numbers); pose i is
+             atoms[start[i]:start[i] + n_atoms[i]]
+
+Missing parents are empty strings.
+
+Usage:
+    python parallel_ingest.py summary --workers 8
+    python parallel_ingest.py benchmark --workers 1 2 4 8
+
+Author: AutoGrow4-OXA23 Project
+"""
+
+import os
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from generation_io import read_ranked_file, read_lineage_file, find_ranked_files
+from pdb_archive import PDBArchive, ARCHIVE_NAME
+from pose_store import parse_vina_models, VINA_SUFFIX
+
+TABLES = ("ranked", "seeds", "poses", "atoms")
+
+
+def _strings(values):
+    """Fixed-width unicode array ('' for None)"""
+    return np.array([value or '' for value in values], dtype=str)
+
+
+def ranked_columns(rows, generation):
+    """Columns of the ranked table for one generation's ranked rows"""
+    return {
+        'generation': np.full(len(rows), generation, dtype=np.int32),
+        'rank': np.array([r['rank'] for r in rows], dtype=np.int32),
+        'smiles': _strings(r['smiles'] for r in rows),
+        'lineage': _strings(r['lineage'] for r in rows),
+        'id': _strings(r['id'] for r in rows),
+        'parent1': _strings(r['parent1'] for r in rows),
+        'parent2': _strings(r['parent2'] for r in rows),
+        'operator': _strings(r['operator'] for r in rows),
+        'reaction': np.array([-1 if r['reaction'] is None else r['reaction'] for r in rows], dtype=np.int32),
+        'diversity': np.array([r['diversity'] for r in rows], dtype=np.float64),
+        'affinity': np.array([r['affinity'] for r in rows], dtype=np.float64),
+        'carried_over': np.array([r['carried_over'] for r in rows], dtype=bool),
+    }
+
+
+def seed_columns(lists, seed_rows, generation):
+    """Columns of the seeds table: source list name and lineage row per seed"""
+    return {
+        'generation': np.full(len(seed_rows), generation, dtype=np.int32),
+        'list': _strings(lists),
+        'smiles': _strings(r['smiles'] for r in seed_rows),
+        'id': _strings(r['id'] for r in seed_rows),
+        'parent1': _strings(r['parent1'] for r in seed_rows),
+        'parent2': _strings(r['parent2'] for r in seed_rows),
+    }
+
+
+def pose_columns(names, models, affinities, coords, elements, generation):
+    """Columns of the poses and atoms tables for one generation's Vina models"""
+    n_atoms = np.array([len(xyz) for xyz in coords], dtype=np.int32)
+    poses = {
+        'generation': np.full(len(names), generation, dtype=np.int32),
+        'id': _strings(names),
+        'model': np.array(models, dtype=np.int32),
+        'affinity': np.array(affinities, dtype=np.float32),
+        # Local to this generation; shifted when merged
+        'start': (np.cumsum(n_atoms, dtype=np.int64) - n_atoms),
+        'n_atoms': n_atoms,
+    }
+    atoms = {
+        'coords': np.concatenate(coords) if coords else np.zeros((0, 3), dtype=np.float32),
+        'elements': np.concatenate(elements) if elements else np.zeros(0, dtype=np.uint8),
+    }
+    return poses, atoms
+
+
+def empty_tables():
+    """Zero-row tables with the columns and dtypes of a parsed campaign"""
+    tables = {'ranked': ranked_columns([], 0), 'seeds': seed_columns([], [], 0)}
+    tables['poses'], tables['atoms'] = pose_columns([], [], [], [], [], 0)
+    return tables
+
+
+def parse_generation(generation_dir, poses=True, all_models=True):
+    """Columns of one generation folder (runs in a worker process)"""
+    generation_dir = Path(generation_dir)
+    generation = int(generation_dir.name.split('_')[-1])
+    result = {}
+
+    ranked_path = generation_dir / f"generation_{generation}_ranked.smi"
+    rows = read_ranked_file(ranked_path, generation) if ranked_path.exists() else []
+    result['ranked'] = ranked_columns(rows, generation)
+
+    lists, seed_rows = [], []
+    for path in sorted((generation_dir / "SeedFolder").glob("*.smi")):
+        rows = read_lineage_file(path)
+        lists.extend([path.stem.replace(f"_Gen_{generation}", "")] * len(rows))
+        seed_rows.extend(rows)
+    result['seeds'] = seed_columns(lists, seed_rows, generation)
+
+    names, models, affinities, coords, elements = [], [], [], [], []
+    archive = generation_dir / "PDBs" / ARCHIVE_NAME
+    if poses and archive.exists():
+        for name, text in PDBArchive(archive).items():
+            if not name.endswith(VINA_SUFFIX):
+                continue
+            compound_id = name[:-len(VINA_SUFFIX)].rsplit('__', 1)[0]
+            for model, affinity, xyz, element in parse_vina_models(text):
+                if all_models or model == 1:
+                    names.append(compound_id)
+                    models.append(model)
+                    affinities.append(affinity)
+                    coords.append(xyz)
+                    elements.append(element)
+    result['poses'], result['atoms'] = pose_columns(names, models, affinities, coords, elements, generation)
+    return result
+
+
+def _parse_job(job):
+    return parse_generation(*job)
+
+
+def merge_generations(parts):
+    """Concatenate per-generation columns in order, re-basing pose atom offsets"""
+    if not parts:
+        return empty_tables()
+    merged = {}
+    atom_offset = 0
+    for part in parts:
+        part['poses']['start'] = part['poses']['start'] + atom_offset
+        atom_offset += len(part['atoms']['elements'])
+    for table in TABLES:
+        columns = parts[0][table]
+        # np.concatenate widens fixed-width string columns to the longest entry
+        merged[table] = {name: np.concatenate([part[table][name] for part in parts]) for name in columns}
+    return merged
+
+
+def generation_dirs(output_path="../output/"):
+    """generation_N folders in generation order"""
+    dirs = [path for path in Path(output_path).glob("generation_*")
+            if path.is_dir() and path.name.split('_')[-1].isdigit()]
+    return sorted(dirs, key=lambda path: int(path.name.split('_')[-1]))
+
+
+def ingest_campaign(output_path="../output/", workers=None, poses=True, all_models=True):
+    """
+    Parse every generation folder with `workers` processes (default: all
+    cores; 1 parses in this process). Returns {table: {column: array}}.
+    """
+    jobs = [(str(path), poses, all_models) for path in generation_dirs(output_path)]
+    if not jobs:
+        return merge_generations([])
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers == 1:
+        parts = [_parse_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() yields in submission order: the merge is deterministic
+            parts = list(pool.map(_parse_job, jobs))
+    return merge_generations(parts)
+
+
+def as_dataframe(table):
+    """One ingested table as a pandas DataFrame (pandas imported on demand)"""
+    import pandas as pd
+    return pd.DataFrame({name: column for name, column in table.items() if column.ndim == 1})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse AutoGrow4 generation folders in parallel")
+    parser.add_argument("--output-path", default="../output/", help="AutoGrow4 output folder")
+    parser.add_argument("--no-poses", action="store_true", help="Skip the PDB archives")
+    parser.add_argument("--top-model-only", action="store_true", help="Keep only Vina model 1 of each ligand")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("summary", help="Ingest the campaign and print table sizes")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    p = sub.add_parser("benchmark", help="Time ingestion at several worker counts")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    generations = len(generation_dirs(args.output_path))
+    if args.command == "summary":
+        start = time.perf_counter()
+        tables = ingest_campaign(args.output_path, args.workers, not args.no_poses, not args.top_model_only)
+        elapsed = time.perf_counter() - start
+        if not generations:
+            print(f"⚠️  No generation folders in {args.output_path}")
+        print(f"📊 {generations} generations ({len(find_ranked_files(args.output_path))} ranked):")
+        print(f"   ranked: {len(tables['ranked']['id'])} rows")
+        print(f"   seeds:  {len(tables['seeds']['id'])} rows")
+        print(f"   poses:  {len(tables['poses']['id'])} poses, {len(tables['atoms']['elements'])} atoms")
+        print(f"⏱️  {elapsed:.2f} s")
+        return
+
+    reference = None
+    for workers in dict.fromkeys(args.workers):
+        start = time.perf_counter()
+        tables = ingest_campaign(args.output_path, workers, not args.no_poses, not args.top_model_only)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference, baseline = tables, elapsed
+        same = all(np.array_equal(reference[t][c], tables[t][c]) for t in TABLES for c in tables[t])
+        print(f"⏱️  {workers} worker(s): {elapsed:.2f} s ({baseline / elapsed:.1f}x)"
+              f"{'' if same else '  ❌ result differs'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 PDB Archive Index
+===========================
+
+Random access to the `generation_N/PDBs/compressed_PDBS.txt.gz` archives.
+
+AutoGrow4 writes each archive as one gzip stream of concatenated files, each
+preceded by a `##############################File_name: <name>` header line, so
+reading one pose means decompressing everything before it. `build_index()`
+re-blocks an archive into independent gzip members of at most 64 KB of text
+that never split a file (BGZF-style: still a valid gzip that zcat and AutoGrow4
+read unchanged) and writes a sidecar `compressed_PDBS.txt.gz.idx` with the
+block and in-block position of every file. A lookup is then one seek plus one
+block decompression.
+
+Indexing rewrites the archives in place (permissions kept); the per-block
+gzip members make them somewhat larger, e.g. 59 KB -> 76 KB. Archives without
+an index (or with a stale one) are still read by scanning.
+
+Usage:
+    python pdb_archive.py index ../output
+    python pdb_archive.py get ../output Gen_32_Cross_501146__1.pdb -o pose.pdb
+    python pdb_archive.py list ../output/generation_32/PDBs/compressed_PDBS.txt.gz
+"""
+
+import re
+import os
+import gzip
+import json
+import zlib
+import shutil
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+
+ARCHIVE_NAME = "compressed_PDBS.txt.gz"
+INDEX_SUFFIX = ".idx"
+INDEX_FORMAT = 1
+BLOCK_SIZE = 64 * 1024
+FILE_HEADER = b"##############################File_name: "
+GENERATION_PATTERN = re.compile(r'^Gen_(\d+)_')
+
+
+def iter_archive_members(path):
+    """
+    Stream (name, raw bytes) pairs from an archive in any layout. Raw bytes
+    include the header line; text before the first header comes out with
+    name None.
+    """
+    name, chunks = None, []
+    with gzip.open(path, 'rb') as f:
+        for line in f:
+            if line.startswith(FILE_HEADER):
+                if chunks:
+                    yield name, b''.join(chunks)
+                name = line[len(FILE_HEADER):].strip().decode()
+                chunks = [line]
+            else:
+                chunks.append(line)
+    if chunks:
+        yield name, b''.join(chunks)
+
+
+def member_text(raw):
+    """File contents of a member (header line removed)"""
+    if raw.startswith(FILE_HEADER):
+        raw = raw[raw.index(b'\n') + 1:] if b'\n' in raw else b''
+    return raw.decode()
+
+
+def index_path(archive):
+    return Path(str(archive) + INDEX_SUFFIX)
+
+
+def build_index(archive, level=6, block_size=BLOCK_SIZE):
+    """
+    Re-block `archive` into gzip members of up to `block_size` bytes of text
+    (whole files only) and write its sidecar index. The archive is rewritten
+    in place (same permissions; per-block gzip members make it somewhat
+    larger), after checking the decompressed bytes are identical. Returns the
+    number of files indexed.
+    """
+    archive = Path(archive)
+    entries = []
+    original, reblocked = hashlib.sha256(), hashlib.sha256()
+
+    fd, tmp_path = tempfile.mkstemp(prefix=".reblock_", dir=archive.parent)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            offset, block, pending = 0, [], []
+
+            def flush():
+                nonlocal offset
+                compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+                data = compressor.compress(b''.join(block)) + compressor.flush()
+                out.write(data)
+                entries.extend([name, offset, len(data), start, size] for name, start, size in pending)
+                offset += len(data)
+                block.clear()
+                pending.clear()
+
+            block_len = 0
+            for name, raw in iter_archive_members(archive):
+                original.update(raw)
+                if block and block_len + len(raw) > block_size:
+                    flush()
+                    block_len = 0
+                pending.append((name, block_len, len(raw)))
+                block.append(raw)
+                block_len += len(raw)
+            if block:
+                flush()
+        for _, raw in iter_archive_members(tmp_path):
+            reblocked.update(raw)
+        if original.digest() != reblocked.digest():
+            raise ValueError(f"Re-blocked copy of {archive} does not match the original")
+        # mkstemp creates the copy owner-only; keep the archive's own mode
+        shutil.copymode(archive, tmp_path)
+        os.replace(tmp_path, archive)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    stat = archive.stat()
+    index = {'format': INDEX_FORMAT, 'archive_size': stat.st_size,
+             'archive_mtime_ns': stat.st_mtime_ns, 'entries': entries}
+    tmp_index = index_path(archive).with_suffix('.idx.tmp')
+    with open(tmp_index, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_index, index_path(archive))
+    return sum(1 for entry in entries if entry[0] is not None)
+
+
+class PDBArchive:
+    """
+    One compressed_PDBS.txt.gz archive. Uses the sidecar index for seeks when
+    it matches the archive, otherwise scans the gzip stream.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.members = self._load_index()
+
+    def _load_index(self):
+        """{name: (block offset, block length, start, size)} from a current sidecar index, or None"""
+        idx = index_path(self.path)
+        if not idx.exists():
+            return None
+        try:
+            with open(idx, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        stat = self.path.stat()
+        if (index.get('format') != INDEX_FORMAT or index.get('archive_size') != stat.st_size
+                or index.get('archive_mtime_ns') != stat.st_mtime_ns):
+            return None
+        return {name: tuple(entry) for name, *entry in index['entries'] if name is not None}
+
+    @property
+    def indexed(self):
+        return self.members is not None
+
+    def names(self):
+        """File names stored in the archive, in archive order"""
+        if self.indexed:
+            return list(self.members)
+        return [name for name, _ in iter_archive_members(self.path) if name is not None]
+
+    def __contains__(self, name):
+        if self.indexed:
+            return name in self.members
+        return name in self.names()
+
+    def get(self, name):
+        """Text of one stored file; KeyError if it is not in the archive"""
+        if self.indexed:
+            if name not in self.members:
+                raise KeyError(name)
+            offset, length, start, size = self.members[name]
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                block = zlib.decompress(f.read(length), 31)
+            return member_text(block[start:start + size])
+        for member_name, raw in iter_archive_members(self.path):
+            if member_name == name:
+                return member_text(raw)
+        raise KeyError(name)
+
+    def items(self):
+        """(name, text) for every stored file, streamed"""
+        for name, raw in iter_archive_members(self.path):
+            if name is not None:
+                yield name, member_text(raw)
+
+
+class GenerationArchives:
+    """The PDB archives of every generation under an AutoGrow4 output folder"""
+
+    def __init__(self, output_path="../output/"):
+        self.output_path = Path(output_path)
+        self.archives = {}
+        for archive in self.output_path.glob(f"generation_*/PDBs/{ARCHIVE_NAME}"):
+            generation = int(archive.parent.parent.name.split('_')[-1])
+            self.archives[generation] = archive
+        self._open = {}
+
+    def archive(self, generation):
+        if generation not in self._open:
+            self._open[generation] = PDBArchive(self.archives[generation])
+        return self._open[generation]
+
+    def get(self, name):
+        """
+        Find a file by name. `Gen_N_...` names go straight to generation N;
+        anything else (e.g. seed names) is looked up generation by generation.
+        """
+        match = GENERATION_PATTERN.match(name)
+        if match and int(match.group(1)) in self.archives:
+            generations = [int(match.group(1))]
+        else:
+            generations = sorted(self.archives)
+        for generation in generations:
+            try:
+                # One lookup: an unindexed archive is scanned once, not listed and then scanned
+                return self.archive(generation).get(name)
+            except KeyError:
+                continue
+        raise KeyError(name)
+
+    def build_indexes(self):
+        """Index every generation archive; returns {generation: files indexed}"""
+        counts = {}
+        for generation in sorted(self.archives):
+            counts[generation] = build_index(self.archives[generation])
+            self._open.pop(generation, None)
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and read AutoGrow4 compressed_PDBS.txt.gz archives")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("index", help="Re-block archives and write sidecar indexes")
+    p.add_argument("paths", nargs="+", help="AutoGrow4 output folders or archive files")
+    p = sub.add_parser("get", help="Extract one stored file")
+    p.add_argument("output_path", help="AutoGrow4 output folder or archive file")
+    p.add_argument("name", help="Stored file name, e.g. Gen_32_Cross_501146__1.pdb")
+    p.add_argument("-o", "--out", help="Write here instead of stdout")
+    p = sub.add_parser("list", help="List the files in an archive")
+    p.add_argument("archive")
+    args = parser.parse_args()
+
+    if args.command == "index":
+        for path in map(Path, args.paths):
+            if path.is_dir():
+                for generation, count in GenerationArchives(path).build_indexes().items():
+                    print(f"✅ generation_{generation}: {count} files indexed")
+            else:
+                print(f"✅ {path}: {build_index(path)} files indexed")
+    elif args.command == "get":
+        path = Path(args.output_path)
+        source = GenerationArchives(path) if path.is_dir() else PDBArchive(path)
+        try:
+            text = source.get(args.name)
+        except KeyError:
+            parser.exit(1, f"❌ {args.name} not found\n")
+        if args.out:
+            Path(args.out).write_text(text)
+            print(f"✅ Saved {args.name} to {args.out}")
+        else:
+            print(text, end='')
+    elif args.command == "list":
+        for name in PDBArchive(args.archive).names():
+            print(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 Pose RMSD Engine
+==========================
+
+All-pairs heavy-atom RMSD between docked poses, and pose families from it.
+Poses come from the pose store (pose_store.py, i.e. the generation PDB
+archives) or straight from `*_all_poses.pdbqt` Vina output files.
+
+Two comparisons:
+    ligands   every Vina model of a ligand against the other models of the
+              same ligand (same atom order), batched over all ligands
+    core      the shared sulbactam-like core (penam sulfone + the exocyclic
+              carbonyl, CORE_SMARTS) across ligands; core atoms are found
+              once per ligand with RDKit on bonds perceived from coordinates
+
+RMSD is either in place (poses stay in the receptor frame, like Vina's
+`rmsd l.b.`) or Kabsch-aligned (optimal superposition first, shape only).
+Both reduce to one matrix product per tile of pose pairs: in place from
+|a - b|^2 = |a|^2 + |b|^2 - 2 a.b, aligned from the 3x3 cross-covariance
+of each pair, whose optimal-rotation trace comes from the closed-form
+eigenvalues of a symmetric 3x3, so there is no per-pair SVD. Tiles run on
+a thread pool (NumPy releases the GIL in BLAS and ufuncs) and the full
+matrix can be written to a memory-mapped .npy, or only pairs under a cutoff
+kept, so tens of thousands of poses fit in memory.
+
+Families are Butina clusters of the pairs within --cutoff Å.
+
+Usage:
+    python pose_rmsd.py ligands --cutoff 2.0
+    python pose_rmsd.py core --align --csv core_families.csv
+    python pose_rmsd.py core --matrix core_rmsd.npy --workers 8
+    python pose_rmsd.py --pdbqt ../docking_results/run/ ligands
+    python pose_rmsd.py benchmark --poses 20000
+
+Author: AutoGrow4-OXA23 Project
+"""
+
+import os
+import csv
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from pose_store import PoseStore, POSE_DTYPE, DEFAULT_STORE_DIR, ELEMENT_SYMBOLS, parse_vina_models
+
+# Sulbactam-like core, element and connectivity only (bonds are perceived
+# from coordinates, so no bond orders): exocyclic carbonyl C and O, C3, N4,
+# lactam C7 and O, C6, C5, S1 and its two oxygens, C2 and its two methyls
+CORE_SMARTS = "[#6](~[#8])~[#6]1~[#7]2~[#6](~[#8])~[#6]~[#6]~2~[#16](~[#8])(~[#8])~[#6]~1(~[#6])~[#6]"
+# Interchangeable core atoms (sulfone oxygens, gem-dimethyl): each pair is
+# replaced by its midpoint so either match gives the same RMSD
+CORE_SYMMETRIC = ((9, 10), (12, 13))
+DEFAULT_CUTOFF = 2.0
+# Poses per side of a tile of the pair matrix (small enough that a tile's
+# temporaries stay in cache)
+DEFAULT_TILE = 128
+# Pose pairs per batch in the same-ligand pass
+BLOCK_PAIRS = DEFAULT_TILE * DEFAULT_TILE
+
+
+class VinaOutputs:
+    """`*_all_poses.pdbqt` files with the PoseStore attributes (coords, elements, poses, names)"""
+
+    def __init__(self, paths):
+        files = []
+        for path in map(Path, paths):
+            files.extend(sorted(path.glob("*_all_poses.pdbqt")) if path.is_dir() else [path])
+        coords, elements, table, self.names = [], [], [], []
+        start = 0
+        for path in files:
+            for model, affinity, xyz, element in parse_vina_models(path.read_text()):
+                table.append((start, len(xyz), 0, model, affinity))
+                self.names.append(path.name.replace("_all_poses.pdbqt", "").replace(".pdbqt", ""))
+                coords.append(xyz)
+                elements.append(element)
+                start += len(xyz)
+        self.coords = np.concatenate(coords) if coords else np.zeros((0, 3), dtype=np.float32)
+        self.elements = np.concatenate(elements) if elements else np.zeros(0, dtype=np.uint8)
+        self.poses = np.array(table, dtype=POSE_DTYPE)
+
+    def __len__(self):
+        return len(self.poses)
+
+
+# ----------------------------------------------------------------- kernels
+
+def prepare(coords, align=False):
+    """(float64 poses, squared norms) for the RMSD kernels; aligned poses are centred"""
+    coords = np.asarray(coords, dtype=np.float64)
+    if align:
+        coords = coords - coords.mean(axis=-2, keepdims=True)
+    return coords, (coords * coords).sum(axis=(-1, -2))
+
+
+def cross_covariance(a, b):
+    """
+    Cross-covariances a_i^T b_j of (..., p, m, 3) and (..., q, m, 3) poses as
+    one matmul, component-major: (3, 3, ..., p, q), so each entry is contiguous
+    """
+    p, m = a.shape[-3:-1]
+    q = b.shape[-3]
+    a2 = np.swapaxes(a, -1, -2).reshape(a.shape[:-3] + (p * 3, m))
+    b2 = np.swapaxes(b, -3, -2).reshape(b.shape[:-3] + (m, q * 3))
+    h = (a2 @ b2).reshape(a.shape[:-3] + (p, 3, q, 3))
+    return np.ascontiguousarray(np.moveaxis(h, (-3, -1), (0, 1)))
+
+
+def kabsch_trace(h):
+    """
+    max over rotations R of trace(R h) for component-major 3x3 matrices h:
+    s1 + s2 + sign(det h) s3 with s the singular values of h, taken as the
+    square roots of the closed-form eigenvalues of h^T h
+    """
+    (h00, h01, h02), (h10, h11, h12), (h20, h21, h22) = h
+    k00 = h00 * h00 + h10 * h10 + h20 * h20
+    k11 = h01 * h01 + h11 * h11 + h21 * h21
+    k22 = h02 * h02 + h12 * h12 + h22 * h22
+    k01 = h00 * h01 + h10 * h11 + h20 * h21
+    k02 = h00 * h02 + h10 * h12 + h20 * h22
+    k12 = h01 * h02 + h11 * h12 + h21 * h22
+    q = (k00 + k11 + k22) / 3
+    d0, d1, d2 = k00 - q, k11 - q, k22 - q
+    p = np.sqrt((d0 * d0 + d1 * d1 + d2 * d2 + 2 * (k01 * k01 + k02 * k02 + k12 * k12)) / 6)
+    det = d0 * (d1 * d2 - k12 * k12) - k01 * (k01 * d2 - k12 * k02) + k02 * (k01 * k12 - d1 * k02)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.where(p > 0, det / (2 * p ** 3), 0.0)
+    phi = np.arccos(np.clip(r, -1, 1)) / 3
+    l1 = q + 2 * p * np.cos(phi)
+    l3 = q + 2 * p * np.cos(phi + 2 * np.pi / 3)
+    l2 = 3 * q - l1 - l3
+    det_h = h00 * (h11 * h22 - h12 * h21) - h01 * (h10 * h22 - h12 * h20) + h02 * (h10 * h21 - h11 * h20)
+    s1, s2, s3 = (np.sqrt(np.maximum(l, 0)) for l in (l1, l2, l3))
+    return s1 + s2 + np.copysign(s3, det_h)
+
+
+def rmsd_block(a, b, norms_a, norms_b, align=False):
+    """(..., p, q) RMSD between prepared poses a (..., p, m, 3) and b (..., q, m, 3)"""
+    m = a.shape[-2]
+    if align:
+        dot = kabsch_trace(cross_covariance(a, b))
+    else:
+        flat_a = a.reshape(a.shape[:-2] + (3 * m,))
+        flat_b = b.reshape(b.shape[:-2] + (3 * m,))
+        dot = flat_a @ np.swapaxes(flat_b, -1, -2)
+    d2 = (norms_a[..., :, None] + norms_b[..., None, :] - 2 * dot) / m
+    return np.sqrt(np.maximum(d2, 0))
+
+
+def _tiles(n, tile):
+    return [(i, j) for i in range(0, n, tile) for j in range(i, n, tile)]
+
+
+def _run_tiles(job, n, tile, workers):
+    """job(i, j) over the upper-triangle tiles on a thread pool, results in tile order"""
+    tiles = _tiles(n, tile)
+    workers = min(workers or os.cpu_count() or 1, max(len(tiles), 1))
+    if workers == 1:
+        return [job(i, j) for i, j in tiles]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda ij: job(*ij), tiles))
+
+
+def rmsd_matrix(coords, align=False, tile=DEFAULT_TILE, workers=None, out=None):
+    """
+    (n x n) float32 RMSD matrix of n poses (n x m x 3, same atom order).
+    `out` may be a preallocated array or memmap (see np.lib.format.open_memmap)
+    for matrices that don't fit in memory.
+    """
+    x, norms = prepare(coords, align)
+    n = len(x)
+    if out is None:
+        out = np.empty((n, n), dtype=np.float32)
+
+    def job(i, j):
+        block = rmsd_block(x[i:i + tile], x[j:j + tile], norms[i:i + tile], norms[j:j + tile], align)
+        out[i:i + tile, j:j + tile] = block
+        out[j:j + tile, i:i + tile] = block.T
+
+    _run_tiles(job, n, tile, workers)
+    if n:
+        np.fill_diagonal(out, 0)
+    return out
+
+
+def rmsd_pairs(coords, cutoff=DEFAULT_CUTOFF, align=False, tile=DEFAULT_TILE, workers=None):
+    """(i, j, rmsd) of the pose pairs i < j within `cutoff` Å, without the full matrix"""
+    x, norms = prepare(coords, align)
+
+    def job(i, j):
+        block = rmsd_block(x[i:i + tile], x[j:j + tile], norms[i:i + tile], norms[j:j + tile], align)
+        rows, cols = np.nonzero(block <= cutoff)
+        keep = rows + i < cols + j
+        rows, cols = rows[keep].astype(np.int32), cols[keep].astype(np.int32)
+        return rows + i, cols + j, block[rows, cols].astype(np.float32)
+
+    parts = _run_tiles(job, len(x), tile, workers)
+    if not parts:
+        return np.zeros(0, np.int32), np.zeros(0, np.int32), np.zeros(0, np.float32)
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def reference_rmsd(a, b, align=False):
+    """Per-pair RMSD with an explicit SVD superposition (slow; for checking)"""
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    if align:
+        a, b = a - a.mean(axis=0), b - b.mean(axis=0)
+        u, _, vt = np.linalg.svd(a.T @ b)
+        d = np.sign(np.linalg.det(u @ vt))
+        rotation = u @ np.diag([1, 1, d]) @ vt
+        a = a @ rotation
+    return float(np.sqrt(((a - b) ** 2).sum(axis=1).mean()))
+
+
+# ------------------------------------------------------------------ poses
+
+def heavy_atoms(source):
+    """(heavy atom indices into source.coords, first heavy atom of each pose, heavy atoms per pose)"""
+    elements = np.asarray(source.elements)
+    n_atoms = np.asarray(source.poses['n_atoms'])
+    heavy = np.flatnonzero(elements != 1)
+    pose_of_atom = np.repeat(np.arange(len(n_atoms)), n_atoms)
+    counts = np.bincount(pose_of_atom[heavy], minlength=len(n_atoms))
+    return heavy, np.cumsum(counts) - counts, counts
+
+
+def pose_coordinates(source, poses, heavy_index, atoms=None):
+    """
+    (len(poses) x m x 3) heavy-atom coordinates of poses with the same heavy
+    atom count, optionally only the heavy atoms numbered in `atoms`
+    """
+    heavy, starts, counts = heavy_index
+    poses = np.asarray(poses)
+    atoms = np.arange(counts[poses[0]]) if atoms is None else np.asarray(atoms)
+    return np.asarray(source.coords)[heavy[starts[poses][:, None] + atoms]]
+
+
+def ligand_groups(source, poses=None):
+    """
+    {(k, m): (L x k) pose numbers} for the ligands (compound IDs) with k
+    poses of m heavy atoms each; a ligand's poses are in pose order
+    """
+    poses = np.arange(len(source)) if poses is None else np.asarray(poses)
+    _, _, counts = heavy_index = heavy_atoms(source)
+    if not len(poses):
+        return {}, heavy_index
+    _, ligand = np.unique(np.asarray(source.names, dtype=object)[poses].astype(str), return_inverse=True)
+    order = poses[np.argsort(ligand, kind='stable')]
+    sizes = np.bincount(ligand)
+    first = np.cumsum(sizes) - sizes
+    heavy_count = counts[order[first]]
+    # A ligand whose models differ in atom count (shouldn't happen) is skipped
+    consistent = np.minimum.reduceat(counts[order], first) == np.maximum.reduceat(counts[order], first)
+    groups = {}
+    for k, m in sorted(set(zip(sizes[consistent].tolist(), heavy_count[consistent].tolist()))):
+        members = np.flatnonzero(consistent & (sizes == k) & (heavy_count == m))
+        groups[(k, m)] = order[first[members][:, None] + np.arange(k)]
+    return groups, heavy_index
+
+
+def ligand_rmsd(source, align=False, poses=None):
+    """
+    Same-ligand RMSD of every ligand with more than one pose, batched over
+    ligands of equal shape. Returns [(L x k pose numbers, L x k x k float32 RMSD)].
+    """
+    groups, heavy_index = ligand_groups(source, poses)
+    blocks = []
+    for (k, m), pose_numbers in groups.items():
+        if k < 2:
+            continue
+        step = max(1, BLOCK_PAIRS // (k * k))
+        for start in range(0, len(pose_numbers), step):
+            numbers = pose_numbers[start:start + step]
+            coords = pose_coordinates(source, numbers.ravel(), heavy_index).reshape(len(numbers), k, m, 3)
+            x, norms = prepare(coords, align)
+            blocks.append((numbers, rmsd_block(x, x, norms, norms, align).astype(np.float32)))
+    return blocks
+
+
+def ligand_pairs(blocks, cutoff=DEFAULT_CUTOFF):
+    """(i, j, rmsd) pose pairs within `cutoff` Å from ligand_rmsd() blocks"""
+    parts = []
+    for numbers, rmsd in blocks:
+        upper = np.triu_indices(numbers.shape[1], 1)
+        values = rmsd[:, upper[0], upper[1]]
+        keep = values <= cutoff
+        parts.append((numbers[:, upper[0]][keep].astype(np.int32), numbers[:, upper[1]][keep].astype(np.int32),
+                      values[keep]))
+    if not parts:
+        return np.zeros(0, np.int32), np.zeros(0, np.int32), np.zeros(0, np.float32)
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def core_match(coords, elements, pattern):
+    """Heavy-atom numbers matching `pattern` in one pose, from perceived connectivity, or None"""
+    from rdkit import Chem
+    from rdkit.Chem import rdDetermineBonds
+
+    xyz = [f"{len(coords)}", ""] + [f"{ELEMENT_SYMBOLS.get(int(e), 'C')} {x:.4f} {y:.4f} {z:.4f}"
+                                    for e, (x, y, z) in zip(elements, coords)]
+    mol = Chem.MolFromXYZBlock("\n".join(xyz) + "\n")
+    if mol is None:
+        return None
+    rdDetermineBonds.DetermineConnectivity(mol)
+    match = mol.GetSubstructMatch(pattern)
+    return match or None
+
+
+def core_coordinates(source, poses=None, smarts=CORE_SMARTS, symmetric=CORE_SYMMETRIC):
+    """
+    (pose numbers with the core, n x c x 3 core coordinates). The core is
+    matched once per ligand, on its first pose; symmetric atom pairs become
+    their midpoint.
+    """
+    from rdkit import Chem
+
+    pattern = Chem.MolFromSmarts(smarts)
+    groups, heavy_index = ligand_groups(source, poses)
+    heavy, starts, counts = heavy_index
+    elements = np.asarray(source.elements)
+    found, cores = [], []
+    for pose_numbers in groups.values():
+        for ligand_poses in pose_numbers:
+            first = ligand_poses[0]
+            atoms = heavy[starts[first]:starts[first] + counts[first]]
+            match = core_match(np.asarray(source.coords)[atoms], elements[atoms], pattern)
+            if match is None:
+                continue
+            core = pose_coordinates(source, ligand_poses, heavy_index, match).astype(np.float64)
+            for a, b in symmetric:
+                core[:, a] = (core[:, a] + core[:, b]) / 2
+            cores.append(np.delete(core, [b for _, b in symmetric], axis=1))
+            found.append(ligand_poses)
+    if not found:
+        return np.zeros(0, np.int64), np.zeros((0, pattern.GetNumAtoms() - len(symmetric), 3))
+    found = np.concatenate(found)
+    order = np.argsort(found, kind='stable')
+    return found[order], np.concatenate(cores)[order]
+
+
+# ------------------------------------------------------------- clustering
+
+def butina(n, i, j):
+    """
+    Butina clustering of n items from their neighbour pairs (i, j): the item
+    with the most neighbours becomes a centroid and claims its unassigned
+    neighbours, then the next. Returns (labels, centroid of each family).
+    """
+    from scipy.sparse import coo_matrix
+
+    i, j = np.asarray(i), np.asarray(j)
+    graph = coo_matrix((np.ones(2 * len(i), dtype=bool), (np.r_[i, j], np.r_[j, i])), shape=(n, n)).tocsr()
+    labels = np.full(n, -1, dtype=np.int64)
+    centroids = []
+    for centre in np.argsort(-np.diff(graph.indptr), kind='stable'):
+        if labels[centre] >= 0:
+            continue
+        members = graph.indices[graph.indptr[centre]:graph.indptr[centre + 1]]
+        labels[members[labels[members] < 0]] = len(centroids)
+        labels[centre] = len(centroids)
+        centroids.append(centre)
+    return labels, np.array(centroids, dtype=np.int64)
+
+
+def ligand_families(source, cutoff=DEFAULT_CUTOFF, align=False, poses=None):
+    """(pose numbers, their family labels, centroid pose numbers) from same-ligand RMSD; families never span ligands"""
+    numbers = np.arange(len(source)) if poses is None else np.sort(np.asarray(poses))
+    i, j, _ = ligand_pairs(ligand_rmsd(source, align, numbers), cutoff)
+    labels, centroids = butina(len(numbers), np.searchsorted(numbers, i), np.searchsorted(numbers, j))
+    return numbers, labels, numbers[centroids]
+
+
+def core_families(source, cutoff=DEFAULT_CUTOFF, align=False, poses=None, tile=DEFAULT_TILE, workers=None):
+    """(pose numbers with the core, their family labels, centroid pose numbers) from core RMSD"""
+    numbers, cores = core_coordinates(source, poses)
+    i, j, _ = rmsd_pairs(cores, cutoff, align, tile, workers)
+    labels, centroids = butina(len(numbers), i, j)
+    return numbers, labels, numbers[centroids]
+
+
+# -------------------------------------------------------------- benchmark
+
+def synthetic_poses(n, atoms=14, families=20, noise=0.3, seed=0):
+    """n poses of an m-atom ligand around `families` conformer + placement combinations in a pocket"""
+    rng = np.random.default_rng(seed)
+    conformers = rng.normal(0, 2.0, (atoms, 3)) + rng.normal(0, 1.0, (families, atoms, 3))
+    centres = rng.normal(0, 3.0, (families, 3))
+    rotations = np.linalg.qr(rng.normal(size=(families, 3, 3)))[0]
+    family = rng.integers(0, families, n)
+    poses = conformers[family] @ rotations[family] + centres[family][:, None, :]
+    return (poses + rng.normal(0, noise, poses.shape)).astype(np.float32)
+
+
+def benchmark(n, atoms, cutoff, tile, workers, reference_poses=200):
+    coords = synthetic_poses(n, atoms)
+    sample = coords[:reference_poses]
+    for align in (False, True):
+        start = time.perf_counter()
+        for a in range(len(sample)):
+            for b in range(a + 1, len(sample)):
+                reference_rmsd(sample[a], sample[b], align)
+        loop_pair = (time.perf_counter() - start) / (len(sample) * (len(sample) - 1) / 2)
+        expected = np.array([[reference_rmsd(a, b, align) for b in sample[:50]] for a in sample[:50]])
+        error = np.abs(rmsd_matrix(sample[:50], align, tile, workers) - expected).max()
+
+        start = time.perf_counter()
+        i, _, _ = rmsd_pairs(coords, cutoff, align, tile, workers)
+        elapsed = time.perf_counter() - start
+        pairs = n * (n - 1) / 2
+        print(f"⏱️  {'Kabsch' if align else 'in-place'}: {n} poses ({pairs:.3g} pairs) in {elapsed:.2f} s, "
+              f"{len(i)} within {cutoff} Å; per-pair loop ~{loop_pair * pairs:.0f} s "
+              f"({loop_pair * pairs / elapsed:.0f}x); max error {error:.1e} Å")
+
+
+def write_families(path, source, numbers, labels, centroids):
+    """CSV of the family (and its centroid) of every clustered pose"""
+    poses = source.poses
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['ID', 'Generation', 'Model', 'Affinity', 'Family', 'Centroid_ID', 'Centroid_Model'])
+        for number, label in zip(numbers, labels):
+            centre = centroids[label]
+            writer.writerow([source.names[number], poses['generation'][number], poses['model'][number],
+                             f"{poses['affinity'][number]:.1f}", label,
+                             source.names[centre], poses['model'][centre]])
+    print(f"💾 {path}")
+
+
+def print_families(source, numbers, labels, centroids, top):
+    affinity = np.asarray(source.poses['affinity'])[numbers]
+    sizes = np.bincount(labels, minlength=len(centroids))
+    best = np.full(len(centroids), np.inf)
+    np.minimum.at(best, labels, affinity)
+    for family in np.argsort(best, kind='stable')[:top]:
+        centre = centroids[family]
+        print(f"   family {family:>5}: {sizes[family]:>5} poses  best {best[family]:.1f}  "
+              f"centroid {source.names[centre]} model {source.poses['model'][centre]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="All-pairs pose RMSD and pose families")
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIR, help=f"Pose store (default: {DEFAULT_STORE_DIR})")
+    parser.add_argument("--pdbqt", action="append",
+                        help="Read this *_all_poses.pdbqt file or folder of them instead (repeatable)")
+    parser.add_argument("--workers", type=int, default=None, help="Threads for the RMSD tiles (default: all cores)")
+    parser.add_argument("--tile", type=int, default=DEFAULT_TILE, help="Poses per side of an RMSD tile")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, text in (("ligands", "Families among the Vina models of each ligand"),
+                       ("core", "Families of the shared core across ligands")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("--align", action="store_true", help="Kabsch-superpose before RMSD (shape only)")
+        p.add_argument("--cutoff", type=float, default=DEFAULT_CUTOFF, help="Family RMSD cutoff (Å)")
+        p.add_argument("--top", type=int, default=10, help="How many best-scoring families to list")
+        p.add_argument("--csv", help="Write the family of every pose here")
+    p.add_argument("--all-models", action="store_true", help="Every Vina model, not just model 1")
+    p.add_argument("--matrix", help="Also write the full core RMSD matrix to this .npy (memory-mapped)")
+    p = sub.add_parser("benchmark", help="Time the tiled engine against a per-pair loop on synthetic poses")
+    p.add_argument("--poses", type=int, default=20000)
+    p.add_argument("--atoms", type=int, default=14)
+    p.add_argument("--cutoff", type=float, default=DEFAULT_CUTOFF)
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark(args.poses, args.atoms, args.cutoff, args.tile, args.workers)
+        return
+
+    source = VinaOutputs(args.pdbqt) if args.pdbqt else PoseStore(args.store_dir)
+    if not len(source):
+        print("❌ No poses found")
+        return
+    start = time.perf_counter()
+    if args.command == "ligands":
+        numbers, labels, centroids = ligand_families(source, args.cutoff, args.align)
+        elapsed = time.perf_counter() - start
+        ligands = len(set(source.names))
+        print(f"📊 {len(numbers)} poses of {ligands} ligands: {len(centroids)} families within {args.cutoff} Å "
+              f"({len(centroids) / ligands:.1f} per ligand)")
+    else:
+        poses = None if args.all_models else np.flatnonzero(np.asarray(source.poses['model']) == 1)
+        numbers, labels, centroids = core_families(source, args.cutoff, args.align, poses, args.tile, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"📊 {len(numbers)} poses with the core: {len(centroids)} families within {args.cutoff} Å")
+        if args.matrix:
+            _, cores = core_coordinates(source, poses)
+            out = np.lib.format.open_memmap(args.matrix, mode='w+', dtype=np.float32, shape=(len(cores), len(cores)))
+            rmsd_matrix(cores, args.align, args.tile, args.workers, out).flush()
+            print(f"💾 {args.matrix}")
+    print_families(source, numbers, labels, centroids, args.top)
+    if args.csv:
+        write_families(args.csv, source, numbers, labels, centroids)
+    print(f"⏱️  {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
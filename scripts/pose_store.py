@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 Pose Store
+====================
+
+Binary store of every docked pose in a campaign, converted once from the
+`<id>__1.pdbqt.vina` files in the per-generation PDB archives:
+
+    coords.f32    (atoms x 3) float32 coordinates of all poses, back to back
+    elements.u8   (atoms,) atomic number of every atom (0 = unknown)
+    poses.bin     one record per pose: atom start, atom count, generation,
+                  Vina model number, affinity
+    names.txt     compound ID of every pose, one per line
+    manifest.json atom and pose counts, converted generations
+
+The binary files are memory-mapped on first use and names.txt is read only
+when a pose is looked up by ID, so opening the store reads just the manifest. A pose is a zero-copy slice of the coordinate array, and
+whole-campaign geometry (centroids, distances to KCX82 / SER79) is done in
+vectorized passes over every atom at once.
+
+Generations are appended incrementally; a changed archive triggers a rebuild.
+The manifest is saved after each generation and is the source of truth: data
+appended after it (a build that was interrupted) is truncated away on open.
+
+Usage:
+    python pose_store.py build
+    python pose_store.py info
+    python pose_store.py distances --top 20
+    python pose_store.py distances --residues KCX82 SER79 --all-models
+
+Author: AutoGrow4-OXA23 Project
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from pdb_archive import GenerationArchives, PDBArchive
+
+# The AutoDock type table and Vina result pattern are shared with the docking driver
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "docking_results"))
+from pose_set import AD_TYPE_ELEMENTS, VINA_RESULT_PATTERN
+
+DEFAULT_STORE_DIR = "../output/analysis/pose_store/"
+DEFAULT_RECEPTOR = "../docking_results/target.pdbqt"
+VINA_SUFFIX = ".pdbqt.vina"
+POSE_DTYPE = np.dtype([('start', '<i8'), ('n_atoms', '<i4'), ('generation', '<i4'),
+                       ('model', '<i4'), ('affinity', '<f4')])
+STORE_FORMAT = 1
+# Atoms per block in the all-pose distance pass
+BLOCK_ATOMS = 1 << 18
+
+ELEMENT_NUMBERS = {'H': 1, 'C': 6, 'N': 7, 'O': 8, 'F': 9, 'P': 15, 'S': 16, 'Cl': 17, 'Br': 35, 'I': 53}
+ELEMENT_SYMBOLS = {number: symbol for symbol, number in ELEMENT_NUMBERS.items()}
+RESIDUE_PATTERN = re.compile(r'^([A-Za-z]{3})(\d+)$')
+
+
+def parse_vina_models(text):
+    """[(model, affinity, (n x 3) float32 coords, (n,) uint8 elements)] of a Vina output file"""
+    models = []
+    model, affinity, coords, elements = 1, float('nan'), [], []
+    for line in text.splitlines():
+        if line.startswith('MODEL'):
+            model, affinity, coords, elements = int(line.split()[1]), float('nan'), [], []
+        elif line.startswith('REMARK VINA RESULT'):
+            affinity = float(VINA_RESULT_PATTERN.match(line).group(1))
+        elif line.startswith(('ATOM', 'HETATM')):
+            coords.append((float(line[30:38]), float(line[38:46]), float(line[46:54])))
+            ad_type = line[77:79].strip() or line[12:16].strip()[:1]
+            elements.append(ELEMENT_NUMBERS.get(AD_TYPE_ELEMENTS.get(ad_type, ad_type), 0))
+        elif line.startswith('ENDMDL'):
+            models.append((model, affinity, np.array(coords, dtype=np.float32).reshape(-1, 3),
+                           np.array(elements, dtype=np.uint8)))
+            coords, elements = [], []
+    if coords:  # single-model file without MODEL/ENDMDL
+        models.append((model, affinity, np.array(coords, dtype=np.float32).reshape(-1, 3),
+                       np.array(elements, dtype=np.uint8)))
+    return models
+
+
+def residue_atoms(receptor, residue, atom_names=None):
+    """
+    (n x 3) coordinates of one receptor residue given as e.g. 'KCX82', heavy
+    atoms only, optionally restricted to some atom names (e.g. ['OG'])
+    """
+    match = RESIDUE_PATTERN.match(residue)
+    if not match:
+        raise ValueError(f"Residue should look like KCX82, got {residue!r}")
+    name, number = match.group(1).upper(), int(match.group(2))
+    coords = []
+    with open(receptor, 'r') as f:
+        for line in f:
+            if (line.startswith(('ATOM', 'HETATM')) and line[17:20] == name and int(line[22:26]) == number
+                    and not line[77:79].strip().startswith('H')
+                    and (atom_names is None or line[12:16].strip() in atom_names)):
+                coords.append((float(line[30:38]), float(line[38:46]), float(line[46:54])))
+    if not coords:
+        raise KeyError(f"{residue} not found in {receptor}")
+    return np.array(coords, dtype=np.float32)
+
+
+class PoseStore:
+    """Memory-mapped coordinates, elements and pose table of every docked pose"""
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = Path(store_dir)
+        self.coords_path = self.store_dir / "coords.f32"
+        self.elements_path = self.store_dir / "elements.u8"
+        self.poses_path = self.store_dir / "poses.bin"
+        self.names_path = self.store_dir / "names.txt"
+        self.manifest_path = self.store_dir / "manifest.json"
+        self.manifest = {'format': STORE_FORMAT, 'atoms': 0, 'poses': 0, 'converted': {}}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r') as f:
+                self.manifest = json.load(f)
+        self._truncate_to_manifest()
+        self._reset_views()
+
+    def _truncate_to_manifest(self):
+        """
+        Drop data appended after the last saved manifest, so the files match
+        its atom and pose counts and names.txt lines up with poses.bin.
+        """
+        sizes = {self.coords_path: self.manifest['atoms'] * 3 * 4,
+                 self.elements_path: self.manifest['atoms'],
+                 self.poses_path: len(self) * POSE_DTYPE.itemsize}
+        if self.names_path.exists():
+            names_bytes = self.manifest.get('names_bytes')
+            if names_bytes is None:
+                # Manifests from before names_bytes: find the end of line `poses`
+                names_bytes = 0
+                with open(self.names_path, 'rb') as f:
+                    for _, line in zip(range(len(self)), f):
+                        names_bytes += len(line)
+            sizes[self.names_path] = names_bytes
+        for path, size in sizes.items():
+            if path.exists() and path.stat().st_size > size:
+                os.truncate(path, size)
+
+    def _reset_views(self):
+        self._coords = self._elements = self._poses = self._names = self._lookup = None
+
+    def __len__(self):
+        return self.manifest['poses']
+
+    def _memmap(self, path, dtype, shape):
+        if not shape[0]:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+    @property
+    def coords(self):
+        """(atoms x 3) float32 coordinates of every pose"""
+        if self._coords is None:
+            self._coords = self._memmap(self.coords_path, '<f4', (self.manifest['atoms'], 3))
+        return self._coords
+
+    @property
+    def elements(self):
+        """(atoms,) atomic numbers"""
+        if self._elements is None:
+            self._elements = self._memmap(self.elements_path, np.uint8, (self.manifest['atoms'],))
+        return self._elements
+
+    @property
+    def poses(self):
+        """Structured pose table (start, n_atoms, generation, model, affinity)"""
+        if self._poses is None:
+            self._poses = self._memmap(self.poses_path, POSE_DTYPE, (len(self),))
+        return self._poses
+
+    def open_arrays(self):
+        """Map the coordinate, element and pose arrays now instead of on first use"""
+        return self.coords, self.elements, self.poses
+
+    @property
+    def names(self):
+        """Compound ID of every pose (read on first use)"""
+        if self._names is None:
+            self._names = self.names_path.read_text().splitlines() if len(self) else []
+        return self._names
+
+    # ----------------------------------------------------------------- access
+
+    def index_of(self, compound_id, model=1):
+        """Pose number of a compound's Vina model; KeyError if not stored"""
+        if self._lookup is None:
+            models = self.poses['model']
+            self._lookup = {(name, int(m)): i for i, (name, m) in enumerate(zip(self.names, models))}
+        return self._lookup[(compound_id, model)]
+
+    def atom_slice(self, index):
+        start, n_atoms = int(self.poses['start'][index]), int(self.poses['n_atoms'][index])
+        return slice(start, start + n_atoms)
+
+    def pose(self, compound_id, model=1):
+        """(coords, elements) views of one pose"""
+        atoms = self.atom_slice(self.index_of(compound_id, model))
+        return self.coords[atoms], self.elements[atoms]
+
+    def pose_of_atom(self):
+        """(atoms,) pose number of every atom"""
+        return np.repeat(np.arange(len(self)), self.poses['n_atoms'])
+
+    def centroids(self, heavy_only=True):
+        """(poses x 3) centroid of every pose"""
+        weights = (np.asarray(self.elements) != 1).astype(np.float64) if heavy_only else np.ones(len(self.elements))
+        starts = np.asarray(self.poses['start'])
+        sums = np.add.reduceat(np.asarray(self.coords, dtype=np.float64) * weights[:, None], starts, axis=0)
+        counts = np.add.reduceat(weights, starts)
+        return sums / np.maximum(counts, 1)[:, None]
+
+    def min_distances(self, points, heavy_only=True):
+        """(poses,) closest distance between any atom of each pose and any of `points`"""
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+        closest = np.empty(self.manifest['atoms'], dtype=np.float32)
+        for start in range(0, len(closest), BLOCK_ATOMS):
+            block = np.asarray(self.coords[start:start + BLOCK_ATOMS])
+            d2 = ((block[:, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+            closest[start:start + BLOCK_ATOMS] = d2.min(axis=1)
+        if heavy_only:
+            closest[np.asarray(self.elements) == 1] = np.inf
+        return np.sqrt(np.minimum.reduceat(closest, np.asarray(self.poses['start']))) if len(self) else closest
+
+    # ------------------------------------------------------------------ build
+
+    def append(self, generation, poses):
+        """Append (compound_id, model, affinity, coords, elements) poses of one generation"""
+        poses = [p for p in poses if len(p[3])]
+        if not poses:
+            return 0
+        table = np.zeros(len(poses), dtype=POSE_DTYPE)
+        start = self.manifest['atoms']
+        for i, (_, model, affinity, coords, _) in enumerate(poses):
+            table[i] = (start, len(coords), generation, model, affinity)
+            start += len(coords)
+        with open(self.coords_path, 'ab') as f:
+            f.write(np.concatenate([p[3] for p in poses]).astype('<f4').tobytes())
+        with open(self.elements_path, 'ab') as f:
+            f.write(np.concatenate([p[4] for p in poses]).tobytes())
+        with open(self.poses_path, 'ab') as f:
+            f.write(table.tobytes())
+        with open(self.names_path, 'a') as f:
+            f.writelines(p[0] + '\n' for p in poses)
+        self.manifest['atoms'] = start
+        self.manifest['poses'] += len(poses)
+        self.manifest['names_bytes'] = self.names_path.stat().st_size
+        self._reset_views()
+        return len(poses)
+
+    def clear(self):
+        for path in (self.coords_path, self.elements_path, self.poses_path, self.names_path, self.manifest_path):
+            if path.exists():
+                path.unlink()
+        self.manifest = {'format': STORE_FORMAT, 'atoms': 0, 'poses': 0, 'converted': {}}
+        self._reset_views()
+
+    def update(self, output_path="../output/", all_models=True):
+        """
+        Convert generations whose archive is new; if a converted archive
+        changed, rebuild from scratch. Returns {generation: poses added}.
+        """
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        archives = GenerationArchives(output_path).archives
+        signatures = {str(g): [p.stat().st_size, p.stat().st_mtime_ns] for g, p in archives.items()}
+        converted = self.manifest['converted']
+        if (self.manifest.get('format') != STORE_FORMAT
+                or any(signatures.get(g) != sig for g, sig in converted.items())):
+            self.clear()
+            converted = self.manifest['converted']
+
+        added = {}
+        for generation in sorted(archives):
+            if str(generation) in converted:
+                continue
+            poses = []
+            for name, text in PDBArchive(archives[generation]).items():
+                if not name.endswith(VINA_SUFFIX):
+                    continue
+                compound_id = name[:-len(VINA_SUFFIX)].rsplit('__', 1)[0]
+                for model, affinity, coords, elements in parse_vina_models(text):
+                    if all_models or model == 1:
+                        poses.append((compound_id, model, affinity, coords, elements))
+            added[generation] = self.append(generation, poses)
+            converted[str(generation)] = signatures[str(generation)]
+            # Per generation, so an interrupted build keeps what it finished
+            self.save_manifest()
+        return added
+
+    def save_manifest(self):
+        tmp = self.manifest_path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        tmp.replace(self.manifest_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped store of all docked AutoGrow4 poses")
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIR, help=f"Store location (default: {DEFAULT_STORE_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("build", help="Convert new generation archives into the store")
+    p.add_argument("output_path", nargs="?", default="../output/")
+    p.add_argument("--top-model-only", action="store_true", help="Keep only Vina model 1 of each ligand")
+    p.add_argument("--rebuild", action="store_true", help="Start from an empty store")
+    sub.add_parser("info", help="Store size and open time")
+    p = sub.add_parser("distances", help="Closest pose-to-residue distances over the campaign")
+    p.add_argument("--receptor", default=DEFAULT_RECEPTOR)
+    p.add_argument("--residues", nargs="+", default=["KCX82", "SER79"])
+    p.add_argument("--all-models", action="store_true", help="Include Vina models other than 1")
+    p.add_argument("--top", type=int, default=20, help="How many best-scoring poses to list")
+    p.add_argument("--csv", help="Write the distances of every pose here")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = PoseStore(args.store_dir)
+    if args.command == "build":
+        if args.rebuild:
+            store.clear()
+        added = store.update(args.output_path, all_models=not args.top_model_only)
+        for generation, count in added.items():
+            print(f"✅ generation_{generation}: {count} poses")
+        print(f"📊 {len(store)} poses, {store.manifest['atoms']} atoms in {args.store_dir}")
+    elif args.command == "info":
+        store.open_arrays()
+        opened = time.perf_counter() - start
+        size = sum(p.stat().st_size for p in Path(args.store_dir).iterdir() if p.is_file())
+        print(f"📊 {len(store)} poses, {store.manifest['atoms']} atoms, "
+              f"{len(store.manifest['converted'])} generations, {size / 1e6:.1f} MB")
+        print(f"⏱️  Opened in {1000 * opened:.2f} ms")
+    elif args.command == "distances":
+        distances = {res: store.min_distances(residue_atoms(args.receptor, res)) for res in args.residues}
+        elapsed = time.perf_counter() - start
+        poses = store.poses
+        keep = np.ones(len(store), dtype=bool) if args.all_models else np.asarray(poses['model']) == 1
+        order = np.flatnonzero(keep)[np.argsort(np.asarray(poses['affinity'])[keep], kind='stable')]
+        for i in order[:args.top]:
+            cells = "  ".join(f"{res} {distances[res][i]:.2f} Å" for res in args.residues)
+            print(f"   {store.names[i]}  model {poses['model'][i]}  {poses['affinity'][i]:.1f}  {cells}")
+        if args.csv:
+            with open(args.csv, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['ID', 'Generation', 'Model', 'Affinity'] + [f"{r}_Distance_A" for r in args.residues])
+                for i in order:
+                    writer.writerow([store.names[i], poses['generation'][i], poses['model'][i],
+                                     f"{poses['affinity'][i]:.1f}"] + [f"{distances[r][i]:.3f}" for r in args.residues])
+            print(f"💾 {args.csv}")
+        print(f"⏱️  {len(order)} poses in {1000 * elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
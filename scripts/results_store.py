@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+AutoGrow4 Results Store
+=======================
+
+One indexed SQLite database of every `generation_N_ranked.smi` row, so
+analyses query it instead of re-globbing and re-parsing the text files.
+
+Ingestion is incremental: a generation is only (re)read when its ranked file
+is new or has changed since the last run.
+
+Usage:
+    python results_store.py ingest ../output
+    python results_store.py top -n 10
+    python results_store.py top -n 5 --generation 32 --operator Cross
+    python results_store.py per-generation -n 3
+    python results_store.py operators
+
+Author: AutoGrow4-OXA23 Project
+"""
+
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+
+from generation_io import find_ranked_files, read_ranked_file, canonical_smiles
+
+DEFAULT_DB = "../output/analysis/autogrow_results.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS compounds (
+    generation       INTEGER NOT NULL,
+    rank             INTEGER NOT NULL,
+    id               TEXT    NOT NULL,
+    smiles           TEXT    NOT NULL,
+    canonical_smiles TEXT    NOT NULL,
+    lineage          TEXT    NOT NULL,
+    parent1          TEXT,
+    parent2          TEXT,
+    operator         TEXT    NOT NULL,
+    reaction         INTEGER,
+    carried_over     INTEGER NOT NULL,
+    diversity        REAL    NOT NULL,
+    affinity         REAL    NOT NULL,
+    PRIMARY KEY (generation, rank)
+);
+CREATE INDEX IF NOT EXISTS idx_compounds_affinity ON compounds (affinity);
+CREATE INDEX IF NOT EXISTS idx_compounds_generation_affinity ON compounds (generation, affinity);
+CREATE INDEX IF NOT EXISTS idx_compounds_operator_affinity ON compounds (operator, affinity);
+CREATE INDEX IF NOT EXISTS idx_compounds_id ON compounds (id, generation);
+CREATE INDEX IF NOT EXISTS idx_compounds_canonical ON compounds (canonical_smiles);
+CREATE INDEX IF NOT EXISTS idx_compounds_parent1 ON compounds (parent1);
+CREATE INDEX IF NOT EXISTS idx_compounds_parent2 ON compounds (parent2);
+
+CREATE TABLE IF NOT EXISTS ingested (
+    generation  INTEGER PRIMARY KEY,
+    path        TEXT    NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    rows        INTEGER NOT NULL,
+    ingested_at REAL    NOT NULL
+);
+"""
+
+COLUMNS = ("generation", "rank", "id", "smiles", "canonical_smiles", "lineage", "parent1", "parent2",
+           "operator", "reaction", "carried_over", "diversity", "affinity")
+
+
+class ResultsStore:
+    """SQLite store of all ranked generation rows with a small query API"""
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------ ingest
+
+    def needs_ingest(self, generation, path):
+        """True if `path` was never ingested or changed since"""
+        stat = Path(path).stat()
+        row = self.conn.execute("SELECT size, mtime_ns FROM ingested WHERE generation = ?",
+                                (generation,)).fetchone()
+        return row is None or (row['size'], row['mtime_ns']) != (stat.st_size, stat.st_mtime_ns)
+
+    def ingest_generation(self, generation, path):
+        """Replace one generation's rows with the contents of its ranked file"""
+        rows = read_ranked_file(path, generation)
+        for row in rows:
+            row['canonical_smiles'] = canonical_smiles(row['smiles'])
+            row['carried_over'] = int(row['carried_over'])
+        stat = Path(path).stat()
+        with self.conn:
+            self.conn.execute("DELETE FROM compounds WHERE generation = ?", (generation,))
+            self.conn.executemany(
+                f"INSERT INTO compounds ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join(':' + c for c in COLUMNS)})", rows)
+            self.conn.execute("INSERT OR REPLACE INTO ingested VALUES (?, ?, ?, ?, ?, ?)",
+                              (generation, str(path), stat.st_size, stat.st_mtime_ns, len(rows), time.time()))
+        return len(rows)
+
+    def ingest(self, output_path="../output/"):
+        """Ingest new or changed generations; returns {generation: rows ingested}"""
+        ingested = {}
+        for generation, path in find_ranked_files(output_path).items():
+            if self.needs_ingest(generation, path):
+                ingested[generation] = self.ingest_generation(generation, path)
+        return ingested
+
+    def generations(self):
+        return [row[0] for row in self.conn.execute("SELECT generation FROM ingested ORDER BY generation")]
+
+    # ------------------------------------------------------------------- query
+
+    def query(self, sql, params=()):
+        """Run any SELECT against the store; returns a list of dicts"""
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def top(self, n=10, generation=None, operator=None, unique=True):
+        """
+        Best-scoring compounds, optionally within one generation and/or one
+        operator (Mutant, Cross, Seed). With `unique`, a compound seen in
+        several generations (or under several IDs) is listed once, at its best.
+        """
+        where, params = [], []
+        if generation is not None:
+            where.append("generation = ?")
+            params.append(generation)
+        if operator is not None:
+            where.append("operator = ?")
+            params.append(operator)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        if unique:
+            # SQLite returns the other columns from the row holding MIN()
+            sql = (f"SELECT *, MIN(affinity) AS affinity FROM compounds {clause} "
+                   f"GROUP BY canonical_smiles ORDER BY affinity, generation, rank LIMIT ?")
+        else:
+            sql = f"SELECT * FROM compounds {clause} ORDER BY affinity, generation, rank LIMIT ?"
+        return self.query(sql, params + [n])
+
+    def top_per_generation(self, n=3):
+        """The n best rows of every generation"""
+        return self.query(
+            "SELECT * FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY generation ORDER BY affinity, rank) AS pos "
+            "FROM compounds) WHERE pos <= ? ORDER BY generation, pos", (n,))
+
+    def by_operator(self):
+        """Count and affinity statistics of newly made compounds per operator"""
+        return self.query(
+            "SELECT operator, COUNT(*) AS compounds, MIN(affinity) AS best, AVG(affinity) AS mean "
+            "FROM compounds WHERE carried_over = 0 GROUP BY operator ORDER BY best")
+
+    def lookup_canonical(self, keys, before_generation=None):
+        """
+        {canonical SMILES: best-scoring row} for the keys already in the store,
+        optionally only from generations before `before_generation`
+        """
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        limit = "AND generation < ?" if before_generation is not None else ""
+        extra = [before_generation] if before_generation is not None else []
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.query(
+                f"SELECT *, MIN(affinity) AS affinity FROM compounds "
+                f"WHERE canonical_smiles IN ({', '.join('?' * len(chunk))}) {limit} "
+                f"GROUP BY canonical_smiles", chunk + extra)
+            found.update((row['canonical_smiles'], row) for row in rows)
+        return found
+
+    def compound(self, compound_id):
+        """Every generation a compound ID appears in"""
+        return self.query("SELECT * FROM compounds WHERE id = ? ORDER BY generation", (compound_id,))
+
+    def children(self, compound_id):
+        """Compounds made directly from `compound_id`"""
+        return self.query(
+            "SELECT * FROM compounds WHERE (parent1 = ? OR parent2 = ?) AND carried_over = 0 "
+            "ORDER BY affinity", (compound_id, compound_id))
+
+
+def print_rows(rows, columns=("generation", "id", "operator", "affinity", "diversity", "smiles")):
+    for row in rows:
+        print("   " + "  ".join(str(row[c]) for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the AutoGrow4 results store")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"SQLite database (default: {DEFAULT_DB})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("ingest", help="Add new or changed generations")
+    p.add_argument("output_path", nargs="?", default="../output/")
+    p = sub.add_parser("top", help="Best compounds overall")
+    p.add_argument("-n", type=int, default=10)
+    p.add_argument("--generation", type=int)
+    p.add_argument("--operator", choices=["Mutant", "Cross", "Seed"])
+    p.add_argument("--all-rows", action="store_true", help="Don't collapse repeats of the same compound")
+    p = sub.add_parser("per-generation", help="Best compounds of every generation")
+    p.add_argument("-n", type=int, default=3)
+    sub.add_parser("operators", help="Statistics per operator")
+    args = parser.parse_args()
+
+    with ResultsStore(args.db) as store:
+        start = time.perf_counter()
+        if args.command == "ingest":
+            ingested = store.ingest(args.output_path)
+            for generation, count in ingested.items():
+                print(f"✅ generation_{generation}: {count} rows")
+            print(f"📊 {len(ingested)} generation(s) ingested, {len(store.generations())} in {args.db}")
+        elif args.command == "top":
+            print_rows(store.top(args.n, args.generation, args.operator, unique=not args.all_rows))
+        elif args.command == "per-generation":
+            print_rows(store.top_per_generation(args.n))
+        elif args.command == "operators":
+            print_rows(store.by_operator(), ("operator", "compounds", "best", "mean"))
+        print(f"⏱️  {1000 * (time.perf_counter() - start):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
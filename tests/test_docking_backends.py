@@ -0,0 +1,91 @@
+"""Docking backends against the fake `vina` of benchmark_docking.py"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "docking_results"))
+
+import benchmark_docking
+from docking_backends import (BatchBackend, SubprocessBackend, TIMED_OUT, dock_with_fallback,
+                              select_backend)
+from pose_set import PoseSet
+from vina_docking_params import extract_pose_scores
+
+PARAMS = {'vina': "vina", 'center': [17.254, 2.25, 20.083], 'size': [20, 20, 20],
+          'exhaustiveness': 8, 'num_modes': 4, 'energy_range': 3}
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("FAKE_VINA_DELAY", "0")
+    benchmark_docking.write_ligands(str(tmp_path), 3, 12)
+    benchmark_docking.write_receptor(str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def fake_vina(workdir):
+    return benchmark_docking.install_fake_vina(str(workdir))
+
+
+def docking_jobs(workdir, n=3):
+    return [(f"adme_molecule{i}.pdbqt", str(workdir / f"adme_molecule{i}_all_poses.pdbqt"),
+             str(workdir / f"adme_molecule{i}_docking.log")) for i in range(1, n + 1)]
+
+
+def assert_docked(jobs):
+    """Pose files and log scores match what the fake Vina computed for each ligand"""
+    for ligand, all_poses_pdbqt, log_file in jobs:
+        expected = [row[0] for row in benchmark_docking.fake_scores(ligand, PARAMS['num_modes'])]
+        poses = PoseSet.from_vina_output(all_poses_pdbqt)
+        assert len(poses) == PARAMS['num_modes']
+        assert poses.affinity.tolist() == pytest.approx(expected)
+        scores = extract_pose_scores(log_file)
+        assert [float(scores[mode]) for mode in sorted(scores)] == pytest.approx(expected)
+
+
+def test_subprocess_backend_writes_poses_and_log(workdir, fake_vina):
+    jobs = docking_jobs(workdir)
+    errors = SubprocessBackend(fake_vina).dock_many("target.pdbqt", jobs, PARAMS)
+    assert errors == {ligand: None for ligand, _, _ in jobs}
+    assert_docked(jobs)
+
+
+def test_batch_backend_needs_vina_1_2(workdir, fake_vina, monkeypatch):
+    assert not BatchBackend(fake_vina).available()
+    assert select_backend("auto", fake_vina).name == "subprocess"
+    monkeypatch.setenv("FAKE_VINA_VERSION", "1.2.5")
+    assert BatchBackend(fake_vina).available()
+
+
+def test_batch_backend_writes_poses_and_log(workdir, fake_vina, monkeypatch):
+    monkeypatch.setenv("FAKE_VINA_VERSION", "1.2.5")
+    jobs = docking_jobs(workdir)
+    errors = BatchBackend(fake_vina).dock_many("target.pdbqt", jobs, PARAMS)
+    assert errors == {ligand: None for ligand, _, _ in jobs}
+    assert_docked(jobs)
+    assert not [name for name in os.listdir(workdir) if name.startswith(".batch_")]
+
+
+def test_fallback_redocks_what_the_batch_missed(workdir, fake_vina, monkeypatch):
+    monkeypatch.setenv("FAKE_VINA_VERSION", "1.2.5")
+    monkeypatch.setenv("FAKE_VINA_FAIL", "adme_molecule2.pdbqt")
+    jobs = docking_jobs(workdir)
+    backend = BatchBackend(fake_vina)
+    assert backend.dock_many("target.pdbqt", jobs, PARAMS)["adme_molecule2.pdbqt"] is not None
+
+    errors = dock_with_fallback(backend, "target.pdbqt", jobs, PARAMS)
+    assert errors == {ligand: None for ligand, _, _ in jobs}
+    assert_docked(jobs)
+
+
+def test_fallback_leaves_timeouts_to_the_caller(workdir, fake_vina, monkeypatch):
+    monkeypatch.setenv("FAKE_VINA_VERSION", "1.2.5")
+    monkeypatch.setenv("FAKE_VINA_DELAY", "5")
+    jobs = docking_jobs(workdir, 1)
+    errors = dock_with_fallback(BatchBackend(fake_vina), "target.pdbqt", jobs, PARAMS, timeout=0.5)
+    assert errors == {"adme_molecule1.pdbqt": TIMED_OUT}
+    assert not os.path.exists(jobs[0][1])
@@ -0,0 +1,26 @@
+"""Startup regression checks for scripts/docking_analysis.py"""
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import docking_analysis
+
+# pandas alone takes several hundred ms to import, so this catches any
+# heavy dependency creeping back into the module's top level
+IMPORT_TIME_BUDGET_MS = 200
+HEAVY_MODULES = ("matplotlib", "pandas", "sklearn")
+
+
+def test_import_time_under_budget():
+    assert docking_analysis.measure_import_time(repeats=3) < IMPORT_TIME_BUDGET_MS
+
+
+def test_import_leaves_heavy_modules_unloaded():
+    # A fresh interpreter, since this test process may have them loaded already
+    code = (f"import sys; sys.path.insert(0, {str(SCRIPTS_DIR)!r}); import docking_analysis; "
+            f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []